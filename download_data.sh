@@ -10,6 +10,8 @@ echo "Starting data download..."
 ENV_NAME="power"
 source $(conda info --base)/etc/profile.d/conda.sh
 conda activate ${ENV_NAME}
+# Stages of this run share one id in out/run_metrics.jsonl
+export POWER_RUN_ID=${POWER_RUN_ID:-$(date +%Y%m%dT%H%M%S)}
 # Run kse_load_forecast
 echo "Running kse_load_forecast.py..."
 python3 ./scripts/kse_load_forecast.py
@@ -0,0 +1,10 @@
+#!/bin/bash
+
+# Define the environment name
+ENV_NAME="power"
+source $(conda info --base)/etc/profile.d/conda.sh
+conda activate ${ENV_NAME}
+# Stages of this run share one id in out/run_metrics.jsonl
+export POWER_RUN_ID=${POWER_RUN_ID:-$(date +%Y%m%dT%H%M%S)}
+
+python3 ./scripts/power.py "$@"
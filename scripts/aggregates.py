@@ -0,0 +1,130 @@
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from storage import out_path, read_frame, write_frame
+
+# Aggregate tables kept next to a 15 minute table, by period name. Periods
+# are UTC buckets of Date_utc, like the pd.Grouper(freq="D") reports
+PERIODS = {"daily": "D", "hourly": "h"}
+
+# Statistics stored per column as <stat>_<column>; they merge across
+# periods and partitions, and mean_<column> (sum / count) is added on read
+STATS = ["count", "sum", "sumsq", "min", "max"]
+
+
+def aggregate_name(name, period):
+    """File of the `period` aggregates of out/<name> (final.parquet -> final_daily.parquet)."""
+    return f"{Path(name).stem}_{period}.parquet"
+
+
+def error_column(actual, forecast):
+    """Name of the forecast - actual error of a pair in the aggregate tables."""
+    return f"{forecast}-{actual}"
+
+
+def _stat_dtype(*dtypes):
+    """float64 statistics for float64 (price) columns, float32 for the rest."""
+    return "float64" if any(dtype == "float64" for dtype in dtypes) else "float32"
+
+
+def aggregate(df, freq, pairs=(), columns=None):
+    """
+    STATS of the numeric `columns` of df (all of them when None, indexed
+    by Date_utc) per `freq` period, and of the error forecast - actual of
+    every (actual, forecast) pair whose columns are both in df. Statistics
+    are summed in float64 and stored in the dtype of their columns
+    (float32 MW, float64 prices); counts are int32.
+    """
+    numeric = df.select_dtypes("number")
+    kept = list(numeric) if columns is None else [c for c in columns if c in numeric]
+    values = numeric[kept].astype("float64")
+    dtypes = {column: _stat_dtype(numeric[column].dtype) for column in kept}
+    for actual, forecast in pairs:
+        if actual in numeric and forecast in numeric:
+            error = error_column(actual, forecast)
+            pair = numeric[[actual, forecast]].astype("float64")
+            values[error] = pair[forecast] - pair[actual]
+            dtypes[error] = _stat_dtype(numeric[actual].dtype, numeric[forecast].dtype)
+    key = values.index.floor(freq).rename("Date_utc")
+    grouped = values.groupby(key)
+    stats = {
+        "count": grouped.count().astype("int32"),
+        "sum": grouped.sum().astype(dtypes),
+        "sumsq": (values**2).groupby(key).sum().astype(dtypes),
+        "min": grouped.min().astype(dtypes),
+        "max": grouped.max().astype(dtypes),
+    }
+    return pd.concat([stats[stat].add_prefix(f"{stat}_") for stat in STATS], axis=1)
+
+
+def _period_columns(period, hourly):
+    """Columns aggregated per `period`: every numeric one daily, `hourly` hourly."""
+    return None if period == "daily" else list(hourly)
+
+
+def aggregate_periods(df, pairs=(), hourly=()):
+    """aggregate of df for every period in PERIODS, by period name."""
+    return {
+        period: aggregate(df, freq, pairs, _period_columns(period, hourly))
+        for period, freq in PERIODS.items()
+    }
+
+
+def write_aggregates(parts, name):
+    """
+    Write the aggregate tables of out/<name> from aggregate_periods of its
+    consecutive partitions, split on day boundaries.
+    """
+    for period in PERIODS:
+        write_frame(
+            pd.concat([part[period] for part in parts]),
+            aggregate_name(name, period),
+            index=True,
+        )
+
+
+def update_aggregates(df, name, pairs=(), start=None, hourly=()):
+    """
+    Bring the aggregate tables of out/<name> up to date with df, the table
+    that was just written to it. The daily tables keep every numeric
+    column, the hourly ones only the pair errors and the `hourly` columns.
+    Only periods from the UTC day of `start` (the first row that may have
+    changed) on are recomputed and the stored ones before it are kept.
+    Without `start`, or when the stored tables are missing or hold other
+    columns, everything is recomputed.
+    """
+    day = None if start is None else pd.Timestamp(start).floor("D")
+    for period, freq in PERIODS.items():
+        file = aggregate_name(name, period)
+        columns = _period_columns(period, hourly)
+        if day is None or not (out_path / file).exists():
+            table = aggregate(df, freq, pairs, columns)
+        else:
+            table = aggregate(df[df.index >= day], freq, pairs, columns)
+            old = read_frame(file, end=day)
+            if old.dtypes.equals(table.dtypes):
+                table = pd.concat([old, table])
+            else:
+                table = aggregate(df, freq, pairs, columns)
+        write_frame(table, file, index=True)
+
+
+def read_aggregates(name, period, columns=None, start=None, end=None):
+    """
+    Stored `period` aggregates of out/<name> for `columns` (all when None)
+    and periods in [start, end), with mean_<column> added.
+    """
+    fields = None
+    if columns is not None:
+        fields = [f"{stat}_{column}" for stat in STATS for column in columns]
+    table = read_frame(aggregate_name(name, period), fields, start, end)
+    counts = table.filter(regex="^count_")
+    for count in counts.columns:
+        column = count[len("count_") :]
+        table[f"mean_{column}"] = table[f"sum_{column}"] / table[count]
+    return table
+
+
+def rmse(table, column):
+    """Root mean square of `column` per period of an aggregate table."""
+    return np.sqrt(table[f"sumsq_{column}"] / table[f"count_{column}"])
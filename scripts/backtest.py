@@ -0,0 +1,184 @@
+import argparse
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from storage import out_path, read_frame
+
+# Predicted bilans_price columns of result.parquet, by prediction name
+PREDICTIONS = {
+    "ACTUALS": "model_prediction",
+    "FORECAST": "model_prediction_forecast",
+}
+
+# Prices a position is opened at and settled against bilans_price
+REFERENCES = {"fixing1": "fixing1_price", "fixing2": "fixing2_price"}
+
+# Parameter grid: no-trade band on |predicted edge| in PLN/MWh, edge in
+# PLN/MWh that buys the full 1 MW position (0: always 1 MW) and
+# transaction cost in PLN per MWh traded
+BANDS = [0.0, 1.0, 2.0, 5.0, 10.0]
+SCALES = [0.0, 5.0, 10.0]
+COSTS = [0.0, 0.5, 1.0]
+
+# Strategies evaluated per block, bounding memory to rows x STRATEGY_BLOCK
+STRATEGY_BLOCK = 64
+
+OUTPUT_FILE = "backtest.csv"
+
+
+def strategy_grid(
+    predictions=PREDICTIONS,
+    references=REFERENCES,
+    bands=BANDS,
+    scales=SCALES,
+    costs=COSTS,
+):
+    """Every combination of the strategy parameters, one row per strategy."""
+    return pd.MultiIndex.from_product(
+        [list(predictions), list(references), bands, scales, costs],
+        names=["prediction", "reference", "band", "scale", "cost"],
+    ).to_frame(index=False)
+
+
+def load_prices(predictions=PREDICTIONS, references=REFERENCES):
+    """
+    bilans_price, the reference prices and the predicted bilans_price of
+    every prediction, from result.parquet (reference prices it does not
+    hold come from final.parquet). Models trained on the spread predict
+    bilans_price - fixing1_price, which is turned back into a price.
+    """
+    stored = pq.read_schema(out_path / "result.parquet").names
+    columns = ["bilans_price", *predictions.values()]
+    columns += [column for column in references.values() if column in stored]
+    spread = "spread" in stored
+    if spread and "fixing1_price" not in columns:
+        columns.append("fixing1_price")
+    prices = read_frame("result.parquet", columns=columns).sort_index()
+    missing = [column for column in references.values() if column not in stored]
+    if missing:
+        final = read_frame(
+            "final.parquet",
+            columns=missing,
+            start=prices.index[0],
+            end=prices.index[-1] + pd.Timedelta(minutes=15),
+        )
+        prices = prices.join(final[~final.index.duplicated(keep="last")])
+    if spread:
+        for column in predictions.values():
+            prices[column] = prices[column] + prices["fixing1_price"]
+    return prices.astype("float64")
+
+
+def strategy_pnl(prices, grid, predictions=PREDICTIONS, references=REFERENCES):
+    """
+    PnL of every strategy of `grid` in every quarter hour, as an
+    (n, len(grid)) array with NaN where a strategy has no position. The
+    edge is the predicted bilans_price minus the reference price: a
+    position is taken when |edge| >= band, long when the edge is positive
+    and short otherwise, of 1 MW or, with a scale, edge / scale MW capped
+    at 1 MW. A quarter hour settles position * (bilans_price - reference)
+    / 4 less cost per MWh traded.
+    """
+    predicted = prices[list(predictions.values())].to_numpy()
+    reference = prices[list(references.values())].to_numpy()
+    bilans = prices["bilans_price"].to_numpy()[:, None]
+    p = pd.Index(list(predictions)).get_indexer(grid["prediction"])
+    r = pd.Index(list(references)).get_indexer(grid["reference"])
+    band = grid["band"].to_numpy()
+    scale = grid["scale"].to_numpy()
+    cost = grid["cost"].to_numpy()
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        edge = predicted[:, p] - reference[:, r]
+        direction = np.where(edge > 0, 1.0, -1.0)
+        size = np.where(scale > 0, np.minimum(np.abs(edge) / scale, 1.0), 1.0)
+        position = np.where(np.abs(edge) >= band, direction * size, 0.0)
+        pnl = (position * (bilans - reference[:, r]) - cost * np.abs(position)) / 4
+    return np.where((position != 0) & ~np.isnan(pnl), pnl, np.nan)
+
+
+def strategy_metrics(pnl):
+    """
+    Trades, exposure, volume, win rate, PnL, PnL per trade and per MWh,
+    mean/std and max drawdown of every column of an (n, strategies) PnL
+    array (NaN: no position), one row per strategy.
+    """
+    trade = ~np.isnan(pnl)
+    value = np.where(trade, pnl, 0.0)
+    trades = trade.sum(axis=0)
+    total = value.sum(axis=0)
+    cum = np.cumsum(value, axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / trades
+        std = np.sqrt(((value - mean) ** 2 * trade).sum(axis=0) / (trades - 1))
+        return pd.DataFrame(
+            {
+                "Total trades": trades,
+                "Exposure %": trades / len(pnl) * 100,
+                "Win rate": (value > 0).sum(axis=0) / trades,
+                "Total PnL": total,
+                "PnL per trade": mean,
+                "mean/std": mean / std,
+                "Max Drawdown": (cum - np.maximum.accumulate(cum, axis=0)).min(axis=0),
+            }
+        )
+
+
+def backtest(prices, grid, predictions=PREDICTIONS, references=REFERENCES):
+    """
+    strategy_metrics of every strategy of `grid`, joined to its
+    parameters. Strategies are simulated STRATEGY_BLOCK at a time.
+    """
+    tables = []
+    for start in range(0, len(grid), STRATEGY_BLOCK):
+        block = grid.iloc[start : start + STRATEGY_BLOCK]
+        pnl = strategy_pnl(prices, block, predictions, references)
+        tables.append(strategy_metrics(pnl).set_index(block.index))
+    return grid.join(pd.concat(tables))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Backtest a grid of trading strategies over result.parquet."
+    )
+    parser.add_argument(
+        "--bands",
+        type=float,
+        nargs="+",
+        default=BANDS,
+        help="No-trade bands on |predicted edge| (PLN/MWh).",
+    )
+    parser.add_argument(
+        "--scales",
+        type=float,
+        nargs="+",
+        default=SCALES,
+        help="Edge (PLN/MWh) sized to the full 1 MW position; 0 trades 1 MW always.",
+    )
+    parser.add_argument(
+        "--costs",
+        type=float,
+        nargs="+",
+        default=COSTS,
+        help="Transaction costs (PLN per MWh traded).",
+    )
+    parser.add_argument(
+        "--references",
+        nargs="+",
+        choices=list(REFERENCES),
+        default=list(REFERENCES),
+        help="Reference prices positions are opened at.",
+    )
+    parser.add_argument(
+        "--top", type=int, default=20, help="Strategies printed, by Total PnL."
+    )
+    args = parser.parse_args()
+
+    references = {name: REFERENCES[name] for name in args.references}
+    prices = load_prices(PREDICTIONS, references)
+    grid = strategy_grid(PREDICTIONS, references, args.bands, args.scales, args.costs)
+    table = backtest(prices, grid, PREDICTIONS, references)
+    table = table.sort_values("Total PnL", ascending=False, ignore_index=True)
+    print(table.head(args.top).to_string(float_format="{:.2f}".format))
+    table.to_csv(out_path / OUTPUT_FILE, index=False)
+    print(f"{len(table)} strategies saved to {out_path / OUTPUT_FILE}")
@@ -0,0 +1,294 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from feature_engineering import (
+    PEAK_QUANTILES,
+    PEAK_WINDOW,
+    SPIKE_QUANTILES,
+    SPIKE_WINDOW,
+)
+from instrument import RUN_ID_VARIABLE, RUN_LOG
+from rolling import rolling_quantile_frame
+from storage import out_path
+from synthetic import END, INGESTION, history_start
+from timecore import TZ, LocalCalendar, add_utc_25_15min
+
+# Benchmark results of every run, one JSON object per stage and scale
+BENCHMARK_LOG = "benchmarks.jsonl"
+
+# Years of synthetic history benchmarked by default
+SCALES = [2.0, 4.0]
+
+# Pipeline stages run as their own process: stage -> script arguments
+PIPELINE = {
+    "merge_dataframes": ["merge_dataframes.py"],
+    # without the feature store, so every feature is computed
+    "feature_engineering": ["feature_engineering.py", "--no_store"],
+    "train_model": ["train_model.py", "--train_days", "30"],
+    "evaluate_model": ["evaluate_model.py"],
+}
+
+# Times an in-process benchmark is repeated, the best one is kept
+REPEAT = 3
+
+scripts_path = Path(__file__).parent
+
+
+def git_state():
+    """Short commit of HEAD and whether scripts/ has uncommitted changes."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=scripts_path,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+        status = subprocess.run(
+            ["git", "status", "--porcelain", "--", "."],
+            cwd=scripts_path,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, bool(status.strip())
+
+
+def run_stage(arguments, env, scratch):
+    """
+    Run a script of scripts/ on the scratch directory and return its logged
+    total (wall, CPU, peak RSS) and the wall time of the whole process,
+    imports included.
+    """
+    started = time.perf_counter()
+    subprocess.run(
+        [sys.executable, str(scripts_path / arguments[0]), *arguments[1:]],
+        env=env,
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    process = time.perf_counter() - started
+    runs = pd.read_json(scratch / RUN_LOG, lines=True)
+    total = runs[runs["step"] == "total"].iloc[-1]
+    return {
+        "wall_s": total["wall_s"],
+        "cpu_s": total["cpu_s"],
+        "peak_rss_mb": total["process_peak_rss_mb"],
+        "process_s": process,
+    }
+
+
+def best_of(function, repeat=REPEAT):
+    """Wall and CPU time of the fastest of `repeat` calls of function."""
+    timings = []
+    for _ in range(repeat):
+        wall, cpu = time.perf_counter(), time.process_time()
+        function()
+        timings.append((time.perf_counter() - wall, time.process_time() - cpu))
+    wall, cpu = min(timings)
+    return {"wall_s": wall, "cpu_s": cpu}
+
+
+def local_quarter_hours(start, end=END):
+    """
+    (date, hour_index) rows of every local quarter-hour between the local
+    dates [start, end): 92, 96 or 100 per day, like the PSE reports.
+    """
+    days = pd.date_range(start, end, freq="D", tz=TZ)
+    counts = np.diff(days.asi8) // (15 * 60 * 10**9)
+    dates = np.repeat(days[:-1].tz_localize(None), counts)
+    offsets = np.repeat(np.cumsum(counts) - counts, counts)
+    return pd.DataFrame({"date": dates, "hour_index": np.arange(len(dates)) - offsets})
+
+
+def calendar_benchmarks(start, repeat=REPEAT):
+    """Local quarter-hours to UTC, and local views of UTC timestamps."""
+    frame = local_quarter_hours(start)
+    utc = add_utc_25_15min(frame.copy())["Date_utc"]
+
+    def views():
+        calendar = LocalCalendar.of(utc)
+        return calendar.date, calendar.hour, calendar.minute, calendar.is_dst
+
+    return {
+        "add_utc_25_15min": {
+            "rows": len(frame),
+            **best_of(lambda: add_utc_25_15min(frame.copy()), repeat),
+        },
+        "LocalCalendar": {"rows": len(frame), **best_of(views, repeat)},
+    }
+
+
+def rolling_benchmarks(scratch, repeat=REPEAT):
+    """The rolling quantile bands of feature_engineering.py on the merged data."""
+    final = pd.read_parquet(scratch / "final.parquet")
+    peak = final["demand-generation-clean_actual"]
+    spike = final["supply_ab1_actual"]
+    return {
+        "rolling_quantiles": {
+            "rows": len(final),
+            **best_of(
+                lambda: (
+                    rolling_quantile_frame(peak, PEAK_WINDOW, PEAK_QUANTILES),
+                    rolling_quantile_frame(spike, SPIKE_WINDOW, SPIKE_QUANTILES),
+                ),
+                repeat,
+            ),
+        }
+    }
+
+
+def benchmark(years, vintages=3, seed=0, repeat=REPEAT):
+    """
+    Generate `years` years of synthetic sources into a scratch directory,
+    run every ingestion notebook and pipeline stage on them and time the
+    calendar mapping and rolling quantiles in process. Returns a dict of
+    stage -> metrics.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="power-benchmark-") as directory:
+        scratch = Path(directory)
+        env = {
+            **os.environ,
+            "POWER_OUT": str(scratch),
+            RUN_ID_VARIABLE: f"benchmark-{years:g}y",
+        }
+        env.pop("POWER_PROFILE", None)
+        started = time.perf_counter()
+        subprocess.run(
+            [
+                sys.executable,
+                str(scripts_path / "synthetic.py"),
+                "--years",
+                str(years),
+                "--vintages",
+                str(vintages),
+                "--seed",
+                str(seed),
+            ],
+            env=env,
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        results["generate"] = {"wall_s": time.perf_counter() - started}
+        for script in INGESTION:
+            results[script] = run_stage(
+                ["synthetic.py", "--replay", script], env, scratch
+            )
+        for stage, arguments in PIPELINE.items():
+            results[stage] = run_stage(arguments, env, scratch)
+            if stage == "feature_engineering":
+                results.update(rolling_benchmarks(scratch, repeat))
+        results.update(calendar_benchmarks(history_start(years), repeat))
+    return results
+
+
+def read_benchmarks():
+    """Every logged benchmark result, one row per run, scale and stage."""
+    return pd.read_json(out_path / BENCHMARK_LOG, lines=True, dtype={"commit": str})
+
+
+def compare(benchmarks, commits=None, metric="wall_s"):
+    """
+    Median `metric` of every (years, stage) per commit, for `commits` (by
+    default the last two benchmarked), with the change of the last commit
+    against the first in %.
+    """
+    if not commits:
+        commits = list(dict.fromkeys(benchmarks["commit"]))[-2:]
+    # uncommitted runs are labelled apart from their commit
+    benchmarks = benchmarks.assign(
+        commit=benchmarks["commit"].where(
+            ~benchmarks["dirty"], benchmarks["commit"] + "+"
+        )
+    )
+    labels = [
+        label
+        for label in dict.fromkeys(benchmarks["commit"])
+        if label.rstrip("+") in commits
+    ]
+    table = benchmarks[benchmarks["commit"].isin(labels)].pivot_table(
+        index=["years", "stage"],
+        columns="commit",
+        values=metric,
+        aggfunc="median",
+        sort=False,
+    )[labels]
+    if len(labels) > 1:
+        table["change %"] = (table[labels[-1]] / table[labels[0]] - 1) * 100
+    return table
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark every pipeline stage on synthetic data of several sizes."
+    )
+    parser.add_argument(
+        "--scales",
+        type=float,
+        nargs="+",
+        default=SCALES,
+        help="Years of synthetic history to benchmark.",
+    )
+    parser.add_argument(
+        "--vintages",
+        type=int,
+        default=3,
+        help="Updates per day of the live pk5y plan.",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the data.")
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=REPEAT,
+        help="Repeats of the in-process benchmarks (the best is kept).",
+    )
+    parser.add_argument(
+        "--compare",
+        nargs="*",
+        metavar="COMMIT",
+        help="Compare logged results of these commits (default: the last two) "
+        "instead of benchmarking.",
+    )
+    args = parser.parse_args()
+
+    if args.compare is not None:
+        table = compare(read_benchmarks(), args.compare)
+        print(table.to_string(float_format="{:.2f}".format))
+        sys.exit(0)
+
+    commit, dirty = git_state()
+    run = time.strftime("%Y%m%dT%H%M%S")
+    records = []
+    for years in args.scales:
+        print(f"Benchmarking {years:g} years of synthetic history...")
+        results = benchmark(years, args.vintages, args.seed, args.repeat)
+        for stage, metrics in results.items():
+            records.append(
+                {
+                    "run": run,
+                    "commit": commit,
+                    "dirty": dirty,
+                    "years": years,
+                    "vintages": args.vintages,
+                    "stage": stage,
+                    **metrics,
+                }
+            )
+    with open(out_path / BENCHMARK_LOG, "a") as f:
+        for record in records:
+            f.write(json.dumps(record, default=float) + "\n")
+    table = pd.DataFrame(records).pivot_table(
+        index="stage", columns="years", values="wall_s", sort=False
+    )
+    print(table.to_string(float_format="{:.2f}".format))
+    print(f"Results saved to {out_path / BENCHMARK_LOG}")
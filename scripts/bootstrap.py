@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+
+# Day resamples drawn per confidence interval, and the interval's coverage
+RESAMPLES = 2000
+CONFIDENCE = 0.95
+
+# Statistics bootstrapped per prediction, in the order they are reported
+STATISTICS = ["Total PnL", "Win rate", "mean/std", "Max Drawdown"]
+
+
+def daily_summaries(profit, index):
+    """
+    Per UTC day of an (n, k) profit block (rows without a trade NaN) on a
+    sorted DatetimeIndex: trades, wins, PnL and sum of squared PnL, and the
+    lowest, highest and deepest drawdown of the PnL cumulated from the
+    start of the day. These compose exactly into the statistics of any
+    sequence of whole days. Returns a dict of (days, k) arrays.
+    """
+    codes, _ = pd.factorize(index.floor("D"))
+    starts = np.flatnonzero(np.diff(codes, prepend=-1))
+    trade = ~np.isnan(profit)
+    pnl = np.where(trade, profit, 0.0)
+    cum = np.cumsum(pnl, axis=0)
+    # cumulated PnL at the end of the previous day
+    offset = np.concatenate([np.zeros((1, pnl.shape[1])), cum[starts[1:] - 1]])
+    within = cum - np.repeat(offset, np.diff(np.append(starts, len(pnl))), axis=0)
+    peak = pd.DataFrame(within).groupby(codes).cummax().to_numpy()
+    return {
+        "trades": np.add.reduceat(trade.astype("float64"), starts),
+        "wins": np.add.reduceat((pnl > 0).astype("float64"), starts),
+        "pnl": np.add.reduceat(pnl, starts),
+        "sumsq": np.add.reduceat(pnl**2, starts),
+        # the day starts at 0, like a run starting without a position
+        "low": np.minimum(np.minimum.reduceat(within, starts), 0.0),
+        "high": np.maximum(np.maximum.reduceat(within, starts), 0.0),
+        "drawdown": np.minimum(np.minimum.reduceat(within - peak, starts), 0.0),
+    }
+
+
+def resample_statistics(days, draws):
+    """
+    STATISTICS of every run of days in the (resamples, length) day index
+    matrix `draws`, as a dict of (resamples, k) arrays. Drawdowns combine
+    each day's own drawdown with its lowest point against the highest
+    point of all days before it in the run.
+    """
+    with np.errstate(invalid="ignore", divide="ignore"):
+        trades = days["trades"][draws].sum(axis=1)
+        pnl = days["pnl"][draws]
+        total = pnl.sum(axis=1)
+        mean = total / trades
+        std = np.sqrt((days["sumsq"][draws].sum(axis=1) - total * mean) / (trades - 1))
+        # cumulated PnL before every day of the run
+        before = np.cumsum(pnl, axis=1) - pnl
+        peak = np.maximum.accumulate(before + days["high"][draws], axis=1)
+        peak = np.concatenate([np.zeros_like(peak[:, :1]), peak[:, :-1]], axis=1)
+        drawdown = np.minimum(
+            before + days["low"][draws] - peak, days["drawdown"][draws]
+        ).min(axis=1)
+        return {
+            "Total PnL": total,
+            "Win rate": days["wins"][draws].sum(axis=1) / trades,
+            "mean/std": mean / std,
+            "Max Drawdown": drawdown,
+        }
+
+
+def bootstrap(
+    profit, index, columns, resamples=RESAMPLES, confidence=CONFIDENCE, seed=0
+):
+    """
+    Day block bootstrap confidence intervals of STATISTICS for every column
+    of an (n, k) profit block: whole UTC days are resampled with
+    replacement, so correlation within a day is kept. All columns share
+    the same draws, which keeps comparisons between them paired. Every
+    resample is computed at once from the daily summaries. Returns a frame
+    with a row per statistic and (column, estimate/low/high) columns.
+    """
+    days = daily_summaries(np.asarray(profit, dtype="float64"), index)
+    count = len(days["pnl"])
+    draws = np.random.default_rng(seed).integers(0, count, size=(resamples, count))
+    estimate = resample_statistics(days, np.arange(count)[None, :])
+    resampled = resample_statistics(days, draws)
+    tail = (1 - confidence) / 2
+    bounds = {
+        "estimate": {name: estimate[name][0] for name in STATISTICS},
+        "low": {
+            name: np.nanquantile(resampled[name], tail, axis=0) for name in STATISTICS
+        },
+        "high": {
+            name: np.nanquantile(resampled[name], 1 - tail, axis=0)
+            for name in STATISTICS
+        },
+    }
+    return pd.DataFrame(
+        {
+            (column, bound): [values[name][i] for name in STATISTICS]
+            for i, column in enumerate(columns)
+            for bound, values in bounds.items()
+        },
+        index=STATISTICS,
+    )
@@ -0,0 +1,41 @@
+import os
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def mc_downloader():
+    """DataDownloader of the MC function app, configured from .env."""
+    from dotenv import load_dotenv
+    from data_downloader import DataDownloader
+
+    load_dotenv()
+    return DataDownloader(
+        os.environ.get("MC_FUNCTION_APP_URL"), os.environ.get("MC_FUNCTION_CODE")
+    )
+
+
+@lru_cache(maxsize=None)
+def jwm_downloader():
+    """JwmDataDownloader, configured from .env."""
+    from dotenv import load_dotenv
+    from jwm_data_downloader import JwmDataDownloader
+
+    load_dotenv()
+    return JwmDataDownloader(
+        username=os.environ.get("JWM_USERNAME"),
+        password=os.environ.get("JWM_PASSWORD"),
+    )
+
+
+class Lazy:
+    """
+    Stand-in for a client that is only built by `factory` when one of its
+    attributes is first used, so code holding it can be imported (or
+    skip a source) without loading the downloader packages or .env.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+
+    def __getattr__(self, name):
+        return getattr(self._factory(), name)
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+# Points kept per line trace; a chart is only so many pixels wide
+LINE_POINTS = 2000
+
+# Scatter panels with more points than this are drawn as a density heatmap
+# of DENSITY_BINS x DENSITY_BINS cells instead of one marker per point
+SCATTER_POINTS = 5000
+DENSITY_BINS = 100
+
+
+def lttb(x, y, points):
+    """
+    Positions of the `points` points Largest-Triangle-Three-Buckets keeps
+    of the line (x, y): the first and last point, and from every bucket in
+    between the point spanning the largest triangle with the point kept
+    before it and the mean of the next bucket. Peaks and dips survive,
+    unlike with every n-th point.
+    """
+    n = len(x)
+    if points >= n or points < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype="float64")
+    x = x - x[0]
+    y = np.asarray(y, dtype="float64")
+    edges = np.linspace(1, n - 1, points - 1).astype("int64")
+    sum_x = np.concatenate([[0.0], np.cumsum(x)])
+    sum_y = np.concatenate([[0.0], np.cumsum(y)])
+
+    kept = np.empty(points, dtype="int64")
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            end = edges[i + 2]
+            cx = (sum_x[end] - sum_x[hi]) / (end - hi)
+            cy = (sum_y[end] - sum_y[hi]) / (end - hi)
+        else:
+            cx, cy = x[-1], y[-1]
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        kept[i + 1] = a
+    return kept
+
+
+def downsample(series, points=LINE_POINTS):
+    """
+    Series (indexed by time or any numeric x) reduced to at most `points`
+    points with lttb, for a plotly line trace. NaN points are dropped.
+    """
+    series = series.dropna()
+    if len(series) <= points:
+        return series
+    x = series.index
+    if isinstance(x, pd.DatetimeIndex):
+        x = x.asi8
+    return series.iloc[lttb(np.asarray(x), series.to_numpy(dtype="float64"), points)]
+
+
+def density(x, y, bins=DENSITY_BINS):
+    """
+    Point counts of a bins x bins grid over (x, y), as (counts, x centers,
+    y centers) for a heatmap; counts[j, i] is the cell of y[j], x[i] and
+    empty cells are NaN, so they stay transparent.
+    """
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    known = ~(np.isnan(x) | np.isnan(y))
+    counts, x_edges, y_edges = np.histogram2d(x[known], y[known], bins=bins)
+    counts = np.where(counts > 0, counts, np.nan).T
+    return (
+        counts,
+        (x_edges[:-1] + x_edges[1:]) / 2,
+        (y_edges[:-1] + y_edges[1:]) / 2,
+    )
@@ -1,63 +1,208 @@
 import pandas as pd
 import numpy as np
-from pathlib import Path
 import argparse
+import pyarrow.parquet as pq
+from aggregates import aggregate, read_aggregates, rmse
+from bootstrap import CONFIDENCE, bootstrap
+from downsample import LINE_POINTS, downsample
+from instrument import start_stage, step
+from storage import out_path, read_frame
 
-out_path = Path(__file__).parent / "../out"
 
+def daily_errors(results):
+    """Daily aggregates of the errors over the days of results, one row per day."""
+    errors = ["error_actual", "error_forecast"]
+    start = results.index[0].floor("D")
+    end = results.index[-1].floor("D") + pd.Timedelta(days=1)
+    try:
+        daily = read_aggregates("result.parquet", "daily", errors, start=start, end=end)
+    except FileNotFoundError:
+        daily = aggregate(results[errors], "D")
+    return daily.asfreq("D")
 
-def print_results(result, charts=False):
+
+# Predictions evaluated by print_results: name -> (profit column, error column)
+PREDICTIONS = {
+    "ACTUALS": ("model_profit", "error_actual"),
+    "FORECAST": ("model_profit_forecast", "error_forecast"),
+}
+
+# Peak hours regime (0..2) the metrics are broken down by
+REGIME_COLUMN = "peak_hours_actual"
+
+
+def _columns(result, predictions, which):
+    return result[[columns[which] for columns in predictions.values()]].to_numpy(
+        dtype="float64", na_value=np.nan
+    )
+
+
+def compute_metrics(result, predictions=PREDICTIONS):
+    """
+    Every statistic of print_results for every prediction in one pass over
+    an (n, len(predictions)) block of profits and errors. Rows without a
+    profit are not trades and are skipped, like the per-column dropna.
+    Returns (metrics, cum_pnl): one column per prediction each, cum_pnl
+    indexed like result and NaN where there is no trade.
+    """
+    profit = _columns(result, predictions, 0)
+    error = _columns(result, predictions, 1)
+    trade = ~np.isnan(profit)
+    pnl = np.where(trade, profit, 0.0)
+    error = np.where(trade, error, np.nan)
+    known = ~np.isnan(error)
+
+    trades = trade.sum(axis=0)
+    total = pnl.sum(axis=0)
+    mean = total / trades
+    std = np.sqrt((np.where(trade, pnl - mean, 0.0) ** 2).sum(axis=0) / (trades - 1))
+    errors = known.sum(axis=0)
+    cum = np.cumsum(pnl, axis=0)
+    # rows without a trade repeat the previous cumulative PnL, so they
+    # change neither the running maximum nor the deepest drawdown
+    drawdown = (cum - np.maximum.accumulate(cum, axis=0)).min(axis=0)
+    metrics = pd.DataFrame(
+        {
+            "Total trades": trades,
+            "Win rate": (pnl > 0).sum(axis=0) / trades,
+            "Total PnL": total,
+            "PnL per trade": mean,
+            "MAE": np.where(known, np.abs(error), 0.0).sum(axis=0) / errors,
+            "RMSE": np.sqrt(np.where(known, error**2, 0.0).sum(axis=0) / errors),
+            "mean/std": mean / std,
+            "Max Drawdown": drawdown,
+        },
+        index=list(predictions),
+    ).T
+    cum_pnl = pd.DataFrame(
+        np.where(trade, cum, np.nan), index=result.index, columns=list(predictions)
+    )
+    return metrics, cum_pnl
+
+
+def breakdown(result, keys, predictions=PREDICTIONS):
+    """
+    Trades, win rate, PnL, PnL per trade, mean/std, MAE and RMSE of every
+    prediction per value of `keys` (array-like, one key per row), from
+    per-group sums, sums of squares and counts. Returns a frame indexed by
+    key with (statistic, prediction) columns.
+    """
+    codes, groups = pd.factorize(keys, sort=True)
+    present = codes >= 0
+    codes = codes[present]
+    profit = _columns(result, predictions, 0)[present]
+    error = _columns(result, predictions, 1)[present]
+    trade = ~np.isnan(profit)
+    pnl = np.where(trade, profit, 0.0)
+    known = trade & ~np.isnan(error)
+    error = np.where(known, error, 0.0)
+
+    def sums(values):
+        return np.stack(
+            [
+                np.bincount(codes, weights=column, minlength=len(groups))
+                for column in values.T
+            ],
+            axis=1,
+        )
+
+    trades = sums(trade.astype("float64"))
+    total = sums(pnl)
+    errors = sums(known.astype("float64"))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / trades
+        var = (sums(pnl**2) - trades * mean**2) / (trades - 1)
+        stats = {
+            "Total trades": trades,
+            "Win rate": sums((pnl > 0).astype("float64")) / trades,
+            "Total PnL": total,
+            "PnL per trade": mean,
+            "mean/std": mean / np.sqrt(var),
+            "MAE": sums(np.abs(error)) / errors,
+            "RMSE": np.sqrt(sums(error**2) / errors),
+        }
+    return pd.concat(
+        {
+            name: pd.DataFrame(values, index=groups, columns=list(predictions))
+            for name, values in stats.items()
+        },
+        axis=1,
+    )
+
+
+def breakdowns(result, predictions=PREDICTIONS):
+    """breakdown of result by UTC month, UTC hour of day and peak hours regime."""
+    tables = {
+        "month": breakdown(result, result.index.strftime("%Y-%m"), predictions),
+        "hour": breakdown(result, result.index.hour, predictions),
+    }
+    if REGIME_COLUMN in result:
+        # train_model.py casts the codes to float64, report them as stored
+        regime = result[REGIME_COLUMN].astype("Int8")
+        tables["regime"] = breakdown(result, regime, predictions)
+    return tables
+
+
+def print_results(
+    result,
+    charts=False,
+    breakdown_tables=False,
+    points=LINE_POINTS,
+    resamples=0,
+    confidence=CONFIDENCE,
+):
     result = result.sort_index()
     # Calculate and print metrics
-    results = result.dropna(subset=["model_profit"])
-    print("---------------------------------------------------------------")
-    print("ACTUALS:")
-    print(f"Total trades: {len(results)}")
-    print(f"Win rate: {(results['model_profit'] > 0).mean():.2%}")
-    print(f"Total PnL: {results['model_profit'].sum():.2f}")
-    print(f"PnL per trade: {results['model_profit'].mean():.2f}")
-    mae_actual = np.abs(results["error_actual"]).mean()
-    rmse_actual = np.sqrt((results["error_actual"] ** 2).mean())
-    print(f"MAE: {mae_actual:.2f}")
-    print(f"RMSE: {rmse_actual:.2f}")
-    print(f"mean/std: {(results['model_profit'].mean() / results['model_profit'].std()):.2f}")
-    cum_pnl_actual = results["model_profit"].cumsum()
-    drawdowns_actual = cum_pnl_actual - cum_pnl_actual.cummax()
-    max_drawdown_actual = drawdowns_actual.min()
-    print(f"Max Drawdown: {max_drawdown_actual:.2f}")
-
-    results = result.dropna(subset=["model_profit_forecast"])
-    print("---------------------------------------------------------------")
-    print("FORECAST:")
-    print(f"Total trades: {len(results)}")
-    print(f"Win rate: {(results['model_profit_forecast'] > 0).mean():.2%}")
-    print(f"Total PnL: {results['model_profit_forecast'].sum():.2f}")
-    print(f"PnL per trade: {results['model_profit_forecast'].mean():.2f}")
-    mae_forecast = np.abs(results["error_forecast"]).mean()
-    rmse_forecast = np.sqrt((results["error_forecast"] ** 2).mean())
-    print(f"MAE: {mae_forecast:.2f}")
-    print(f"RMSE: {rmse_forecast:.2f}")
-    print(f"mean/std: {(results['model_profit'].mean() / results['model_profit'].std()):.2f}")
-    cum_pnl_forecast = results["model_profit_forecast"].cumsum()
-    drawdowns_forecast = cum_pnl_forecast - cum_pnl_forecast.cummax()
-    max_drawdown_forecast = drawdowns_forecast.min()
-    print(f"Max Drawdown: {max_drawdown_forecast:.2f}")
+    metrics, cum_pnl = compute_metrics(result)
+    for name, values in metrics.items():
+        print("---------------------------------------------------------------")
+        print(f"{name}:")
+        print(f"Total trades: {values['Total trades']:.0f}")
+        print(f"Win rate: {values['Win rate']:.2%}")
+        print(f"Total PnL: {values['Total PnL']:.2f}")
+        print(f"PnL per trade: {values['PnL per trade']:.2f}")
+        print(f"MAE: {values['MAE']:.2f}")
+        print(f"RMSE: {values['RMSE']:.2f}")
+        print(f"mean/std: {values['mean/std']:.2f}")
+        print(f"Max Drawdown: {values['Max Drawdown']:.2f}")
+
+    if breakdown_tables:
+        for name, table in breakdowns(result).items():
+            print("---------------------------------------------------------------")
+            print(f"By {name}:")
+            print(table.to_string(float_format="{:.2f}".format))
+
+    if resamples:
+        intervals = bootstrap(
+            _columns(result, PREDICTIONS, 0),
+            result.index,
+            list(PREDICTIONS),
+            resamples,
+            confidence,
+        )
+        print("---------------------------------------------------------------")
+        print(f"Bootstrap {confidence:.0%} intervals ({resamples} day resamples):")
+        print(intervals.to_string(float_format="{:.2f}".format))
 
     if charts:
         import plotly.graph_objects as go
         from plotly.subplots import make_subplots
         import webbrowser
 
-        # Compute daily and rolling RMSE for actual and forecast
-        daily_rmse_actual = results.groupby(pd.Grouper(freq="D"))["error_actual"].apply(
-            lambda x: np.sqrt(np.mean(x**2)) if not x.empty else np.nan
-        )
-        rolling_rmse_actual = daily_rmse_actual.rolling(14).mean()
+        # Line traces are reduced to at most `points` points each
+        cum_pnl_actual = downsample(cum_pnl["ACTUALS"], points)
+        cum_pnl_forecast = downsample(cum_pnl["FORECAST"], points)
 
-        daily_rmse_forecast = results.groupby(pd.Grouper(freq="D"))[
-            "error_forecast"
-        ].apply(lambda x: np.sqrt(np.mean(x**2)) if not x.empty else np.nan)
-        rolling_rmse_forecast = daily_rmse_forecast.rolling(14).mean()
+        # Compute daily and rolling RMSE for actual and forecast, from the
+        # daily aggregates of result.parquet when train_model.py stored them
+        daily = daily_errors(result)
+        daily_rmse_actual = rmse(daily, "error_actual")
+        rolling_rmse_actual = downsample(daily_rmse_actual.rolling(14).mean(), points)
+
+        daily_rmse_forecast = rmse(daily, "error_forecast")
+        rolling_rmse_forecast = downsample(
+            daily_rmse_forecast.rolling(14).mean(), points
+        )
 
         # Create a single subplot with secondary y-axis
         fig = make_subplots(
@@ -70,7 +215,7 @@ def print_results(result, charts=False):
         # Add Cumulative Profit traces to primary y-axis (left, shared scale for profits)
         fig.add_trace(
             go.Scatter(
-                x=results.index,
+                x=cum_pnl_actual.index,
                 y=cum_pnl_actual,
                 name="Actual Cum PnL",
                 line=dict(color="blue", width=2),
@@ -82,7 +227,7 @@ def print_results(result, charts=False):
         )
         fig.add_trace(
             go.Scatter(
-                x=results.index,
+                x=cum_pnl_forecast.index,
                 y=cum_pnl_forecast,
                 name="Forecast Cum PnL",
                 line=dict(color="red", width=2),
@@ -216,6 +361,54 @@ if __name__ == "__main__":
     parser.add_argument(
         "--charts", action="store_true", help="Generate and save charts."
     )
+    parser.add_argument(
+        "--breakdown",
+        action="store_true",
+        help="Also print the metrics by month, hour of day and peak hours regime.",
+    )
+    parser.add_argument(
+        "--points",
+        type=int,
+        default=LINE_POINTS,
+        help="Most points per chart line (LTTB downsampling).",
+    )
+    parser.add_argument(
+        "--bootstrap",
+        type=int,
+        default=0,
+        metavar="RESAMPLES",
+        help="Day block bootstrap confidence intervals from this many resamples.",
+    )
+    parser.add_argument(
+        "--confidence",
+        type=float,
+        default=CONFIDENCE,
+        help="Coverage of the bootstrap intervals.",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Sample the stage with the profiler into out/profile.",
+    )
     args = parser.parse_args()
-    result = pd.read_parquet(out_path / "result.parquet")
-    print_results(result, charts=args.charts)
\ No newline at end of file
+    start_stage("evaluate_model", profile=args.profile)
+    columns = [
+        "model_profit",
+        "model_profit_forecast",
+        "error_actual",
+        "error_forecast",
+    ]
+    stored = pq.read_schema(out_path / "result.parquet").names
+    if args.breakdown and REGIME_COLUMN in stored:
+        columns.append(REGIME_COLUMN)
+    with step("read"):
+        result = read_frame("result.parquet", columns=columns)
+    with step("evaluate"):
+        print_results(
+            result,
+            charts=args.charts,
+            breakdown_tables=args.breakdown,
+            points=args.points,
+            resamples=args.bootstrap,
+            confidence=args.confidence,
+        )
\ No newline at end of file
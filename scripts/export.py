@@ -0,0 +1,67 @@
+from concurrent.futures import ThreadPoolExecutor
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from storage import as_utc, out_path
+
+# Export formats and the file suffix each one is written with
+EXPORT_FORMATS = {"csv": ".csv", "csv.gz": ".csv.gz", "parquet": ".parquet"}
+
+# Exports live apart from the pipeline's own parquet files, so that e.g. a
+# final.parquet export never replaces out/final.parquet
+export_path = out_path / "export"
+
+
+def add_export_arguments(parser):
+    """Add the --export, --export_start and --export_end options to parser."""
+    parser.add_argument(
+        "--export",
+        nargs="+",
+        choices=list(EXPORT_FORMATS),
+        default=[],
+        help="Also export the table in these formats (default: no export).",
+    )
+    parser.add_argument(
+        "--export_start",
+        default=None,
+        help="Export only rows with Date_utc >= this date.",
+    )
+    parser.add_argument(
+        "--export_end",
+        default=None,
+        help="Export only rows with Date_utc < this date.",
+    )
+
+
+def _write(table, path, fmt):
+    if fmt == "parquet":
+        pq.write_table(table, path, compression="zstd", use_dictionary=True)
+    elif fmt == "csv.gz":
+        with pa.CompressedOutputStream(str(path), "gzip") as stream:
+            pa_csv.write_csv(table, stream)
+    else:
+        pa_csv.write_csv(table, path)
+    return path
+
+
+def export_frame(df, stem, formats, start=None, end=None):
+    """
+    Export df (indexed by Date_utc) to out/export/<stem><suffix> for every format,
+    keeping rows with Date_utc in [start, end). The frame is converted to
+    Arrow once and every format is written by the Arrow writers on its own
+    thread. Returns the written paths.
+    """
+    if not formats:
+        return []
+    if start is not None:
+        df = df[df.index >= as_utc(start)]
+    if end is not None:
+        df = df[df.index < as_utc(end)]
+    table = pa.Table.from_pandas(df.reset_index(), preserve_index=False)
+    export_path.mkdir(parents=True, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=len(formats)) as pool:
+        futures = [
+            pool.submit(_write, table, export_path / f"{stem}{EXPORT_FORMATS[fmt]}", fmt)
+            for fmt in dict.fromkeys(formats)
+        ]
+        return [future.result() for future in futures]
@@ -1,154 +1,615 @@
+import argparse
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
 from pathlib import Path
-from datetime import timedelta
 import pandas as pd
 import numpy as np
+import pyarrow.parquet as pq
+from aggregates import aggregate_periods, update_aggregates, write_aggregates
+from export import add_export_arguments, export_frame
+from feature_store import FeatureStore
+from instrument import start_stage, step
+from registry import FeatureEngine, FeatureRegistry
+import rolling
+from rolling import rolling_quantile_frame
+from storage import out_path, read_frame, write_frame, write_frames
+from schema import apply_schema, concat_frames
+from timecore import NS_PER_MINUTE
 
+# Row hashes of the combined data final.parquet was last built from
+STATE_FILE = "final_state.parquet"
 
-def load_dataframe():
-    out_path = Path(__file__).parent / "../out"
-    return pd.read_parquet(out_path / "combined.parquet")
+# How far features look back: 14 day rolling window shifted by 3 days, 1D spikes
+LOOKBACK = pd.Timedelta(days=14 + 3 + 1)
+# fix_forecasts blends every row with the one 4 rows (1 hour) later
+FIX_LOOKAHEAD = 4
+# Nanoseconds per row of the 15 minute grid
+STEP = 15 * NS_PER_MINUTE
 
 
-def fix_forecasts(df: pd.DataFrame, forecast_columns) -> pd.DataFrame:
+def load_dataframe(columns=None, start=None, end=None):
+    return read_frame("combined.parquet", columns=columns, start=start, end=end)
+
+
+def fix_forecasts(df: pd.DataFrame, forecast_columns, workers=1) -> pd.DataFrame:
     """
     Fixes forecast columns by applying a weighted average, then resamples,
     and applies interpolation and forward-filling to all relevant columns.
+    Forecast columns of one dtype are processed as one 2-D NumPy block;
+    with workers > 1 the blocks are split by column across a thread pool.
     """
-    # Define the columns that need processing in a single list
-    # --- Loop 1: Pre-resampling calculations ---
-    # Calculate the weighted average for each forecast column
+    forecast_columns = list(forecast_columns)
+    grid = pd.Series(index=df.index, dtype="float64").resample("15min").asfreq().index
+    # grid position of every row, -1 for rows between the quarter-hours
+    offset = df.index.asi8 - grid.asi8[0]
+    rows = np.where(offset % STEP == 0, offset // STEP, -1)
+
+    # Columns are only blocked together with their own dtype, so every
+    # block keeps the arithmetic precision of its columns
+    blocks = {}
     for col in forecast_columns:
-        df[f"{col}_fix"] = df[col] * 10 / 16 + df[col].shift(-4) * 6 / 16
+        blocks.setdefault(df[col].dtype, []).append(col)
+    parts = [
+        list(part)
+        for columns in blocks.values()
+        for part in np.array_split(np.array(columns), min(workers, len(columns)))
+    ]
+    fix_part = partial(_fix_block, df, rows, grid.asi8.astype("float64"))
+    if workers > 1 and len(parts) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            fixed = list(pool.map(fix_part, parts))
+    else:
+        fixed = [fix_part(part) for part in parts]
 
-    # Resample the dataframe to 15-minute intervals
-    df = df.resample("15min").asfreq()
+    columns = {}
+    for part, (values, fix, interpolate) in zip(parts, fixed):
+        for i, col in enumerate(part):
+            columns[col] = values[:, i]
+            columns[f"{col}_fix"] = fix[:, i]
+            columns[f"{col}_interpolate"] = interpolate[:, i]
+    # The other columns are only moved onto the 15 minute grid
+    others = df.drop(columns=forecast_columns)
+    if len(grid) == len(df) and (rows >= 0).all():
+        others = others.set_axis(grid)
+    else:
+        others = others.reindex(grid)
+    # Everything is assigned at once, in the layout of df followed by the
+    # _fix and then the _interpolate columns
+    return pd.DataFrame(
+        {
+            **{
+                col: columns[col] if col in columns else others[col].array
+                for col in df.columns
+            },
+            **{f"{col}_fix": columns[f"{col}_fix"] for col in forecast_columns},
+            **{
+                f"{col}_interpolate": columns[f"{col}_interpolate"]
+                for col in forecast_columns
+            },
+        },
+        index=grid,
+    )
 
-    # --- Loop 2: Post-resampling operations ---
-    # Apply interpolation and forward-filling to all forecast columns
-    for col in forecast_columns:
-        # Create the 'fix2' column by interpolating the original forecast
-        df[f"{col}_interpolate"] = df[col].interpolate(method="index")
-        # Forward-fill the 'fix' column
-        df[f"{col}_fix"] = df[f"{col}_fix"].ffill()
-        # Forward-fill the original forecast column
-        df[col] = df[col].ffill()
 
-    return df
+def _fix_block(df, rows, x, columns):
+    """
+    (forward filled, _fix, _interpolate) arrays on the grid for `columns`
+    of df, whose rows sit at grid positions `rows` (-1: off the grid).
+    """
+    values = df[columns].to_numpy()
+    # Weighted average with the value one hour (FIX_LOOKAHEAD rows) later,
+    # taken on the stored rows
+    later = np.full_like(values, np.nan)
+    later[:-FIX_LOOKAHEAD] = values[FIX_LOOKAHEAD:]
+    fix = values * 10 / 16 + later * 6 / 16
 
+    # One scatter onto the grid for both, then one forward fill
+    width = values.shape[1]
+    both = np.full((len(x), 2 * width), np.nan, dtype=values.dtype)
+    both[rows[rows >= 0]] = np.hstack([values, fix])[rows >= 0]
+    filled = pd.DataFrame(both).ffill().to_numpy()
+    return filled[:, :width], filled[:, width:], _interpolate_index(both[:, :width], x)
+
+
+def _interpolate_index(values, x):
+    """
+    interpolate(method="index") down every column of a 2-D array sampled
+    at positions x: NaN before the first valid value stays NaN.
+    """
+    out = values.copy()
+    for column in out.T:
+        valid = ~np.isnan(column)
+        if not valid.any():
+            continue
+        gaps = ~valid
+        gaps[: valid.argmax()] = False
+        column[gaps] = np.interp(x[gaps], x[valid], column[valid])
+    return out
+
+
+# Forecast columns fix_forecasts smooths, interpolates and forward fills
+FORECAST_COLUMNS = [
+    "cb_flow_forecast",
+    "pv_forecast",
+    "wind_forecast",
+    "supply_ab1_forecast",
+    "demand_forecast",
+    "supply_nab_forecast",
+    "surplus_capacity_over_reserve",
+]
+
+# Columns train_model.py reads besides the features_map.csv pairs
+MODEL_COLUMNS = ["bilans_price", "fixing1_price"]
+
+features_map_path = Path(__file__).parent.parent / "features_map.csv"
+
+REGISTRY = FeatureRegistry()
+
+# Thread pool size for fix_forecasts (1: the whole block in this thread)
+FIX_WORKERS = 1
+
+# Peak hours bands: 14 day rolling quantiles, known 3 days ahead
+PEAK_WINDOW = 24 * 4 * 14
+PEAK_SHIFT = 24 * 4 * 3
+PEAK_QUANTILES = [0.90, 0.10]
+
+# Supply spikes: 1 day rolling quantiles
+SPIKE_WINDOW = "1D"
+SPIKE_QUANTILES = [0.9, 0.1]
+
+
+def fix_requested_forecasts(df):
+    """fix_forecasts over whichever forecast columns a request needs."""
+    return fix_forecasts(df, df.columns, workers=FIX_WORKERS)
+
+
+# Each forecast column is replaced by its forward filled version and gets
+# its _fix and _interpolate companions; the ones a request needs are fixed
+# together in one fix_forecasts call
+for col in FORECAST_COLUMNS:
+    REGISTRY.register(
+        col,
+        f"{col}_fix",
+        f"{col}_interpolate",
+        inputs=[col],
+        group="fix_forecasts",
+        params={"lookahead": FIX_LOOKAHEAD},
+        code=[fix_forecasts, _fix_block, _interpolate_index],
+    )(fix_requested_forecasts)
 
-def calculate_peak_hours_forecast(df):
-    df["generation_clean_actual"] = df["wind_actual"] + df["pv_actual"]
-    df["demand-generation-clean_actual"] = (
-        df["demand_actual"] - df["generation_clean_actual"]
-    )
 
-    df["peak_hours_top_actual"] = (
-        df["demand-generation-clean_actual"]
-        .rolling(24 * 4 * 14)
-        .quantile(0.90)
-        .shift(24 * 4 * 3)
+def _regime(values, top, bottom):
+    """2 above the top band, 0 below the bottom band, 1 otherwise."""
+    regime = np.where(values > top, 2, 1)
+    return pd.Series(np.where(values < bottom, 0, regime), index=values.index)
+
+
+def _spike(values, band, above):
+    """values where they cross the band, 0.0 elsewhere."""
+    spike = pd.Series(0.0, index=values.index)
+    crossed = values > band if above else values < band
+    spike[crossed] = values[crossed]
+    return spike
+
+
+@REGISTRY.register("generation_clean_actual", inputs=["wind_actual", "pv_actual"])
+def generation_clean_actual(df):
+    return df["wind_actual"] + df["pv_actual"]
+
+
+@REGISTRY.register(
+    "demand-generation-clean_actual",
+    inputs=["demand_actual", "generation_clean_actual"],
+)
+def demand_generation_clean_actual(df):
+    return df["demand_actual"] - df["generation_clean_actual"]
+
+
+@REGISTRY.register(
+    "peak_hours_top_actual",
+    "peak_hours_bottom_actual",
+    inputs=["demand-generation-clean_actual"],
+    params={"window": PEAK_WINDOW, "shift": PEAK_SHIFT, "quantiles": PEAK_QUANTILES},
+    code=[rolling],
+)
+def peak_hours_bands(df):
+    # both quantile bands in one pass
+    top, bottom = PEAK_QUANTILES
+    bands = rolling_quantile_frame(
+        df["demand-generation-clean_actual"], PEAK_WINDOW, PEAK_QUANTILES
+    ).shift(PEAK_SHIFT)
+    return pd.DataFrame(
+        {"peak_hours_top_actual": bands[top], "peak_hours_bottom_actual": bands[bottom]}
     )
-    df["peak_hours_bottom_actual"] = (
-        df["demand-generation-clean_actual"]
-        .rolling(24 * 4 * 14)
-        .quantile(0.10)
-        .shift(24 * 4 * 3)
+
+
+@REGISTRY.register(
+    "peak_hours_actual",
+    inputs=[
+        "demand-generation-clean_actual",
+        "peak_hours_top_actual",
+        "peak_hours_bottom_actual",
+    ],
+    code=[_regime],
+)
+def peak_hours_actual(df):
+    return _regime(
+        df["demand-generation-clean_actual"],
+        df["peak_hours_top_actual"],
+        df["peak_hours_bottom_actual"],
     )
 
-    df["peak_hours_actual"] = np.where(
-        df["demand-generation-clean_actual"] > df["peak_hours_top_actual"], 2, 1
+
+@REGISTRY.register(
+    "generation_clean_forecast",
+    inputs=["wind_forecast_interpolate", "pv_forecast_interpolate"],
+    internal=True,
+)
+def generation_clean_forecast(df):
+    return df["wind_forecast_interpolate"] + df["pv_forecast_interpolate"]
+
+
+@REGISTRY.register(
+    "demand-generation-clean_forecast",
+    inputs=["demand_kse_forecast", "generation_clean_forecast"],
+    internal=True,
+)
+def demand_generation_clean_forecast(df):
+    return df["demand_kse_forecast"] - df["generation_clean_forecast"]
+
+
+@REGISTRY.register(
+    "peak_hours_forecast",
+    inputs=[
+        "demand-generation-clean_forecast",
+        "peak_hours_top_actual",
+        "peak_hours_bottom_actual",
+    ],
+    code=[_regime],
+)
+def peak_hours_forecast(df):
+    return _regime(
+        df["demand-generation-clean_forecast"],
+        df["peak_hours_top_actual"],
+        df["peak_hours_bottom_actual"],
     )
 
-    df["peak_hours_actual"] = np.where(
-        df["demand-generation-clean_actual"] < df["peak_hours_bottom_actual"],
-        0,
-        df["peak_hours_actual"],
+
+@REGISTRY.register(
+    "top_90",
+    "bottom_10",
+    inputs=["supply_ab1_actual"],
+    internal=True,
+    params={"window": SPIKE_WINDOW, "quantiles": SPIKE_QUANTILES},
+    code=[rolling],
+)
+def supply_bands(df):
+    top, bottom = SPIKE_QUANTILES
+    spikes = rolling_quantile_frame(
+        df["supply_ab1_actual"], SPIKE_WINDOW, SPIKE_QUANTILES
     )
+    return pd.DataFrame({"top_90": spikes[top], "bottom_10": spikes[bottom]})
 
-    df["generation_clean_forecast"] = (
-        df["wind_forecast_interpolate"] + df["pv_forecast_interpolate"]
+
+@REGISTRY.register(
+    "top_90_forecast",
+    "bottom_10_forecast",
+    inputs=["supply_ab1_forecast"],
+    internal=True,
+    params={"window": SPIKE_WINDOW, "quantiles": SPIKE_QUANTILES},
+    code=[rolling],
+)
+def supply_bands_forecast(df):
+    top, bottom = SPIKE_QUANTILES
+    spikes = rolling_quantile_frame(
+        df["supply_ab1_forecast"], SPIKE_WINDOW, SPIKE_QUANTILES
     )
-    df["demand-generation-clean_forecast"] = (
-        df["demand_kse_forecast"] - df["generation_clean_forecast"]
+    return pd.DataFrame(
+        {"top_90_forecast": spikes[top], "bottom_10_forecast": spikes[bottom]}
     )
 
-    df["peak_hours_forecast"] = np.where(
-        df["demand-generation-clean_forecast"] > df["peak_hours_top_actual"], 2, 1
-    )
 
-    df["peak_hours_forecast"] = np.where(
-        df["demand-generation-clean_forecast"] < df["peak_hours_bottom_actual"],
-        0,
-        df["peak_hours_forecast"],
+@REGISTRY.register("supply_top", inputs=["supply_ab1_actual", "top_90"], code=[_spike])
+def supply_top(df):
+    return _spike(df["supply_ab1_actual"], df["top_90"], above=True)
+
+
+@REGISTRY.register(
+    "supply_bottom", inputs=["supply_ab1_actual", "bottom_10"], code=[_spike]
+)
+def supply_bottom(df):
+    return _spike(df["supply_ab1_actual"], df["bottom_10"], above=False)
+
+
+@REGISTRY.register(
+    "supply_top_forecast",
+    inputs=["supply_ab1_forecast", "top_90_forecast"],
+    code=[_spike],
+)
+def supply_top_forecast(df):
+    return _spike(df["supply_ab1_forecast"], df["top_90_forecast"], above=True)
+
+
+@REGISTRY.register(
+    "supply_bottom_forecast",
+    inputs=["supply_ab1_forecast", "bottom_10_forecast"],
+    code=[_spike],
+)
+def supply_bottom_forecast(df):
+    return _spike(df["supply_ab1_forecast"], df["bottom_10_forecast"], above=False)
+
+
+def final_columns(source_columns):
+    """Every column of final: the combined ones, then the derived features."""
+    return list(
+        dict.fromkeys(
+            [
+                *source_columns,
+                *[f"{col}_fix" for col in FORECAST_COLUMNS],
+                *[f"{col}_interpolate" for col in FORECAST_COLUMNS],
+                *REGISTRY.public_columns(),
+            ]
+        )
     )
-    # Clean up
-    df = df.drop(
-        columns=[
-            "demand-generation-clean_forecast",
-            "generation_clean_forecast",
-        ]
+
+
+def map_columns():
+    """Columns train_model.py needs for the pairs in features_map.csv."""
+    features = pd.read_csv(features_map_path)
+    return list(
+        dict.fromkeys([*MODEL_COLUMNS, *features["actual"], *features["forecast"]])
     )
-    return df
 
 
-def calculate_supply_spikes(df):
-    # Calculate rolling quantiles for the last N days
-    # For supply_ab1
-    df["top_90"] = df["supply_ab1_actual"].rolling("1D").quantile(0.9)
-    df["bottom_10"] = df["supply_ab1_actual"].rolling("1D").quantile(0.1)
+def map_pairs():
+    """(actual, forecast) pairs of features_map.csv."""
+    features = pd.read_csv(features_map_path)
+    return list(zip(features["actual"], features["forecast"]))
 
-    # For supply_ab1_forecast
-    df["top_90_forecast"] = df["supply_ab1_forecast"].rolling("1D").quantile(0.9)
-    df["bottom_10_forecast"] = df["supply_ab1_forecast"].rolling("1D").quantile(0.1)
 
-    # Reset index to restore original structure
-    df = df.reset_index(drop=False)
+def build_features(df, columns=None, store=None):
+    """
+    Columns of final for combined rows `df` (indexed by Date_utc): all of
+    them, or only `columns` and the features they depend on. Features found
+    in `store` (a FeatureStore) are loaded instead of recomputed.
+    """
+    if columns is None:
+        columns = final_columns(df.columns)
+    return FeatureEngine(REGISTRY, source=df, store=store).frame(columns)
 
-    # Calculate sba columns
-    df["supply_top"] = 0.0
-    df.loc[df["supply_ab1_actual"] > df["top_90"], "supply_top"] = df[
-        "supply_ab1_actual"
-    ]
 
-    df["supply_bottom"] = 0.0
-    df.loc[df["supply_ab1_actual"] < df["bottom_10"], "supply_bottom"] = df[
-        "supply_ab1_actual"
-    ]
+@lru_cache(maxsize=None)
+def combined_engine():
+    """Engine over combined.parquet that reads only the columns requests need."""
+    return FeatureEngine(REGISTRY, load=load_dataframe, store=FeatureStore())
 
-    df["supply_top_forecast"] = 0.0
-    df.loc[
-        df["supply_ab1_forecast"] > df["top_90_forecast"],
-        "supply_top_forecast",
-    ] = df["supply_ab1_forecast"]
-
-    df["supply_bottom_forecast"] = 0.0
-    df.loc[
-        df["supply_ab1_forecast"] < df["bottom_10_forecast"],
-        "supply_bottom_forecast",
-    ] = df["supply_ab1_forecast"]
-    # Clean up
-    df = df.drop(
-        columns=["top_90", "top_90_forecast", "bottom_10", "bottom_10_forecast"]
-    )
-    return df
+
+def compute_features(columns):
+    """
+    Columns of final computed straight from combined.parquet. Features are
+    memoized, so later requests in the same process reuse earlier results.
+    """
+    return combined_engine().frame(columns)
+
+
+def row_hashes(df):
+    """One uint64 hash per combined row (index included), to spot changed rows."""
+    return pd.util.hash_pandas_object(df, index=True).rename("row_hash")
+
+
+def save_state(hashes):
+    """Remember which combined rows (row_hashes) final.parquet was built from."""
+    write_frame(hashes.to_frame(), STATE_FILE, index=True)
+
+
+def first_changed(new):
+    """
+    First Date_utc whose combined row hash in `new` is new, changed or removed
+    since the saved state, None when nothing changed. Without a saved state
+    (or final) everything counts as changed.
+    """
+    if (
+        not (out_path / STATE_FILE).exists()
+        or not (out_path / "final.parquet").exists()
+    ):
+        return new.index[0]
+    old = read_frame(STATE_FILE)["row_hash"]
+    common = new.index.intersection(old.index)
+    differs = old[common].to_numpy() != new[common].to_numpy()
+    changed = new.index.symmetric_difference(old.index).union(common[differs])
+    return changed.min() if len(changed) else None
+
+
+def stored_columns():
+    """Columns of the stored final.parquet, [] when there is none."""
+    path = out_path / "final.parquet"
+    if not path.exists():
+        return []
+    return [name for name in pq.read_schema(path).names if name != "Date_utc"]
+
+
+def incremental_bounds(df, forecast_columns, changed):
+    """
+    (input_start, rewrite_start) for recomputing after a change at `changed`:
+    rows from rewrite_start on can differ from the stored features, and
+    features are exact there when computed from rows >= input_start.
+    """
+    index = df.index
+    pos = index.searchsorted(changed)
+    valid = df[forecast_columns].notna().to_numpy()
+    # the _fix columns look 4 rows ahead
+    rewrite = max(pos - FIX_LOOKAHEAD, 0)
+    # NaN rows after the last value before the change are interpolated towards it
+    for column in valid[:pos].T:
+        before = np.flatnonzero(column)
+        if len(before):
+            rewrite = min(rewrite, before[-1] + 1)
+    rewrite_start = index[min(rewrite, len(index) - 1)]
+
+    # Rolling windows and shifts only look back LOOKBACK, but the forward
+    # fills and interpolations need the last valid inputs before that
+    start = index.searchsorted(rewrite_start - LOOKBACK)
+    fix_valid = valid & np.roll(valid, -FIX_LOOKAHEAD, axis=0)
+    fix_valid[-FIX_LOOKAHEAD:] = False
+    for raw, fix in zip(valid[:start].T, fix_valid[:start].T):
+        last = np.flatnonzero(fix if fix.any() else raw)
+        if len(last):
+            start = min(start, last[-1])
+    return index[start], rewrite_start
+
+
+def update_features(df, hashes, columns=None, store=None):
+    """
+    Bring final.parquet up to date with combined rows `df` (with row_hashes
+    `hashes`), recomputing only the rows from the first changed timestamp on
+    (plus the halo the rolling windows, shifts and fills need) and keeping
+    the stored rows before it. A final with other columns is rebuilt, using
+    `store` like build_features. Returns (final, rewrite_start): rows from
+    rewrite_start on may differ from the stored final (None when all of
+    them may, past the last row when nothing changed).
+    """
+    if columns is None:
+        columns = final_columns(df.columns)
+    if stored_columns() != columns:
+        return build_features(df, columns, store), None
+    changed = first_changed(hashes)
+    if changed is None:
+        final = read_frame("final.parquet")
+        return final, final.index[-1] + pd.Timedelta(STEP, "ns")
+    input_start, rewrite_start = incremental_bounds(df, FORECAST_COLUMNS, changed)
+    if input_start == df.index[0]:
+        return build_features(df, columns, store), None
+    new = build_features(df[df.index >= input_start], columns)
+    old = read_frame("final.parquet", end=rewrite_start)
+    return concat_frames([old, new[new.index >= rewrite_start]]), rewrite_start
+
+
+def _lookahead_ready(df, end):
+    """Whether df holds the rows past `end` that _fix and the interpolation look at."""
+    after = df[df.index >= end]
+    return len(after) >= FIX_LOOKAHEAD and after[FORECAST_COLUMNS].notna().any().all()
+
+
+def partitioned_features(columns=None, months=1, hashes=None):
+    """
+    Columns of final (all, or `columns`) for combined.parquet, yielded one
+    partition of `months` UTC months at a time, in time order, while only
+    a few partitions of combined are in memory. Each partition is built
+    with a halo of earlier rows (the rolling windows, shifts and the last
+    valid forecasts, as for an incremental update) and read ahead until
+    the next valid forecast of every column, so every row comes out exactly
+    as in a full build. The halo only grows past LOOKBACK across gaps in a
+    forecast column. Row hashes of combined are appended to `hashes`.
+    """
+    index = load_dataframe(columns=[]).index
+    if not len(index):
+        return
+    first, last = index[0], index[-1]
+    month = pd.Timestamp(year=first.year, month=first.month, day=1, tz="UTC")
+    edges = pd.date_range(month, last, freq=f"{months}MS")
+    bounds = [first, *edges[edges > first], last + pd.Timedelta(1, "ns")]
+
+    loaded = 0  # partitions of combined read so far
+
+    def read_next(buffer):
+        nonlocal loaded
+        # the last partition is read to the end of the file
+        end = bounds[loaded + 1] if loaded + 2 < len(bounds) else None
+        part = load_dataframe(start=bounds[loaded], end=end)
+        loaded += 1
+        if hashes is not None:
+            hashes.append(row_hashes(part))
+        return part if buffer is None else concat_frames([buffer, part])
+
+    buffer = None
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        while loaded < len(bounds) - 1 and (
+            buffer is None
+            or buffer.index[-1] < start
+            or not _lookahead_ready(buffer, end)
+        ):
+            buffer = read_next(buffer)
+        features = build_features(buffer, columns)
+        yield features[(features.index >= start) & (features.index < end)]
+        if end <= last:
+            halo_start, _ = incremental_bounds(buffer, FORECAST_COLUMNS, end)
+            buffer = buffer[buffer.index >= halo_start]
 
 
 if __name__ == "__main__":
-    out_path = Path(__file__).parent / "../out"
-    forecast_columns = [
-        "cb_flow_forecast",
-        "pv_forecast",
-        "wind_forecast",
-        "supply_ab1_forecast",
-        "demand_forecast",
-        "supply_nab_forecast",
-        "surplus_capacity_over_reserve",
-    ]
+    parser = argparse.ArgumentParser(description="Build features from combined data.")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Recompute only rows changed since the last run and keep the rest.",
+    )
+    parser.add_argument(
+        "--features_map",
+        action="store_true",
+        help="Build only the columns features_map.csv and train_model.py need.",
+    )
+    parser.add_argument(
+        "--partitioned",
+        action="store_true",
+        help="Build final month partition by month partition to bound memory.",
+    )
+    parser.add_argument(
+        "--partition_months",
+        type=int,
+        default=1,
+        help="Months per partition of --partitioned.",
+    )
+    parser.add_argument(
+        "--no_store",
+        action="store_true",
+        help="Recompute every feature instead of reusing out/feature_store.",
+    )
+    add_export_arguments(parser)
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Sample the stage with the profiler into out/profile.",
+    )
+    args = parser.parse_args()
+    start_stage("feature_engineering", profile=args.profile)
+    columns = map_columns() if args.features_map else None
+    pairs = map_pairs()
+
+    if args.partitioned:
+        if args.incremental or args.export:
+            parser.error(
+                "--partitioned cannot be combined with --incremental or --export"
+            )
+        hashes, tables = [], []
+
+        def stored_parts(parts):
+            for part in parts:
+                part = apply_schema(part)
+                tables.append(aggregate_periods(part, pairs))
+                yield part
+
+        with step("partitions"):
+            parts = partitioned_features(columns, args.partition_months, hashes)
+            write_frames(stored_parts(parts), "final.parquet")
+        with step("write"):
+            write_aggregates(tables, "final.parquet")
+            save_state(pd.concat(hashes))
+        sys.exit(0)
 
-    df = load_dataframe()
-    df = fix_forecasts(df, forecast_columns)
-    df = calculate_peak_hours_forecast(df)
-    df = calculate_supply_spikes(df)
-    df = df.set_index("Date_utc").sort_index(ascending=True)
-    df.to_parquet(out_path / "final.parquet")
-    df.to_csv(out_path / "final.csv")
+    with step("load"):
+        combined = load_dataframe()
+        hashes = row_hashes(combined)
+    with step("features"):
+        store = None if args.no_store else FeatureStore()
+        rewrite_start = None
+        if args.incremental:
+            df, rewrite_start = update_features(combined, hashes, columns, store)
+        else:
+            df = build_features(combined, columns, store)
+    with step("write"):
+        final = apply_schema(df)
+        write_frame(final, "final.parquet")
+        update_aggregates(final, "final.parquet", pairs, rewrite_start)
+        save_state(hashes)
+    export_frame(df, "final", args.export, args.export_start, args.export_end)
@@ -0,0 +1,59 @@
+import os
+import pandas as pd
+from storage import out_path
+
+store_path = out_path / "feature_store"
+
+# Bytes the store may take on disk before least recently used entries go
+STORE_LIMIT = 2 * 1024**3
+
+
+class FeatureStore:
+    """
+    Computed feature columns on disk, one parquet file per fingerprint.
+
+    A file's modification time records its last use: loading an entry
+    touches it, and after every save the least recently used entries are
+    removed until the store fits in `limit` bytes.
+    """
+
+    def __init__(self, path=store_path, limit=STORE_LIMIT):
+        self.path = path
+        self.limit = limit
+
+    def _file(self, key):
+        return self.path / f"{key}.parquet"
+
+    def load(self, key):
+        """Stored frame for `key`, or None when it is not in the store."""
+        path = self._file(key)
+        try:
+            frame = pd.read_parquet(path)
+        except FileNotFoundError:
+            return None
+        os.utime(path)
+        return frame
+
+    def save(self, key, frame):
+        """Store `frame` under `key`, then evict down to the size limit."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        path = self._file(key)
+        # written aside and renamed, so readers never see a partial file
+        partial = path.with_suffix(".tmp")
+        frame.to_parquet(partial)
+        os.replace(partial, path)
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the store fits in the limit."""
+        entries = sorted(
+            (entry.stat().st_mtime, entry.stat().st_size, entry)
+            for entry in self.path.glob("*.parquet")
+        )
+        total = sum(size for _, size, _ in entries)
+        # the newest entry always stays, even when it alone is over the limit
+        for _, size, entry in entries[:-1]:
+            if total <= self.limit:
+                break
+            entry.unlink(missing_ok=True)
+            total -= size
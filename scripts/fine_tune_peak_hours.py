@@ -1,95 +1,65 @@
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import pandas as pd
-from datetime import date
-import sys
-import webbrowser
-from pathlib import Path
+from rolling import rolling_quantiles
+from storage import read_frame, write_frame
 
-# Assuming load_dataframe() is defined elsewhere or replace with your loading logic
-# def load_dataframe():
-#     # Your code to load the dataframe
-#     pass
+# Sweep axes: rolling window length in days, and the quantile threshold k in
+# percent (bottom quantile k / 100, top quantile 1 - k / 100)
+WINDOW_DAYS = list(range(1, 81, 5))
+THRESHOLDS = list(range(1, 81, 5))
 
+# Rows per day of the 15 minute data
+ROWS_PER_DAY = 24 * 4
 
-def load_dataframe():
-    out_path = Path(__file__).parent / "../out"
-    return pd.read_parquet(out_path / "combined.parquet")
-
+# Successive halving search space: window days and quantiles in percent
+SEARCH_WINDOW_DAYS = (1, 80)
+SEARCH_BOTTOM = (1, 49)
+SEARCH_TOP = (51, 99)
 
-def calculate_peak_hours_forecast(
-    df, rolling_window=24 * 4 * 21, bottom_q=0.15, top_q=0.85
-):
-    df["generation_clean_forecast"] = df["wind_actual"] + df["pv_actual"]
-    df["demand-generation-clean_forecast"] = (
-        df["demand_kse_forecast"] - df["generation_clean_forecast"]
-    )
+# Every correlation the search evaluated, so searches resume without recomputing
+HISTORY_FILE = "fine_tune_history.parquet"
+HISTORY_KEY = ["window_days", "bottom_q", "top_q", "days", "end"]
 
-    df["peak_hours_top_forecast"] = (
-        df["demand-generation-clean_forecast"].rolling(rolling_window).quantile(top_q)
-    )
-    df["peak_hours_bottom_forecast"] = (
-        df["demand-generation-clean_forecast"]
-        .rolling(rolling_window)
-        .quantile(bottom_q)
-    )
-
-    df["peak_hours_forecast"] = np.where(
-        df["demand-generation-clean_forecast"] > df["peak_hours_top_forecast"], 2, 1
-    )
 
-    df["peak_hours_forecast"] = np.where(
-        df["demand-generation-clean_forecast"] < df["peak_hours_bottom_forecast"],
-        0,
-        df["peak_hours_forecast"],
-    )
-    # Clean up
-    df = df.drop(
+def load_dataframe():
+    return read_frame(
+        "combined.parquet",
         columns=[
-            "peak_hours_top_forecast",
-            "peak_hours_bottom_forecast",
-            "demand-generation-clean_forecast",
-            "generation_clean_forecast",
-        ]
-    )
-    return df
+            "wind_actual",
+            "pv_actual",
+            "demand_kse_forecast",
+            "peak_hours_actual",
+        ],
+    ).astype("float64")
 
 
-def calculate_peak_hours_actual(
-    df, rolling_window=24 * 4 * 21, bottom_q=0.15, top_q=0.85
-):
-    df["generation_clean_actual"] = df["wind_actual"] + df["pv_actual"]
-    df["demand-generation-clean_actual"] = (
-        df["demand_kse_forecast"] - df["generation_clean_actual"]
-    )  # Assuming 'demand_kse_actual' is the correct column name; adjust if needed
+def residual_demand(df):
+    """Forecast demand minus the clean (wind + PV) generation."""
+    return df["demand_kse_forecast"] - (df["wind_actual"] + df["pv_actual"])
 
-    df["peak_hours_top_actual"] = (
-        df["demand-generation-clean_actual"].rolling(rolling_window).quantile(top_q)
-    )
-    df["peak_hours_bottom_actual"] = (
-        df["demand-generation-clean_actual"].rolling(rolling_window).quantile(bottom_q)
-    )
 
-    df["peak_hours_forecast"] = np.where(
-        df["demand-generation-clean_actual"] > df["peak_hours_top_actual"], 2, 1
+def peak_hours_regimes(values, rolling_window, bottom_q, top_q):
+    """
+    Peak hours regime of every row for every (bottom_q[i], top_q[i]) pair:
+    2 above the rolling top quantile, 0 below the rolling bottom quantile,
+    1 otherwise. All quantiles come from one set of sorted rolling windows.
+    Returns an (n, len(bottom_q)) int8 array.
+    """
+    bottom_q = np.asarray(bottom_q, dtype="float64")
+    top_q = np.asarray(top_q, dtype="float64")
+    quantiles, positions = np.unique(
+        np.concatenate([bottom_q, top_q]), return_inverse=True
     )
-
-    df["peak_hours_forecast"] = np.where(
-        df["demand-generation-clean_actual"] < df["peak_hours_bottom_actual"],
-        0,
-        df["peak_hours_forecast"],
-    )
-    # Clean up
-    df = df.drop(
-        columns=[
-            "peak_hours_top_actual",
-            "peak_hours_bottom_actual",
-            "demand-generation-clean_actual",
-            "generation_clean_actual",
-        ]
-    )
-    return df
+    bands = rolling_quantiles(values, rolling_window, quantiles)
+    bottom = bands[:, positions[: len(bottom_q)]]
+    top = bands[:, positions[len(bottom_q) :]]
+    values = np.asarray(values, dtype="float64")[:, None]
+    regimes = np.where(values > top, 2, 1).astype("int8")
+    regimes[values < bottom] = 0
+    return regimes
 
 
 def get_correlation(df, forecast_col, actual_col):
@@ -109,63 +79,219 @@ def get_correlation(df, forecast_col, actual_col):
     return correlation
 
 
+def correlations(actual, regimes):
+    """
+    get_correlation of `actual` with every column of `regimes` at once,
+    on the rows where actual is known.
+    """
+    known = ~np.isnan(actual)
+    if known.sum() < 2:
+        return np.full(regimes.shape[1], np.nan)
+    actual = actual[known] - actual[known].mean()
+    regimes = regimes[known].astype("float64")
+    regimes -= regimes.mean(axis=0)
+    std_a = np.sqrt(actual @ actual)
+    std_f = np.sqrt(np.einsum("ij,ij->j", regimes, regimes))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = (actual @ regimes) / (std_a * std_f)
+    out[(std_a == 0) | (std_f == 0)] = 0.0
+    return out
+
+
+# Sweep inputs of a worker process, set once by _init_worker
+_sweep = {}
+
+
+def _init_worker(values, actual, thresholds):
+    _sweep.update(values=values, actual=actual, thresholds=thresholds)
+
+
+def sweep_window(days):
+    """Correlations of every threshold for one rolling window length in days."""
+    k = np.asarray(_sweep["thresholds"], dtype="float64") / 100.0
+    regimes = peak_hours_regimes(_sweep["values"], days * ROWS_PER_DAY, k, 1.0 - k)
+    return correlations(_sweep["actual"], regimes)
+
+
+def sweep(df, window_days=WINDOW_DAYS, thresholds=THRESHOLDS, workers=1):
+    """
+    Correlation of PSE's peak_hours_actual with the peak hours regime for
+    every (window, threshold) pair, as a (len(window_days), len(thresholds))
+    array. Window lengths are spread across `workers` processes.
+    """
+    args = (
+        residual_demand(df).to_numpy(),
+        df["peak_hours_actual"].to_numpy(dtype="float64"),
+        list(thresholds),
+    )
+    if workers > 1:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=args
+        ) as pool:
+            rows = list(pool.map(sweep_window, window_days))
+    else:
+        _init_worker(*args)
+        rows = [sweep_window(days) for days in window_days]
+    return np.vstack(rows)
+
+
+def sample_configs(n, seed=0):
+    """
+    n distinct random (window_days, bottom_q, top_q) configurations: the
+    first n of one seeded shuffle of the whole search grid, so a larger n
+    extends a smaller sample (and reuses its cached evaluations).
+
+    >>> sample_configs(162).head(81).equals(sample_configs(81))
+    True
+    """
+    grid = [
+        np.arange(low, high + 1)
+        for low, high in (SEARCH_WINDOW_DAYS, SEARCH_BOTTOM, SEARCH_TOP)
+    ]
+    sizes = [len(values) for values in grid]
+    picks = np.random.default_rng(seed).permutation(np.prod(sizes))[:n]
+    window_days, bottom_q, top_q = (
+        values[index] for values, index in zip(grid, np.unravel_index(picks, sizes))
+    )
+    return pd.DataFrame(
+        {"window_days": window_days, "bottom_q": bottom_q / 100, "top_q": top_q / 100}
+    )
+
+
+def evaluate_configs(values, actual, configs, days):
+    """
+    Correlation of every configuration on the last `days` days only. The
+    rolling windows start one window earlier, so the bands of the first
+    evaluated row are already complete; each window length is one pass.
+    """
+    rows = min(days * ROWS_PER_DAY, len(values))
+    scores = np.full(len(configs), np.nan)
+    for window_days, group in configs.groupby("window_days"):
+        window = int(window_days) * ROWS_PER_DAY
+        start = max(len(values) - rows - window + 1, 0)
+        regimes = peak_hours_regimes(
+            values[start:], window, group["bottom_q"], group["top_q"]
+        )
+        positions = configs.index.get_indexer(group.index)
+        scores[positions] = correlations(actual[-rows:], regimes[-rows:])
+    return scores
+
+
+def load_history():
+    """Evaluations of earlier searches (empty frame when there are none)."""
+    try:
+        return read_frame(HISTORY_FILE)
+    except FileNotFoundError:
+        return pd.DataFrame(
+            {
+                "window_days": pd.Series(dtype="int64"),
+                "bottom_q": pd.Series(dtype="float64"),
+                "top_q": pd.Series(dtype="float64"),
+                "days": pd.Series(dtype="int64"),
+                "end": pd.Series(dtype="datetime64[ns, UTC]"),
+                "correlation": pd.Series(dtype="float64"),
+            }
+        )
+
+
+def successive_halving(df, candidates=81, eta=3, min_days=30, seed=0):
+    """
+    Successive halving over window x bottom_q x top_q: all candidates are
+    scored on the last `min_days` days, the best 1/eta of them go on to
+    eta times as many days, until the survivors are scored on all data (a
+    single survivor is scored on all data right away).
+    Evaluations are cached in HISTORY_FILE, keyed by configuration, days
+    and the last timestamp of the data, and are never recomputed.
+    Returns the last rung's configurations, best first.
+    """
+    values = residual_demand(df).to_numpy()
+    actual = df["peak_hours_actual"].to_numpy(dtype="float64")
+    end = df.index[-1]
+    total_days = -(-len(values) // ROWS_PER_DAY)
+    history = load_history()
+    configs = sample_configs(candidates, seed)
+    days = min_days
+    while True:
+        days = min(days, total_days)
+        rung = configs.assign(days=days, end=end)
+        rung = rung.merge(history, on=HISTORY_KEY, how="left", indicator=True)
+        missing = (rung.pop("_merge") == "left_only").to_numpy()
+        if missing.any():
+            todo = rung[missing].reset_index(drop=True)
+            todo["correlation"] = evaluate_configs(values, actual, todo, days)
+            rung.loc[missing, "correlation"] = todo["correlation"].to_numpy()
+            history = pd.concat([history, todo], ignore_index=True)
+            write_frame(history, HISTORY_FILE, index=False)
+        print(f"{days} days: {len(rung)} configurations")
+        if days >= total_days:
+            return rung.sort_values("correlation", ascending=False, ignore_index=True)
+        keep = max(len(rung) // eta, 1)
+        configs = rung.nlargest(keep, "correlation")[configs.columns]
+        # nothing is left to select between, the last survivor goes to all data
+        days = total_days if keep == 1 else days * eta
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Sweep peak hours rolling windows and quantile thresholds."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="Processes the window lengths are spread across.",
+    )
+    parser.add_argument(
+        "--search",
+        choices=["grid", "halving"],
+        default="grid",
+        help="Full grid heatmap, or successive halving over window, bottom_q and top_q.",
+    )
+    parser.add_argument(
+        "--candidates",
+        type=int,
+        default=81,
+        help="Random configurations the halving search starts from.",
+    )
+    parser.add_argument(
+        "--eta", type=int, default=3, help="Halving rate: keep 1/eta per rung."
+    )
+    parser.add_argument(
+        "--min_days", type=int, default=30, help="Days of data in the first rung."
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="Seed of the random configurations."
+    )
+    args = parser.parse_args()
+
     # Load the dataframe
-    df = load_dataframe()  # Assuming this function exists; adjust as needed
-
-    # Parameter ranges
-    days_list = list(range(1, 81, 5))
-    quantile_list = list(range(1, 81, 5))
-    results = np.zeros((len(days_list), len(quantile_list)))
-
-    for i, days in enumerate(days_list):
-        print(f"day {days}")
-        rolling_window = 14 * 24 * 4  # Assuming 15-minute intervals (96 per day)
-        for j, k in enumerate(quantile_list):
-            bottom_q = k / 100.0
-            top_q = 1.0 - (days / 100.0)
-
-            # Compute actual
-            df_actual = calculate_peak_hours_actual(
-                df.copy(), rolling_window, bottom_q, top_q
-            )
+    df = load_dataframe()
+    if args.search == "halving":
+        best = successive_halving(
+            df, args.candidates, args.eta, args.min_days, args.seed
+        )
+        print(best.head(10).to_string(index=False))
+    else:
+        results = sweep(df, WINDOW_DAYS, THRESHOLDS, workers=args.workers)
 
-            # Compute forecast
-            df_forecast = calculate_peak_hours_forecast(
-                df.copy(), rolling_window, bottom_q, top_q
-            )
+        import plotly.graph_objects as go
 
-            # To correlate, we can use one df, but since columns are different, merge or use separate
-            # Assuming indices match, we can add forecast to actual df or compute corr directly
-            corr = get_correlation(
-                pd.concat(
-                    [
-                        df_actual["peak_hours_actual"],
-                        df_forecast["peak_hours_forecast"],
-                    ],
-                    axis=1,
-                ),
-                "peak_hours_forecast",
-                "peak_hours_actual",
+        # Create heatmap
+        fig = go.Figure(
+            data=go.Heatmap(
+                z=results,
+                x=THRESHOLDS,
+                y=WINDOW_DAYS,
+                colorscale="Viridis",
+                zmin=0.4,
+                zmax=0.55,
             )
-            results[i, j] = corr
-
-    # Create heatmap
-    fig = go.Figure(
-        data=go.Heatmap(
-            z=results,
-            x=quantile_list,
-            y=days_list,
-            colorscale="Viridis",
-            zmin=0.4,
-            zmax=0.55,
         )
-    )
 
-    fig.update_layout(
-        title="Pearson Correlation Heatmap for Peak Hours Forecast",
-        xaxis_title="Quantiles Threshold (1-50 for bottom, top=100 - threshold)",
-        yaxis_title="Rolling Window (days)",
-    )
+        fig.update_layout(
+            title="Pearson Correlation Heatmap for Peak Hours Forecast",
+            xaxis_title="Quantiles Threshold (bottom = threshold, top = 100 - threshold)",
+            yaxis_title="Rolling Window (days)",
+        )
 
-    fig.show()
+        fig.show()
@@ -0,0 +1,470 @@
+import argparse
+import importlib
+import sys
+import numpy as np
+import pandas as pd
+import statsmodels.api as sm
+from feature_engineering import (
+    FORECAST_COLUMNS,
+    PEAK_QUANTILES,
+    PEAK_WINDOW,
+    SPIKE_QUANTILES,
+    SPIKE_WINDOW,
+    fix_forecasts,
+)
+from merge_dataframes import front_fill_within_hour
+from rolling import rolling_quantile_frame
+from storage import read_frame
+from synthetic import simulate
+from timecore import TZ, LocalCalendar, add_utc_25, add_utc_25_15min
+from train_model import create_weighted_model
+
+# Span the inputs are built over: both DST changes of 2024 and enough
+# history for the 14 day rolling window
+START = "2024-02-01"
+END = "2024-11-15"
+
+# Target of the weighted model; every other column of the frame is a feature
+TARGET = "bilans_price"
+
+# Share of values set to NaN and of quarter-hours dropped from the
+# synthetic frame, so missing data paths are exercised
+MISSING = 0.03
+DROPPED = 0.005
+
+# Tolerances of the numeric comparison, per case (default: DEFAULT_TOLERANCE)
+DEFAULT_TOLERANCE = {"rtol": 1e-9, "atol": 1e-9}
+TOLERANCES = {"create_weighted_model": {"rtol": 1e-7, "atol": 1e-7}}
+
+# Training windows fitted by the create_weighted_model case, and how many
+# test days (spread over the span, DST days included) it fits
+TRAIN_DAYS = 30
+MODEL_DAYS = 8
+
+
+# Reference implementations: the original, unoptimized code, kept verbatim
+# (apart from their names) as the ground truth of the fast paths
+
+
+def reference_add_utc_25(
+    df: pd.DataFrame,
+    date_col: str = "date",
+    hour_col: str = "hour",
+    tz: str = "Europe/Warsaw",
+    out_col: str = "Date_utc",
+    local_col: str = "Date_cet",
+) -> pd.DataFrame:
+    out = df.copy()
+    out["_date_key"] = pd.to_datetime(out[date_col]).dt.normalize()
+    out[hour_col] = out[hour_col].astype(int)
+    maps = []
+    for d in out["_date_key"].dropna().unique():
+        start = pd.Timestamp(d).tz_localize(tz)
+        end = (pd.Timestamp(d) + pd.Timedelta(days=1)).tz_localize(tz)
+        rng = pd.date_range(start, end, freq="h", inclusive="left")
+        maps.append(
+            pd.DataFrame(
+                {
+                    "_date_key": d,
+                    hour_col: np.arange(0, len(rng), dtype=int),
+                    local_col: rng,
+                }
+            )
+        )
+    mapping = (
+        pd.concat(maps, ignore_index=True)
+        if maps
+        else pd.DataFrame(columns=["_date_key", hour_col, local_col])
+    )
+    out = out.merge(mapping, on=["_date_key", hour_col], how="left")
+    out[out_col] = out[local_col].dt.tz_convert("UTC")
+    out.drop(columns=["_date_key"], inplace=True)
+    return out
+
+
+def reference_add_utc_25_15min(
+    df: pd.DataFrame,
+    date_col: str = "date",
+    hour_index_col: str = "hour_index",
+    tz: str = "Europe/Warsaw",
+    out_col: str = "Date_utc",
+    local_col: str = "Date_cet",
+) -> pd.DataFrame:
+    out = df.copy()
+    out["_date_key"] = pd.to_datetime(out[date_col]).dt.normalize()
+    out[hour_index_col] = out[hour_index_col].astype(int)
+
+    maps = []
+    for d in out["_date_key"].dropna().unique():
+        start = pd.Timestamp(d).tz_localize(tz)
+        end = (pd.Timestamp(d) + pd.Timedelta(days=1)).tz_localize(tz)
+        rng = pd.date_range(start, end, freq="15min", inclusive="left")
+        maps.append(
+            pd.DataFrame(
+                {
+                    "_date_key": d,
+                    hour_index_col: np.arange(0, len(rng), dtype=int),
+                    local_col: rng,
+                }
+            )
+        )
+    mapping = (
+        pd.concat(maps, ignore_index=True)
+        if maps
+        else pd.DataFrame(columns=["_date_key", hour_index_col, local_col])
+    )
+    out = out.merge(mapping, on=["_date_key", hour_index_col], how="left")
+    out[out_col] = out[local_col].dt.tz_convert("UTC")
+    out.drop(columns=["_date_key"], inplace=True)
+    return out
+
+
+def reference_front_fill_within_hour(df, column_to_fill):
+    df["hour"] = df.index.strftime("%Y-%m-%d %H:00:00")
+    df[column_to_fill] = (
+        df[column_to_fill].groupby(df["hour"]).transform(lambda x: x.ffill())
+    )
+    df = df.drop("hour", axis=1)
+    return df
+
+
+def reference_fix_forecasts(df: pd.DataFrame, forecast_columns) -> pd.DataFrame:
+    for col in forecast_columns:
+        df[f"{col}_fix"] = df[col] * 10 / 16 + df[col].shift(-4) * 6 / 16
+
+    df = df.resample("15min").asfreq()
+
+    for col in forecast_columns:
+        df[f"{col}_interpolate"] = df[col].interpolate(method="index")
+        df[f"{col}_fix"] = df[f"{col}_fix"].ffill()
+        df[col] = df[col].ffill()
+
+    return df
+
+
+def reference_rolling_quantile_frame(series, window, quantiles):
+    return pd.DataFrame(
+        {q: series.rolling(window).quantile(q) for q in quantiles},
+        index=series.index,
+    )
+
+
+def reference_create_weighted_model(
+    df, predicted_value, col_x, end_train, train_days, weight_type
+):
+    start_train = end_train - pd.Timedelta(days=train_days)
+    train_mask = (df.index >= start_train) & (df.index <= end_train)
+    df_train = df[train_mask].copy()
+    if df_train.empty:
+        return None
+    n_samples = len(df_train)
+    if weight_type == "exp":
+        weights = np.exp(-np.arange(n_samples)[::-1] / n_samples)
+    elif weight_type == "linear":
+        weights = np.arange(1, n_samples + 1) / n_samples
+    elif weight_type == "none":
+        weights = np.ones(n_samples)
+    else:
+        raise ValueError(f"Unknown weight_type: {weight_type}")
+    df_train["weight"] = weights
+    X = sm.add_constant(df_train[col_x], has_constant="add")
+    y = df_train[predicted_value]
+    weights = df_train["weight"]
+    try:
+        wls_model = sm.WLS(y, X, weights=weights)
+        return wls_model.fit()
+    except Exception as e:
+        print(f"Error during model fitting: {e}")
+        return None
+
+
+def dst_days(start=START, end=END):
+    """Local dates in [start, end) that are not 24 hours long."""
+    days = pd.date_range(start, end, freq="D", tz=TZ)
+    hours = np.diff(days.asi8) // (3600 * 10**9)
+    return days[:-1][hours != 24].tz_localize(None)
+
+
+def synthetic_frame(start=START, end=END, seed=0):
+    """
+    A 15 minute frame on Date_utc shaped like combined.parquet: TARGET and
+    forecast columns (hourly ones only set on the hour, one stored as
+    float32), with NaN holes and a few dropped quarter-hours.
+    """
+    truth = simulate(start, end, seed)
+    rng = np.random.default_rng(seed + 1)
+    frame = pd.DataFrame(
+        {
+            TARGET: truth["bilans_price"],
+            "demand_forecast": truth["demand"],
+            "pv_forecast": truth["pv"].where(truth.index.minute == 0),
+            "wind_forecast": truth["wind"].astype("float32"),
+            "cb_flow_forecast": truth["flow"].where(truth.index.minute == 0),
+        }
+    )
+    holes = rng.random(frame.shape) < MISSING
+    holes[:, 0] = False
+    frame = frame.mask(holes)
+    return frame[rng.random(len(frame)) >= DROPPED]
+
+
+def cached_frame(start=START, end=END):
+    """TARGET and the forecast columns of out/combined.parquet over [start, end)."""
+    frame = read_frame("combined.parquet", start=start, end=end).sort_index()
+    columns = [TARGET, *[col for col in FORECAST_COLUMNS if col in frame.columns]]
+    return frame[columns]
+
+
+def local_slots(days, freq):
+    """
+    (date, slot) rows of every slot of the local days [days[0], days[-1]],
+    plus one slot past the end of every day, which maps to NaT.
+    """
+    bounds = pd.date_range(days[0], days[-1] + pd.Timedelta(days=1), freq="D", tz=TZ)
+    counts = np.diff(bounds.asi8) // pd.tseries.frequencies.to_offset(freq).nanos + 1
+    dates = np.repeat(bounds[:-1].tz_localize(None).strftime("%Y-%m-%d"), counts)
+    slots = np.arange(len(dates)) - np.repeat(np.cumsum(counts) - counts, counts)
+    return pd.DataFrame({"date": dates, "slot": slots})
+
+
+def local_dates(values):
+    """Local dates (naive Timestamps) of UTC timestamps."""
+    return pd.DatetimeIndex(LocalCalendar.of(values).date.astype("datetime64[ns]"))
+
+
+def case_add_utc_25(frame, days, candidate):
+    slots = local_slots(days, "h").rename(columns={"slot": "hour"})
+    expected = reference_add_utc_25(slots)
+    actual = candidate(slots, local_col="Date_cet")
+    return expected, actual, pd.to_datetime(expected["date"])
+
+
+def case_add_utc_25_15min(frame, days, candidate):
+    slots = local_slots(days, "15min").rename(columns={"slot": "hour_index"})
+    expected = reference_add_utc_25_15min(slots)
+    actual = candidate(slots, local_col="Date_cet")
+    return expected, actual, pd.to_datetime(expected["date"])
+
+
+def case_front_fill_within_hour(frame, days, candidate):
+    columns = [col for col in frame.columns if col != TARGET]
+    expected, actual = frame.copy(), frame.copy()
+    for col in columns:
+        expected = reference_front_fill_within_hour(expected, col)
+        actual = candidate(actual, col)
+    return expected, actual, local_dates(expected.index)
+
+
+def case_fix_forecasts(frame, days, candidate):
+    columns = [col for col in frame.columns if col != TARGET]
+    expected = reference_fix_forecasts(frame.copy(), columns)
+    actual = candidate(frame.copy(), columns)
+    return expected, actual, local_dates(expected.index)
+
+
+def case_rolling_quantiles(frame, days, candidate):
+    expected, actual = {}, {}
+    for col in frame.columns:
+        series = frame[col].astype("float64")
+        for window, quantiles in [
+            (PEAK_WINDOW, PEAK_QUANTILES),
+            (SPIKE_WINDOW, SPIKE_QUANTILES),
+        ]:
+            for bands, function in [
+                (expected, reference_rolling_quantile_frame),
+                (actual, candidate),
+            ]:
+                table = function(series, window, quantiles)
+                for q in quantiles:
+                    bands[f"{col} {window} q{q:g}"] = table[q]
+    expected = pd.DataFrame(expected, index=frame.index)
+    actual = pd.DataFrame(actual, index=frame.index)
+    return expected, actual, local_dates(expected.index)
+
+
+def case_create_weighted_model(frame, days, candidate):
+    """
+    Parameters of the weighted model fitted for MODEL_DAYS test days (the
+    DST days among them) with every weight type, indexed by (test day,
+    weight type), as train_model.py fits them: on a date index.
+    """
+    columns = [col for col in frame.columns if col != TARGET]
+    data = frame.astype("float64").dropna()
+    dates = pd.Index(data.index.date)
+    data = data.set_axis(dates)
+    # test days spread over the span, and every DST day
+    available = dates.unique()[TRAIN_DAYS + 3 :]
+    spread = available[np.linspace(0, len(available) - 1, MODEL_DAYS).astype(int)]
+    dst = {day.date() for day in days} & set(available)
+    test_days = sorted(set(spread) | dst)
+    expected, actual, keys = [], [], []
+    for day in test_days:
+        end_train = day - pd.Timedelta(days=3)
+        for weight_type in ["exp", "linear", "none"]:
+            for params, function in [
+                (expected, reference_create_weighted_model),
+                (actual, candidate),
+            ]:
+                result = function(
+                    data, TARGET, columns, end_train, TRAIN_DAYS, weight_type
+                )
+                params.append(
+                    result.params if result is not None else pd.Series(dtype="float64")
+                )
+            keys.append((pd.Timestamp(day), weight_type))
+    index = pd.MultiIndex.from_tuples(keys, names=["date", "weight_type"])
+    expected = pd.DataFrame(expected).set_axis(index)
+    actual = pd.DataFrame(actual).set_axis(index)
+    return expected, actual, index.get_level_values("date")
+
+
+# Every case: (builder, current fast path). A builder gets the input frame,
+# the DST days and the candidate and returns (expected, actual, local date
+# of every row), the dates picking out the DST day rows
+CASES = {
+    "add_utc_25": (case_add_utc_25, add_utc_25),
+    "add_utc_25_15min": (case_add_utc_25_15min, add_utc_25_15min),
+    "front_fill_within_hour": (case_front_fill_within_hour, front_fill_within_hour),
+    "fix_forecasts": (case_fix_forecasts, fix_forecasts),
+    "rolling_quantiles": (case_rolling_quantiles, rolling_quantile_frame),
+    "create_weighted_model": (case_create_weighted_model, create_weighted_model),
+}
+
+
+def compare_columns(expected, actual, rtol, atol):
+    """
+    Column by column comparison of two frames with the same layout: numeric
+    columns within rtol/atol, everything else exactly, NaN/NaT matching
+    NaN/NaT. Returns one row per column (plus layout checks).
+    """
+    rows = [
+        {
+            "column": "<columns>",
+            "mismatches": int(list(expected.columns) != list(actual.columns)),
+        },
+        {
+            "column": "<index>",
+            "mismatches": int(
+                len(expected) != len(actual) or not expected.index.equals(actual.index)
+            ),
+        },
+    ]
+    for col in expected.columns:
+        row = {"column": col, "dtype": str(expected[col].dtype)}
+        if col not in actual.columns or len(actual) != len(expected):
+            rows.append({**row, "mismatches": len(expected)})
+            continue
+        e, a = expected[col], actual[col]
+        row["dtype_equal"] = e.dtype == a.dtype
+        missing = e.isna().to_numpy()
+        same_missing = missing == a.isna().to_numpy()
+        if pd.api.types.is_numeric_dtype(e) and pd.api.types.is_numeric_dtype(a):
+            ev, av = e.to_numpy(dtype="float64"), a.to_numpy(dtype="float64")
+            close = np.isclose(av, ev, rtol=rtol, atol=atol, equal_nan=True)
+            diff = np.abs(av - ev)
+            row["max_abs_diff"] = np.nanmax(diff) if (~np.isnan(diff)).any() else 0.0
+        else:
+            close = (e.to_numpy() == a.to_numpy()) | missing
+        row["mismatches"] = int((~(close & same_missing)).sum())
+        rows.append(row)
+    table = pd.DataFrame(rows)
+    dtype_equal = table.get("dtype_equal", pd.Series(True, index=table.index))
+    table["passed"] = (table["mismatches"] == 0) & ~dtype_equal.eq(False)
+    return table
+
+
+def run_case(name, frame, days, candidate=None):
+    """
+    Compare the reference of case `name` with `candidate` (default: the
+    current fast path) over all rows and over the DST day rows alone.
+    """
+    build, current = CASES[name]
+    expected, actual, dates = build(frame, days, candidate or current)
+    tolerance = TOLERANCES.get(name, DEFAULT_TOLERANCE)
+    tables = [compare_columns(expected, actual, **tolerance).assign(rows="all")]
+    # the DST day rows alone, when the layouts line up
+    if len(actual) == len(expected):
+        on_dst = pd.DatetimeIndex(dates).isin(days)
+        tables.append(
+            compare_columns(expected[on_dst], actual[on_dst], **tolerance).assign(
+                rows=f"DST ({int(on_dst.sum())})"
+            )
+        )
+    return pd.concat(tables, ignore_index=True).assign(case=name)
+
+
+def load_candidate(spec):
+    """A function given as module:function, imported from scripts/."""
+    module, function = spec.split(":")
+    return getattr(importlib.import_module(module), function)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Check optimized code paths against their reference implementations."
+    )
+    parser.add_argument(
+        "--cases",
+        nargs="+",
+        choices=list(CASES),
+        default=list(CASES),
+        help="Cases to run.",
+    )
+    parser.add_argument(
+        "--candidate",
+        nargs="+",
+        default=[],
+        metavar="CASE=MODULE:FUNCTION",
+        help="Compare a case against another implementation than the current one.",
+    )
+    parser.add_argument(
+        "--start", default=START, help="First local date of the inputs."
+    )
+    parser.add_argument("--end", default=END, help="Last local date (exclusive).")
+    parser.add_argument(
+        "--cached",
+        action="store_true",
+        help="Take the input frame from out/combined.parquet instead of synthetic data.",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="Seed of the synthetic data."
+    )
+    parser.add_argument(
+        "--all", action="store_true", help="Print every column, not only failures."
+    )
+    args = parser.parse_args()
+
+    candidates = dict(spec.split("=", 1) for spec in args.candidate)
+    unknown = set(candidates) - set(CASES)
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(sorted(unknown))}")
+    days = dst_days(args.start, args.end)
+    if days.empty:
+        parser.error("the span has no DST change day")
+    frame = (
+        cached_frame(args.start, args.end)
+        if args.cached
+        else synthetic_frame(args.start, args.end, args.seed)
+    )
+
+    tables = []
+    for name in args.cases:
+        candidate = load_candidate(candidates[name]) if name in candidates else None
+        tables.append(run_case(name, frame, days, candidate))
+    table = pd.concat(tables, ignore_index=True)
+    summary = table.groupby(["case", "rows"], sort=False).agg(
+        columns=("column", "size"),
+        failed=("passed", lambda passed: int((~passed).sum())),
+        mismatches=("mismatches", "sum"),
+        max_abs_diff=("max_abs_diff", "max"),
+    )
+    print(f"DST days: {', '.join(days.strftime('%Y-%m-%d'))}")
+    print(summary.to_string(float_format="{:.3g}".format))
+    shown = table if args.all else table[~table["passed"]]
+    if not shown.empty:
+        columns = ["case", "rows", "column", "dtype", "mismatches", "max_abs_diff"]
+        print(shown[[col for col in columns if col in shown]].to_string(index=False))
+    if not table["passed"].all():
+        print("FAILED: outputs differ from the reference implementations")
+        sys.exit(1)
+    print("All outputs match the reference implementations")
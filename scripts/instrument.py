@@ -0,0 +1,314 @@
+import argparse
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+import pandas as pd
+from storage import io_totals, out_path
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# Step metrics of every run, one JSON object per line
+RUN_LOG = "run_metrics.jsonl"
+
+# Folded stacks of --profile runs, one file per stage and run
+PROFILE_DIR = "profile"
+
+# Environment variables: run id shared by the stages of one pipeline run
+# (set by the .sh scripts), and profiling for stages without a --profile
+# flag (the ingestion notebooks)
+RUN_ID_VARIABLE = "POWER_RUN_ID"
+PROFILE_VARIABLE = "POWER_PROFILE"
+
+# Seconds between two stack samples of the profiler
+SAMPLE_INTERVAL = 0.005
+
+# Seconds between two readings of the resident memory of the open steps
+RSS_INTERVAL = 0.01
+
+# Stage of this process, set by start_stage
+_stage = {}
+
+# Original sys.excepthook and sys.exit, wrapped by _install_exit_hooks
+_hooks = {}
+
+
+def run_id():
+    """Id of the current pipeline run: POWER_RUN_ID, or one for this process."""
+    if not os.environ.get(RUN_ID_VARIABLE):
+        os.environ[RUN_ID_VARIABLE] = time.strftime("%Y%m%dT%H%M%S") + f"-{os.getpid()}"
+    return os.environ[RUN_ID_VARIABLE]
+
+
+def process_peak_rss_mb():
+    """
+    Peak resident memory of this process so far, in MB. Cumulative: every
+    step after the heaviest one reports the same value.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def rss_mb():
+    """Current resident memory of this process in MB (None without /proc)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except OSError:
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+class RssSampler:
+    """
+    Peak resident memory of every open step: a daemon thread reads the
+    current RSS every `interval` seconds and raises the peak of the steps
+    open at that moment, so nested and consecutive steps each get their own.
+    """
+
+    def __init__(self, interval=RSS_INTERVAL):
+        self.interval = interval
+        self.peaks = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def open(self):
+        """Start tracking a step; returns its key and the RSS at its start."""
+        current = rss_mb()
+        if current is None:
+            return None, None
+        key = object()
+        with self._lock:
+            self.peaks[key] = current
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._sample, daemon=True)
+                self._thread.start()
+        return key, current
+
+    def close(self, key):
+        """Stop tracking the step `key`; returns its peak RSS."""
+        if key is None:
+            return None
+        current = rss_mb()
+        with self._lock:
+            return max(self.peaks.pop(key), current)
+
+    def _sample(self):
+        while True:
+            time.sleep(self.interval)
+            current = rss_mb()
+            with self._lock:
+                for key, peak in self.peaks.items():
+                    if current > peak:
+                        self.peaks[key] = current
+
+
+_rss = RssSampler()
+
+
+def _write(record):
+    with open(out_path / RUN_LOG, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+@contextmanager
+def step(name):
+    """
+    Record the wall time, CPU time, memory and the rows and bytes read and
+    written through storage of the enclosed block as step `name` of the
+    current stage. Memory is the RSS at the start of the step, its sampled
+    peak during the step and the increase between them, next to the
+    cumulative peak of the process. `status` is "failed" when the block
+    raised. The yielded dict may be given more fields (e.g. rows when the
+    step does not go through storage), which are logged with it.
+    """
+    record = {}
+    io = dict(io_totals)
+    started = time.strftime("%Y-%m-%dT%H:%M:%S")
+    key, rss_start = _rss.open()
+    wall, cpu = time.perf_counter(), time.process_time()
+    status = "ok"
+    try:
+        yield record
+    except BaseException as error:
+        # sys.exit(0) within a step is a clean end
+        if not (isinstance(error, SystemExit) and not error.code):
+            status = "failed"
+        raise
+    finally:
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        peak = _rss.close(key)
+        metrics = {
+            "run": run_id(),
+            "stage": _stage.get("name"),
+            "step": name,
+            "status": status,
+            "started": started,
+            "wall_s": wall,
+            "cpu_s": cpu,
+            "rss_start_mb": rss_start,
+            "peak_rss_mb": peak,
+            "rss_increase_mb": None if peak is None else peak - rss_start,
+            "process_peak_rss_mb": process_peak_rss_mb(),
+            "rows_in": io_totals["rows_read"] - io["rows_read"],
+            "rows_out": io_totals["rows_written"] - io["rows_written"],
+            "bytes_read": io_totals["bytes_read"] - io["bytes_read"],
+            "bytes_written": io_totals["bytes_written"] - io["bytes_written"],
+        }
+        _write({**metrics, **record})
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler of one thread: a daemon thread samples its stack
+    through sys._current_frames every `interval` seconds and counts the
+    stacks. Works across C extensions without tracing every call, so the
+    stage runs at nearly full speed.
+    """
+
+    def __init__(self, thread=None, interval=SAMPLE_INTERVAL):
+        self.target = (thread or threading.main_thread()).ident
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{Path(code.co_filename).name}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path):
+        """Write the samples as folded stacks (flamegraph.pl / speedscope input)."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def top(self, n=15):
+        """Top functions by % of samples on the stack (inclusive) and on top (self)."""
+        inclusive, own = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            for frame in set(frames):
+                inclusive[frame] += count
+            own[frames[-1]] += count
+        total = sum(self.stacks.values())
+        table = pd.DataFrame(
+            {"inclusive %": pd.Series(inclusive), "self %": pd.Series(own)}
+        ).fillna(0)
+        return (table / total * 100).nlargest(n, "inclusive %")
+
+
+def start_stage(name, profile=False):
+    """
+    Instrument this process as pipeline stage `name`: its whole run is
+    logged as step "total" when the process exits (or at end_stage), and
+    with `profile` (or POWER_PROFILE set) it is sampled by a
+    SamplingProfiler, written to out/profile/<name>-<run>.folded. Returns
+    the record of the total, for fields to log with it. While a stage is
+    open (e.g. a notebook cell run again) this is a no-op.
+    """
+    if "total" in _stage:
+        return _stage["record"]
+    profile = profile or bool(os.environ.get(PROFILE_VARIABLE))
+    total = step("total")
+    _stage.pop("error", None)
+    _stage.update(
+        name=name,
+        total=total,
+        record=total.__enter__(),
+        profiler=SamplingProfiler().start() if profile else None,
+    )
+    _install_exit_hooks()
+    return _stage["record"]
+
+
+def _install_exit_hooks():
+    """
+    Once per process: note an uncaught exception (sys.excepthook) or a
+    non-zero sys.exit as the error of the stage, and end the stage at exit.
+    """
+    if _hooks:
+        return
+    _hooks.update(excepthook=sys.excepthook, exit=sys.exit)
+
+    def excepthook(kind, value, traceback):
+        _stage.setdefault("error", value)
+        _hooks["excepthook"](kind, value, traceback)
+
+    def exit(status=None):
+        if status not in (None, 0):
+            _stage.setdefault("error", SystemExit(status))
+        _hooks["exit"](status)
+
+    sys.excepthook = excepthook
+    sys.exit = exit
+    atexit.register(_end_stage_at_exit)
+
+
+def _end_stage_at_exit():
+    end_stage(_stage.pop("error", None))
+
+
+def end_stage(error=None):
+    """
+    Log the total of the current stage and write its profile; idempotent.
+    With `error` (the uncaught exception or failed exit at interpreter
+    exit) the total is logged as failed.
+    """
+    if "total" not in _stage:
+        return
+    profiler = _stage.pop("profiler")
+    if error is None:
+        _stage.pop("total").__exit__(None, None, None)
+    else:
+        _stage.pop("total").__exit__(type(error), error, error.__traceback__)
+    if profiler is not None:
+        profiler.stop()
+        path = out_path / PROFILE_DIR / f"{_stage['name']}-{run_id()}.folded"
+        profiler.write(path)
+        print(profiler.top().to_string(float_format="{:.1f}".format))
+        print(f"Profile saved to {path}")
+
+
+def read_runs():
+    """Every logged step of every run, one row per step."""
+    return pd.read_json(out_path / RUN_LOG, lines=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize logged pipeline runs.")
+    parser.add_argument("--run", help="Run id to show (default: the latest run).")
+    args = parser.parse_args()
+
+    runs = read_runs()
+    run = args.run or runs["run"].iloc[-1]
+    table = runs[runs["run"] == run].drop(columns=["run"]).set_index(["stage", "step"])
+    print(f"Run {run}:")
+    print(table.to_string(float_format="{:.2f}".format))
@@ -1,49 +1,60 @@
-from pathlib import Path
-from datetime import timedelta
+import argparse
+import numpy as np
 import pandas as pd
-
-out_path = Path(__file__).parent / "../out"
+from export import add_export_arguments, export_frame
+from storage import read_frame, write_frame
+from instrument import start_stage, step
+from schema import apply_schema
+from timecore import (
+    NS_PER_HOUR,
+    RESOLUTION_COLUMN,
+    LocalCalendar,
+    expand_resolution,
+    to_epoch,
+)
 
 
 def front_fill_within_hour(df, column_to_fill):
-    # Create hour-level grouping (e.g., 2023-01-01 12:00:00)
-    df["hour"] = df.index.strftime("%Y-%m-%d %H:00:00")
-    df[column_to_fill] = (
-        df[column_to_fill].groupby(df["hour"]).transform(lambda x: x.ffill())
-    )
-    df = df.drop("hour", axis=1)
+    # Group on the UTC hour of the index (epoch hours, no string formatting)
+    hour = to_epoch(df.index) // NS_PER_HOUR
+    df[column_to_fill] = df[column_to_fill].groupby(hour).ffill()
     return df
 
 
 def keep_latest_actual(df):
-    df = df.sort_values("Date_of_publication_cet", ascending=False).drop_duplicates(
-        subset="Date_cet", keep="first"
-    )
-    df = df.sort_values("Date_utc", ascending=True)
-    return df
+    df = df.sort_values("Date_of_publication_utc", ascending=False)
+    return df[~df.index.duplicated(keep="first")].sort_index()
 
 
 def keep_latest_valid_forecast(pk_forecast):
+    # Local (Warsaw) views are derived from the UTC columns on demand
+    published = LocalCalendar.of(pk_forecast["Date_of_publication_utc"])
+    delivery = LocalCalendar.of(pk_forecast["Date_utc"])
     mask = (
-        (
-            (pk_forecast["Date_of_publication_cet"].dt.hour == 10)
-            & (pk_forecast["Date_of_publication_cet"].dt.minute <= 15)
-        )
-        | (pk_forecast["Date_of_publication_cet"].dt.hour < 10)
-    ) & (
-        pk_forecast["Date_cet"].dt.date
-        == (pk_forecast["Date_of_publication_cet"].dt.date + timedelta(days=1))
-    )
+        ((published.hour == 10) & (published.minute <= 15)) | (published.hour < 10)
+    ) & (delivery.date == published.date + np.timedelta64(1, "D"))
     pk_forecast = pk_forecast.loc[mask]
     pk_forecast = pk_forecast.sort_values(
-        "Date_of_publication_cet", ascending=False
-    ).drop_duplicates(subset="Date_cet", keep="first")
+        "Date_of_publication_utc", ascending=False
+    ).drop_duplicates(subset="Date_utc", keep="first")
     return pk_forecast
 
 
 def merge_pk_actual_and_forecast(pk_actual_rename, pk_forecast_rename) -> pd.DataFrame:
-    pk_actual = pd.read_parquet(out_path / "pk5y_actual.parquet")
-    pk_forecast = pd.read_parquet(out_path / "pk5y_forecast.parquet")
+    pk_actual = read_frame(
+        "pk5y_actual.parquet",
+        columns=["Date_utc", RESOLUTION_COLUMN, *pk_actual_rename.keys()],
+    )
+    # Hourly history is stored as is; expand it onto the 15 min grid here
+    pk_actual = expand_resolution(pk_actual)
+    pk_forecast = read_frame(
+        "pk5y_forecast.parquet",
+        columns=[
+            "Date_utc",
+            "Date_of_publication_utc",
+            *pk_forecast_rename.keys(),
+        ],
+    )
     pk_forecast = pk_forecast.rename(columns=pk_forecast_rename)
     pk_actual = pk_actual.rename(columns=pk_actual_rename)
     # Keep only latest forecast per Date_utc (published before 10:15)
@@ -60,7 +71,10 @@ def merge_pk_actual_and_forecast(pk_actual_rename, pk_forecast_rename) -> pd.Dat
 def merge_kse_load_forecast(
     kse_load_forecast_rename, pk_actual_and_forecast
 ) -> pd.DataFrame:
-    kse_load_forecast = pd.read_parquet(out_path / "kse_load_forecast.parquet")
+    kse_load_forecast = read_frame(
+        "kse_load_forecast.parquet",
+        columns=["Date_utc", *kse_load_forecast_rename.keys()],
+    )
     kse_load_forecast = kse_load_forecast.rename(columns=kse_load_forecast_rename)
     kse_load_forecast = kse_load_forecast.set_index("Date_utc").sort_index()
     kse_load_forecast_columns = list(kse_load_forecast_rename.values())
@@ -71,7 +85,14 @@ def merge_kse_load_forecast(
 
 
 def merge_peak_hours(df):
-    peak_hours_actual = pd.read_parquet(out_path / "peak_hours_actual.parquet")
+    peak_hours_actual = read_frame(
+        "peak_hours_actual.parquet",
+        columns=[
+            "Date_utc",
+            "Date_of_publication_utc",
+            "peak_hours_actual",
+        ],
+    )
     peak_hours_actual = peak_hours_actual.set_index("Date_utc").sort_index()
     peak_hours_actual = keep_latest_actual(peak_hours_actual)
     df = df.merge(
@@ -85,8 +106,21 @@ def merge_peak_hours(df):
 
 
 def merge_prices(df):
-    fix_price = pd.read_parquet(out_path / "fix_price.parquet")
-    rb_price = pd.read_parquet(out_path / "rb_price.parquet")
+    fix_price = read_frame(
+        "fix_price.parquet",
+        columns=[
+            "Date_utc",
+            "fixing1_price",
+            "fixing2_price",
+            "fixing2_volume",
+            "fixing1_volume",
+        ],
+    )
+    rb_price = expand_resolution(
+        read_frame(
+            "rb_price.parquet", columns=["Date_utc", RESOLUTION_COLUMN, "bilans_price"]
+        )
+    )
 
     fix_price = fix_price.set_index("Date_utc").sort_index()
     rb_price = rb_price.set_index("Date_utc").sort_index()
@@ -112,6 +146,16 @@ def merge_prices(df):
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge downloaded datasets.")
+    add_export_arguments(parser)
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Sample the stage with the profiler into out/profile.",
+    )
+    args = parser.parse_args()
+    start_stage("merge_dataframes", profile=args.profile)
+
     pk_actual_rename = {
         "domestic_power_demand": "demand_actual",
         "generation_jgna": "supply_nab_actual",
@@ -134,13 +178,15 @@ if __name__ == "__main__":
 
     kse_load_forecast_rename = {"load_forecast": "demand_kse_forecast"}
 
-    df = merge_pk_actual_and_forecast(pk_actual_rename, pk_forecast_rename)
-    df = merge_kse_load_forecast(kse_load_forecast_rename, df)
-    df = merge_peak_hours(df)
+    with step("merge"):
+        df = merge_pk_actual_and_forecast(pk_actual_rename, pk_forecast_rename)
+        df = merge_kse_load_forecast(kse_load_forecast_rename, df)
+        df = merge_peak_hours(df)
 
-    df = merge_prices(df)
-    df.to_parquet(out_path / "combined.parquet")
-    df.to_csv(out_path / "test.csv")
+        df = merge_prices(df)
+    with step("write"):
+        write_frame(apply_schema(df), "combined.parquet")
+    export_frame(df, "test", args.export, args.export_start, args.export_end)
 
     duplicates_mask = df.index.duplicated(keep=False)
     duplicate_rows = df[duplicates_mask]
@@ -0,0 +1,96 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# Only the standard library is imported here, so `power --help` and the
+# dispatch itself stay fast; each stage loads pandas & co. in its own process
+
+# Ingestion notebooks, in the order download_data.sh runs them
+INGESTION = [
+    "kse_load_forecast",
+    "peak_hours_actual",
+    "pk5y_actual",
+    "pk5y_forecast",
+    "prices_pse",
+]
+
+# Subcommand -> (script of scripts/, description)
+STAGES = {
+    "merge": (
+        "merge_dataframes.py",
+        "Merge the ingested sources into combined.parquet.",
+    ),
+    "features": ("feature_engineering.py", "Compute the features into final.parquet."),
+    "train": ("train_model.py", "Train the rolling model into result.parquet."),
+    "sweep": ("fine_tune_peak_hours.py", "Sweep the peak-hours quantile parameters."),
+    "evaluate": (
+        "evaluate_model.py",
+        "Evaluate the trading strategy of result.parquet.",
+    ),
+    "validate": ("validate_forecast.py", "Compare forecasts with actuals."),
+}
+
+# Stages of one run share this id in out/run_metrics.jsonl (see instrument.py)
+RUN_ID_VARIABLE = "POWER_RUN_ID"
+
+scripts_path = Path(__file__).parent
+
+
+def run_script(script, arguments=()):
+    """Run a script of scripts/ in its own interpreter, return its exit code."""
+    return subprocess.run(
+        [sys.executable, str(scripts_path / script), *arguments]
+    ).returncode
+
+
+def ingest(notebooks=INGESTION):
+    """Run the ingestion notebooks one after another, stop at the first failure."""
+    for notebook in notebooks:
+        print(f"Running {notebook}.py...")
+        code = run_script(f"{notebook}.py")
+        if code:
+            print(f"❌ {notebook}.py failed.")
+            return code
+        print(f"✅ {notebook}.py completed successfully.")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="power",
+        description="Run the stages of the power pipeline. Arguments after a "
+        "stage are passed to its script (e.g. `power train --help`).",
+    )
+    commands = parser.add_subparsers(dest="command", metavar="command", required=True)
+    ingest_parser = commands.add_parser(
+        "ingest", help="Download the sources with the ingestion notebooks."
+    )
+    ingest_parser.add_argument(
+        "notebooks",
+        nargs="*",
+        metavar="notebook",
+        help=f"Notebooks to run (default: all of {', '.join(INGESTION)}).",
+    )
+    for command, (_, description) in STAGES.items():
+        # no own --help, so it reaches the stage script with its other arguments
+        commands.add_parser(
+            command, help=description, description=description, add_help=False
+        )
+    args, arguments = parser.parse_known_args(argv)
+
+    os.environ.setdefault(RUN_ID_VARIABLE, time.strftime("%Y%m%dT%H%M%S"))
+    if args.command in STAGES:
+        return run_script(STAGES[args.command][0], arguments)
+    if arguments:
+        parser.error(f"unrecognized arguments: {' '.join(arguments)}")
+    unknown = set(args.notebooks) - set(INGESTION)
+    if unknown:
+        parser.error(f"unknown notebooks: {', '.join(sorted(unknown))}")
+    return ingest(args.notebooks or INGESTION)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
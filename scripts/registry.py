@@ -0,0 +1,253 @@
+import hashlib
+import inspect
+import pandas as pd
+
+
+def _digest(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def data_fingerprint(series):
+    """Fingerprint of a column's values, dtype and index."""
+    hashes = pd.util.hash_pandas_object(series, index=True).to_numpy()
+    return _digest(series.dtype, hashes.tobytes())
+
+
+class Feature:
+    """One node of the feature graph: `compute` turns `inputs` into `outputs`."""
+
+    def __init__(
+        self, outputs, inputs, compute, internal=False, group=None, params=None, code=()
+    ):
+        self.outputs = tuple(outputs)
+        self.inputs = tuple(inputs)
+        self.compute = compute
+        self.internal = internal
+        self.group = group
+        self.params = dict(params or {})
+        self.code = (compute, *code)
+        self._code_hash = None
+
+    @property
+    def code_hash(self):
+        """Hash of the source code of compute and the helpers it relies on."""
+        if self._code_hash is None:
+            self._code_hash = _digest(*(inspect.getsource(obj) for obj in self.code))
+        return self._code_hash
+
+
+class FeatureRegistry:
+    """
+    Derived features by output column. Every feature declares the columns
+    it reads; an input that is not itself a registered output is a source
+    (combined) column. A feature may list one of its own outputs as an
+    input: it then reads the source column of that name and replaces it,
+    like the forward filled forecast columns.
+    """
+
+    def __init__(self):
+        self.features = {}  # output column -> Feature
+        self.order = []  # features in registration order
+
+    def register(
+        self, *outputs, inputs=(), internal=False, group=None, params=None, code=()
+    ):
+        """
+        Decorator registering compute(df) -> DataFrame (or Series when there
+        is one output) for `outputs`, where df holds the `inputs` columns.
+        Internal features are intermediate steps left out of final. Features
+        of one `group` share a compute function that handles any number of
+        them at once; those needed together are computed in one call.
+        `params` (window, quantiles, shift, ...) and the source of compute
+        and of the `code` helpers (functions or modules) make up the
+        feature's fingerprint together with its inputs.
+        """
+
+        def wrap(compute):
+            feature = Feature(outputs, inputs, compute, internal, group, params, code)
+            for name in feature.outputs:
+                if name in self.features:
+                    raise ValueError(f"feature {name} is already registered")
+                self.features[name] = feature
+            self.order.append(feature)
+            return compute
+
+        return wrap
+
+    def public_columns(self):
+        """Registered output columns that belong in final, in registration order."""
+        return [
+            name
+            for feature in self.order
+            if not feature.internal
+            for name in feature.outputs
+        ]
+
+    def resolve(self, columns):
+        """
+        (features, sources) needed for `columns`: the features in dependency
+        order and the source columns they read from.
+        """
+        features, sources, done = [], [], set()
+
+        def visit(name, stack, source=False):
+            feature = None if source else self.features.get(name)
+            if feature is None:
+                if name not in sources:
+                    sources.append(name)
+                return
+            if feature in done:
+                return
+            if feature in stack:
+                raise ValueError(f"feature cycle at {name}")
+            for column in feature.inputs:
+                visit(column, stack | {feature}, source=column in feature.outputs)
+            done.add(feature)
+            features.append(feature)
+
+        for name in columns:
+            visit(name, frozenset())
+        return features, sources
+
+
+class FeatureEngine:
+    """
+    Computes registered features on demand, each one once per engine.
+
+    Source columns come from `source` (a frame indexed by Date_utc) or, when
+    it is None, are read from disk with `load(columns=...)` only when a
+    request needs them. Features are computed on the regular 15 minute grid
+    of the source index.
+
+    With a FeatureStore, every feature is looked up by its fingerprint
+    (code, params and the fingerprints of its inputs, down to the hashed
+    source columns) and only recomputed, then stored, when it is missing.
+    """
+
+    def __init__(self, registry, source=None, load=None, store=None):
+        self.registry = registry
+        self.source = source
+        self.load = load
+        self.store = store
+        self.raw = {}  # source column -> Series as stored
+        self.values = {}  # column on the grid -> Series
+        self.fingerprints = {}  # source column or Feature -> fingerprint
+        self.grid = None
+
+    def _load(self, names):
+        missing = [name for name in names if name not in self.raw]
+        if self.grid is not None and not missing:
+            return
+        if self.source is not None:
+            frame = self.source[missing]
+        else:
+            frame = self.load(columns=missing)
+        if self.grid is None:
+            self.grid = (
+                pd.Series(index=frame.index, dtype="float64")
+                .resample("15min")
+                .asfreq()
+                .index.rename("Date_utc")
+            )
+        for name in missing:
+            self.raw[name] = frame[name]
+
+    def _column(self, name):
+        """Computed column, or the source column moved onto the grid."""
+        if name not in self.values:
+            self.values[name] = self.raw[name].reindex(self.grid)
+        return self.values[name]
+
+    def _input(self, name, feature):
+        if name in feature.outputs:
+            return self.raw[name]
+        return self._column(name)
+
+    def _source_fingerprint(self, name):
+        if name not in self.fingerprints:
+            self.fingerprints[name] = data_fingerprint(self.raw[name])
+        return self.fingerprints[name]
+
+    def fingerprint(self, feature):
+        """Fingerprint of a feature's outputs: code, params and input fingerprints."""
+        if feature not in self.fingerprints:
+            inputs = []
+            for name in feature.inputs:
+                source = self.registry.features.get(name)
+                if source is None or name in feature.outputs:
+                    inputs.append(self._source_fingerprint(name))
+                else:
+                    inputs.append(self.fingerprint(source))
+            self.fingerprints[feature] = _digest(
+                feature.outputs,
+                feature.code_hash,
+                sorted(feature.params.items()),
+                *inputs,
+            )
+        return self.fingerprints[feature]
+
+    def _restore(self, feature):
+        """Take a feature's outputs from the store; False when they are not there."""
+        if self.store is None:
+            return False
+        stored = self.store.load(self.fingerprint(feature))
+        if stored is None:
+            return False
+        for name in feature.outputs:
+            self.values[name] = stored[name]
+        return True
+
+    def _done(self, feature):
+        return all(name in self.values for name in feature.outputs)
+
+    def _pending(self, feature):
+        return not self._done(feature) and self._ready(feature)
+
+    def _ready(self, feature):
+        return all(
+            name in feature.outputs
+            or name in self.values
+            or name not in self.registry.features
+            for name in feature.inputs
+        )
+
+    def frame(self, columns):
+        """DataFrame of `columns` (source or derived) on the 15 minute grid."""
+        columns = list(dict.fromkeys(columns))
+        features, sources = self.registry.resolve(columns)
+        self._load(sources)
+        for feature in features:
+            if self._done(feature) or self._restore(feature):
+                continue
+            batch = [feature]
+            if feature.group is not None:
+                group = [other for other in features if other.group == feature.group]
+                # members already in the store are restored first, the ready
+                # rest is computed together in one call
+                for other in group:
+                    if other is not feature and self._pending(other):
+                        self._restore(other)
+                batch = [other for other in group if self._pending(other)]
+            df = pd.DataFrame(
+                {
+                    name: self._input(name, other)
+                    for other in batch
+                    for name in other.inputs
+                }
+            )
+            out = feature.compute(df)
+            if isinstance(out, pd.Series):
+                out = out.to_frame(feature.outputs[0])
+            out = out.reindex(self.grid)
+            for other in batch:
+                for name in other.outputs:
+                    self.values[name] = out[name]
+                if self.store is not None:
+                    self.store.save(self.fingerprint(other), out[list(other.outputs)])
+        return pd.DataFrame(
+            {name: self._column(name) for name in columns}, index=self.grid
+        )
@@ -0,0 +1,184 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+import pandas as pd
+
+# Windows of up to this many rows are sorted one by one; longer windows
+# are answered from an OrderStatistics structure over the whole series
+SORTED_WINDOW_MAX = 192
+SORT_CHUNK = 1 << 13
+
+# Queries answered per vectorized step of OrderStatistics.kth
+QUERY_CHUNK = 1 << 16
+
+
+class OrderStatistics:
+    """
+    Indexable order statistics over every contiguous range of a 1-D array.
+
+    A wavelet matrix over the value ranks: one stable partition per rank bit,
+    with a prefix count of zero bits and the partitioned rank sequence kept
+    for every level. `kth(lo, hi, k)` returns the k-th smallest value of
+    values[lo:hi] for whole arrays of ranges at once, descending the levels
+    with vectorized numpy steps. A query is settled as soon as its range
+    holds a single element, so a window of w rows needs about log2(w)
+    levels rather than log2(len(values)).
+    NaN ranks after every number, so the first `count(lo, hi)` order
+    statistics of a range are exactly its non-NaN values in sorted order.
+    """
+
+    def __init__(self, values):
+        values = np.asarray(values, dtype="float64")
+        n = len(values)
+        order = np.argsort(values, kind="stable")  # NaN sorts last
+        self.sorted_values = values[order]
+        self._current = np.empty(n, dtype="int32")
+        self._current[order] = np.arange(n, dtype="int32")
+        self.depth = max(int(n - 1).bit_length(), 1)
+        self.zeros = []  # per level: prefix count of zero bits
+        self.ranks = []  # per level: rank sequence after the partition
+        self.valid = np.zeros(n + 1, dtype="int64")
+        np.cumsum(~np.isnan(values), out=self.valid[1:])
+
+    def _level(self, depth):
+        """Build levels up to `depth` on first use; short windows never need the last ones."""
+        while len(self.zeros) <= depth:
+            current = self._current
+            zero = ((current >> (self.depth - 1 - len(self.zeros))) & 1) == 0
+            prefix = np.zeros(len(current) + 1, dtype="int32")
+            np.cumsum(zero, out=prefix[1:])
+            self._current = np.concatenate([current[zero], current[~zero]])
+            self.zeros.append(prefix)
+            self.ranks.append(self._current)
+        return self.zeros[depth], self.ranks[depth]
+
+    def count(self, lo, hi) -> np.ndarray:
+        """Number of non-NaN values in values[lo:hi]."""
+        return self.valid[hi] - self.valid[lo]
+
+    def kth(self, lo, hi, k) -> np.ndarray:
+        """k-th smallest (0-based) value of values[lo:hi], elementwise."""
+        lo = np.asarray(lo, dtype="int32")
+        hi = np.asarray(hi, dtype="int32")
+        k = np.asarray(k, dtype="int32")
+        rank = np.empty(len(k), dtype="int32")
+        # chunks keep the per-level temporaries in cache
+        for s in range(0, len(k), QUERY_CHUNK):
+            chunk = slice(s, s + QUERY_CHUNK)
+            rank[chunk] = self._rank(lo[chunk], hi[chunk], k[chunk])
+        return self.sorted_values.take(rank)
+
+    def _rank(self, lo, hi, k):
+        rank = np.empty(len(k), dtype="int32")
+        pending = np.arange(len(k))
+        for depth in range(self.depth):
+            prefix, ranks = self._level(depth)
+            zero_lo = prefix.take(lo)
+            zero_hi = prefix.take(hi)
+            zeros = zero_hi - zero_lo
+            # the k-th value has a one bit when it lies past all zero bits
+            one = k >= zeros
+            k = np.where(one, k - zeros, k)
+            lo = np.where(one, lo - zero_lo + prefix[-1], zero_lo)
+            hi = np.where(one, hi - zero_hi + prefix[-1], zero_hi)
+            settled = hi - lo == 1
+            if settled.sum() * 4 >= len(settled):
+                rank[pending[settled]] = ranks.take(lo[settled])
+                keep = ~settled
+                pending, lo, hi, k = pending[keep], lo[keep], hi[keep], k[keep]
+                if not len(pending):
+                    return rank
+        rank[pending] = ranks.take(lo)
+        return rank
+
+
+def window_bounds(n, window, index=None):
+    """
+    [start, end) positions of every rolling window, as pandas defines them:
+    the last `window` rows for an int window, or the rows with time in
+    (t - window, t] for an offset window over a monotonic DatetimeIndex.
+    """
+    end = np.arange(1, n + 1)
+    if isinstance(window, (int, np.integer)):
+        return np.maximum(end - window, 0), end
+    if index is None:
+        raise ValueError("time-based windows need a DatetimeIndex")
+    times = pd.DatetimeIndex(index).asi8
+    span = pd.Timedelta(window).value
+    return np.searchsorted(times, times - span, side="right"), end
+
+
+def _sorted_window_kth(values, start, end, rows, ks):
+    """
+    k-th smallest values of short windows by sorting every window: rows of
+    a strided view over the NaN-padded values, masked to [start, end).
+    """
+    width = int((end - start).max())
+    padded = np.concatenate([np.full(width - 1, np.nan), values])
+    windows = sliding_window_view(padded, width)  # row t ends at values[t]
+    skip = start - (end - width)  # leading columns outside the window
+    columns = np.arange(width)
+    found = [np.empty(k.shape) for k in ks]
+    for s in range(0, len(rows), SORT_CHUNK):
+        chunk = slice(s, s + SORT_CHUNK)
+        block = windows[rows[chunk]]
+        block[columns[None, :] < skip[rows[chunk], None]] = np.nan
+        block.sort(axis=1)  # NaN sorts last
+        line = np.arange(len(block))[:, None]
+        for k, out in zip(ks, found):
+            out[chunk] = block[line, k[chunk]]
+    return found
+
+
+def rolling_quantiles(values, window, quantiles, index=None, min_periods=None):
+    """
+    Rolling quantiles of `values` for every quantile in `quantiles`, all
+    taken from one set of sorted windows (short windows) or one shared
+    order-statistic structure (long windows). Matches
+    Series.rolling(window, min_periods).quantile(q): linear interpolation,
+    NaN and inf skipped, NaN output below min_periods. Returns an
+    (n, len(quantiles)) float64 array.
+    """
+    values = np.asarray(values, dtype="float64")
+    # like pandas, rolling treats +-inf as missing
+    values = np.where(np.isinf(values), np.nan, values)
+    n = len(values)
+    if min_periods is None:
+        min_periods = window if isinstance(window, (int, np.integer)) else 1
+    start, end = window_bounds(n, window, index)
+    valid = np.zeros(n + 1, dtype="int64")
+    np.cumsum(~np.isnan(values), out=valid[1:])
+    nobs = valid[end] - valid[start]
+    rows = np.flatnonzero(nobs >= max(min_periods, 1))
+    count = nobs[rows, None]
+
+    # pandas: idx = q * (nobs - 1), vlow + (vhigh - vlow) * frac
+    quantiles = np.asarray(quantiles, dtype="float64")
+    position = quantiles[None, :] * (count - 1)
+    low = position.astype("int64")
+    frac = position - low
+    high = np.minimum(low + 1, count - 1)
+    if n and (end - start).max() <= SORTED_WINDOW_MAX:
+        vlow, vhigh = _sorted_window_kth(values, start, end, rows, [low, high])
+    else:
+        stats = OrderStatistics(values)
+        lo = np.repeat(start[rows], len(quantiles))
+        hi = np.repeat(end[rows], len(quantiles))
+        vlow = stats.kth(lo, hi, low.ravel()).reshape(low.shape)
+        vhigh = stats.kth(lo, hi, high.ravel()).reshape(low.shape)
+
+    out = np.full((n, len(quantiles)), np.nan)
+    out[rows] = np.where(frac == 0, vlow, vlow + (vhigh - vlow) * frac)
+    return out
+
+
+def rolling_quantile_frame(series, window, quantiles, min_periods=None):
+    """rolling_quantiles of a Series as a DataFrame with one column per quantile."""
+    index = series.index if not isinstance(window, (int, np.integer)) else None
+    out = rolling_quantiles(
+        series.to_numpy(dtype="float64", na_value=np.nan),
+        window,
+        quantiles,
+        index=index,
+        min_periods=min_periods,
+    )
+    return pd.DataFrame(out, index=series.index, columns=list(quantiles))
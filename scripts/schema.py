@@ -0,0 +1,78 @@
+import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype, is_float_dtype, is_numeric_dtype
+
+# Prices (and anything derived from them) keep float64 so PnL sums stay exact;
+# every other float column is an MW/MWh quantity and is stored as float32
+PRICE_COLUMNS = ["bilans_price", "fixing1_price", "fixing2_price", "spread"]
+
+# Peak hours regime codes (0..2)
+REGIME_COLUMNS = ["peak_hours_actual", "peak_hours_forecast"]
+
+# Free-text labels with a handful of distinct values
+CATEGORY_COLUMNS = ["usage_forecast"]
+
+
+def apply_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Downcast df to the compact storage schema: MW quantities to float32,
+    regime codes to int8 (nullable Int8 when they contain gaps) and text
+    labels to categoricals. Columns not covered by the schema are left as is.
+    """
+    dtypes = {}
+    for col, dtype in df.dtypes.items():
+        if col in REGIME_COLUMNS and is_numeric_dtype(dtype):
+            dtypes[col] = "Int8" if df[col].isna().any() else "int8"
+        elif col in CATEGORY_COLUMNS and not isinstance(dtype, pd.CategoricalDtype):
+            dtypes[col] = "category"
+        elif col not in PRICE_COLUMNS and is_float_dtype(dtype):
+            dtypes[col] = "float32"
+    return df.astype(dtypes) if dtypes else df
+
+
+def _common_dtype(dtypes):
+    """Return the dtype all frames should share for one column, or None."""
+    if all(isinstance(d, pd.CategoricalDtype) for d in dtypes):
+        categories = pd.Index([])
+        for d in dtypes:
+            categories = categories.union(d.categories)
+        return pd.CategoricalDtype(categories)
+    if all(is_datetime64_any_dtype(d) for d in dtypes):
+        zones = {str(getattr(d, "tz", None)) for d in dtypes}
+        if len(zones) > 1 and "None" not in zones:
+            # tz-aware in different zones: align on the first frame's zone
+            return dtypes[0]
+    return None
+
+
+def unify_dtypes(frames):
+    """
+    Cast columns shared by several frames to one common dtype, so pd.concat
+    does not upcast them to object (categoricals with different categories,
+    timestamps in different zones).
+    """
+    frames = [f for f in frames if f is not None]
+    columns = {}
+    for frame in frames:
+        for col, dtype in frame.dtypes.items():
+            columns.setdefault(col, []).append(dtype)
+    targets = {}
+    for col, dtypes in columns.items():
+        if len(dtypes) < 2 or all(d == dtypes[0] for d in dtypes):
+            continue
+        target = _common_dtype(dtypes)
+        if target is not None:
+            targets[col] = target
+    if not targets:
+        return frames
+    unified = []
+    for frame in frames:
+        casts = {c: t for c, t in targets.items() if c in frame.columns}
+        for col in [c for c, t in casts.items() if is_datetime64_any_dtype(t)]:
+            frame = frame.assign(**{col: frame[col].dt.tz_convert(casts.pop(col).tz)})
+        unified.append(frame.astype(casts) if casts else frame)
+    return unified
+
+
+def concat_frames(frames, **kwargs) -> pd.DataFrame:
+    """pd.concat with dtypes unified across frames first."""
+    return pd.concat(unify_dtypes(list(frames)), **kwargs)
@@ -0,0 +1,107 @@
+import os
+from pathlib import Path
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Every table lives in out/; POWER_OUT points a run at another directory
+# (e.g. the synthetic data of benchmark.py)
+out_path = Path(os.environ.get("POWER_OUT", Path(__file__).parent / "../out"))
+
+# One month of quarter-hours per row group, so Date_utc statistics let
+# date-filtered reads skip whole months on disk
+ROW_GROUP_SIZE = 24 * 4 * 31
+
+# Rows and stored bytes moved by read_frame / write_frame(s) in this
+# process; instrument.step records how much of it each step moved
+io_totals = {"rows_read": 0, "bytes_read": 0, "rows_written": 0, "bytes_written": 0}
+
+
+def as_utc(value):
+    """Convert a date-like value to a tz-aware UTC timestamp for filtering."""
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is None:
+        return ts.tz_localize("UTC")
+    return ts.tz_convert("UTC")
+
+
+def stored_bytes(path, columns=None, start=None, end=None):
+    """
+    Compressed size of the `columns` column chunks (all when None) of the
+    row groups of a parquet file whose Date_utc statistics overlap
+    [start, end): the bytes a filtered read fetches from disk.
+    """
+    metadata = pq.ParquetFile(path).metadata
+    names = [metadata.schema.column(i).name for i in range(metadata.num_columns)]
+    date = names.index("Date_utc") if "Date_utc" in names else None
+    total = 0
+    for i in range(metadata.num_row_groups):
+        group = metadata.row_group(i)
+        stats = None if date is None else group.column(date).statistics
+        if stats is not None and stats.has_min_max:
+            if start is not None and as_utc(stats.max) < as_utc(start):
+                continue
+            if end is not None and as_utc(stats.min) >= as_utc(end):
+                continue
+        for j, column in enumerate(names):
+            if columns is None or column in columns or column == "Date_utc":
+                total += group.column(j).total_compressed_size
+    return total
+
+
+def read_frame(name, columns=None, start=None, end=None):
+    """
+    Read out/<name>, keeping only `columns` and rows with Date_utc in [start, end).
+    Date_utc is pushed down to the parquet reader, whether it is stored
+    as the index or as a regular column.
+    """
+    filters = []
+    if start is not None:
+        filters.append(("Date_utc", ">=", as_utc(start)))
+    if end is not None:
+        filters.append(("Date_utc", "<", as_utc(end)))
+    df = pd.read_parquet(
+        out_path / name, columns=columns, filters=filters if filters else None
+    )
+    io_totals["rows_read"] += len(df)
+    io_totals["bytes_read"] += stored_bytes(out_path / name, columns, start, end)
+    return df
+
+
+def write_frame(df, name, index=None, row_group_size=ROW_GROUP_SIZE):
+    """
+    Write df to out/<name> sorted by Date_utc, in row groups of `row_group_size`
+    rows with column statistics, so readers can filter on Date_utc.
+    """
+    if "Date_utc" in df.columns:
+        df = df.sort_values("Date_utc", kind="stable")
+    elif df.index.name == "Date_utc":
+        df = df.sort_index(kind="stable")
+    df.to_parquet(
+        out_path / name,
+        index=index,
+        row_group_size=row_group_size,
+        write_statistics=True,
+    )
+    io_totals["rows_written"] += len(df)
+    io_totals["bytes_written"] += (out_path / name).stat().st_size
+
+
+def write_frames(frames, name, row_group_size=ROW_GROUP_SIZE):
+    """
+    Write frames indexed by Date_utc, given in time order, to out/<name> one
+    after another, so only one frame has to be in memory at a time. Every
+    frame is cast to the schema of the first one.
+    """
+    writer = None
+    try:
+        for df in frames:
+            io_totals["rows_written"] += len(df)
+            table = pa.Table.from_pandas(df.sort_index(kind="stable"))
+            if writer is None:
+                writer = pq.ParquetWriter(out_path / name, table.schema)
+            writer.write_table(table.cast(writer.schema), row_group_size=row_group_size)
+    finally:
+        if writer is not None:
+            writer.close()
+            io_totals["bytes_written"] += (out_path / name).stat().st_size
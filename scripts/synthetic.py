@@ -0,0 +1,867 @@
+import argparse
+import runpy
+import subprocess
+import sys
+import types
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from power import INGESTION
+from storage import out_path
+from timecore import TZ
+
+# Raw sources are written to out/<SOURCES_DIR>/<container>/<file> for
+# DataDownloader and out/<SOURCES_DIR>/jwm/<path> for JwmDataDownloader
+SOURCES_DIR = "sources"
+
+# Last local day (exclusive) of the generated history, and the latest
+# local day it may start at: the notebooks expect rows in every hourly MC
+# history (before MC_HOURLY_END), and train_model.py starts at MODEL_START
+END = "2025-12-01"
+LATEST_START = "2023-12-01"
+
+# Local dates where the ingestion notebooks switch from one source to the
+# next (the cut-offs they apply), or where a synthetic file hands over to
+# the next one of the same feed
+MC_LIVE_END = "2025-08-30"
+MC_HOURLY_END = "2024-01-01"
+JWM_ACTUALS = "2024-06-14"
+PK5Y_HISTORY_END = "2024-06-15"
+PK5Y_LIVE = "2025-01-01"
+PK5Y_AT_10_END = "2025-07-20"
+PK5Y_EOD_END = "2025-08-15"
+FIX_MC_NEW = "2019-01-01"
+FIX_MC_END = "2019-04-02"
+FIX_JWM_NEW = "2025-01-01"
+
+# Local publication times of the pk5y snapshots on JWM, and of the
+# vintages of the live MC coordination plan (the first `vintages` of them)
+SNAPSHOTS = ["07:30", "10:05", "10:10", "10:15", "10:20", "23:59"]
+LIVE_UPDATES = ["07:30", "08:45", "10:00", "10:10", "12:00", "15:00", "18:00", "22:00"]
+
+# pk5y actuals: English column -> (truth column, MC report column, column of
+# the hourly MC history or None)
+PK5Y_ACTUAL = {
+    "domestic_power_demand": (
+        "demand",
+        "Zapotrzebowanie_na_moc_MW",
+        "Krajowe_zapotrzebowanie_na_moc",
+    ),
+    "generation_jga": (
+        "aggregates",
+        "Suma_generacji_Jednostek_Grafikowych_Agregatów_JGa_(JGa1)_[MW]",
+        None,
+    ),
+    "generation_jgm1": (
+        "storage",
+        "Suma_generacji_Jednostek_Grafikowych_Magazynów_JGm_z_ZAK=1_(JGm1)_[MW]",
+        "Sumaryczna_generacja_JGMa",
+    ),
+    "generation_jgm2": (
+        "storage",
+        "Suma_generacji_Jednostek_Grafikowych_Magazynów_JGm_z_ZAK=2_(JGm2)_[MW]",
+        None,
+    ),
+    "generation_jgna": (
+        "non_active",
+        "Sumaryczna_Generacja_Jednostek_Wytwórczych_nie_uczestniczących_aktywnie"
+        "_w_Rynku_Bilansującym_[MW]",
+        "Sumaryczna_generacja_jednostek_wytworczych_nieuczestniczacych_aktywnie"
+        "_w_Rynku_Bilansujacym",
+    ),
+    "generation_jgo": ("aggregates", "Jednostka_grafikowa_odbiorcza", None),
+    "generation_jgw1": (
+        "thermal",
+        "Suma_generacji_Jednostek_Grafikowych_Wytwórczych_JGw_z_ZAK=1_(JGw1)_[MW]",
+        "Sumaryczna_generacja_JGWa",
+    ),
+    "generation_jgw2": (
+        "aggregates",
+        "Suma_generacji_Jednostek_Grafikowych_Wytwórczych_JGw_z_ZAK=2_(JGw2)_[MW]",
+        None,
+    ),
+    "generation_jgz1": (
+        "renewables",
+        "Suma_generacji_Jednostek_Grafikowych_Źródeł_Wiatrowych_i_Fotowoltaicznych"
+        "_JGz_z_ZAK=1_(JGz1)_[MW]",
+        None,
+    ),
+    "generation_jgz2": (
+        "aggregates",
+        "Suma_generacji_Jednostek_Grafikowych_Źródeł_Wiatrowych_i_Fotowoltaicznych"
+        "_JGz_z_ZAK=2_(JGz2)_[MW]",
+        None,
+    ),
+    "generation_jgz3": (
+        "aggregates",
+        "Suma_generacji_Jednostek_Grafikowych_Źródeł_Wiatrowych_i_Fotowoltaicznych"
+        "_JGz_z_ZAK=3_(JGz3)_[MW]",
+        None,
+    ),
+    "generation_kse": (
+        "kse",
+        "Suma_generacji_jednostek_grafikowych_w_KSE_(JGw,_JGm,_JGz_i_JGa)_[MW]",
+        "Sumaryczna_generacja_JG_aktywnych_JGWa_JGFWa_JGMa_i_JGPVa",
+    ),
+    "generation_photovoltaic": (
+        "pv",
+        "Sumaryczna_generacja_źródeł_fotowoltaicznych",
+        "Generacja_zrodel_fotowoltaicznych",
+    ),
+    "generation_wind": (
+        "wind",
+        "Sumaryczna_generacja_źródeł_wiatrowych",
+        "Generacja_zrodel_wiatrowych",
+    ),
+    "jgm_charging_power": (
+        "storage",
+        "Sumaryczna_moc_ładowania",
+        "Sumaryczna_moc_ladowania_JGMa",
+    ),
+    "non_parallel_cross_system_balance": (
+        "flow_non_parallel",
+        "Krajowe_saldo_wymiany_międzysystemowej__nierównoległa_[MW]",
+        "Krajowe_saldo_wymiany_miedzysystemowej_nierownoleglej",
+    ),
+    "parallel_cross_system_balance": (
+        "flow_parallel",
+        "Krajowe_saldo_wymiany_międzysystemowej__równoległa_[MW]",
+        "Krajowe_saldo_wymiany_miedzysystemowej_rownoleglej",
+    ),
+}
+
+# pk5y forecasts: English column -> (truth column, MC plan column, column of
+# the 2021-2024 MC plan)
+PK5Y_FORECAST = {
+    "cross_border_balance_forecast": (
+        "flow",
+        "Planowane saldo wymiany miedzysystemowej",
+        "Planowane saldo wymiany międzysystemowej",
+    ),
+    "avail_cap_of_gen_unit_and_energy_storage": (
+        "capacity",
+        "Moc dyspozycyjna JW i magazynow energii swiadczacych uslugi bilansujace"
+        " w ramach RB",
+        "Moc dyspozycyjna JW i magazynów energii świadczących usługi bilansujące"
+        " w ramach RB",
+    ),
+    "avail_cap_of_gen_unit_and_energy_storage_osp": (
+        "capacity",
+        "Moc dyspozycyjna JW i magazynow energii swiadczacych uslugi bilansujace"
+        " w ramach RB dostepna dla OSP",
+        "Moc dyspozycyjna JW i magazynów energii świadczących usługi bilansujące"
+        " w ramach RB dostępna dla OSP",
+    ),
+    "surplus_cap_avail_for_tso": (
+        "surplus",
+        "Nadwyzka mocy dostepna dla OSP",
+        "Nadwyżka mocy dostępna dla OSP (8) + (10) - [(3)-(13)]-(14)",
+    ),
+    "required_power_reserve": (
+        "reserve",
+        "Wymagana rezerwa mocy OSP",
+        "Wymagana rezerwa mocy OSP",
+    ),
+    "pred_gen_by_res_not_covered_by_cap_market_obligation": (
+        "renewables",
+        "Przewidywana generacja zasobow wytworczych nieobjetych obowiazkami mocowymi",
+        "Przewidywana generacja zasobów wytwórczych nieobjętych obowiązkami mocowymi",
+    ),
+    "sum_of_planned_unavailability": (
+        "outages",
+        "Suma niedostepnosci (postoje + ubytki) ze wzgledu na warunki"
+        " eksploatacyjne (WE)",
+        "Prognozowana wielkość niedyspozycyjności wynikających z warunków"
+        " eksploatacyjnych JW świadczących usługi bilansujące w ramach RB",
+    ),
+    "grid_demand_forecast": (
+        "demand",
+        "Prognozowane zapotrzebowanie sieci",
+        "Prognozowane zapotrzebowanie sieci",
+    ),
+    "surplus_cap_avail_for_tso_over_pow_res": (
+        "surplus_over_reserve",
+        "Nadwyzka mocy dostepna dla OSP ponad wymagana rezerwe mocy",
+        "Nadwyżka mocy dostępna dla OSP ponad wymaganą rezerwę moc (5) - (4)",
+    ),
+    "avail_gen_of_gen_unit_and_energy_storage_non_rb": (
+        "non_active",
+        "Prognozowana generacja JW i magazynow energii nie swiadczacych uslug"
+        " bilansujacych w ramach RB",
+        "Prognozowana generacja JW i magazynów energii nie świadczących usług"
+        " bilansujących w ramach RB",
+    ),
+    "planned_restrictions": (
+        "outages",
+        "Planowane ograniczenia dyspozycyjnosci i odstawien MWE",
+        "Planowane ograniczenia dyspozycyjnosci i odstawien MWE",
+    ),
+    "wind_total_generation_forecast": (
+        "wind",
+        "Prognozowana sumaryczna generacja zrodel wiatrowych",
+        "Prognozowana sumaryczna generacja źródeł wiatrowych",
+    ),
+    "avail_gen_of_gen_unit_and_energy_storage_rb": (
+        "thermal",
+        "Przewidywana generacja JW i magazynow energii swiadczacych uslugi"
+        " bilansujace w ramach RB",
+        "Przewidywana generacja JW i magazynów energii świadczących usługi"
+        " bilansujące w ramach RB (3) - (10) - (13)",
+    ),
+    "pv_total_generation_forecast": (
+        "pv",
+        "Prognozowana sumaryczna generacja zrodel fotowoltaicznych",
+        "Prognozowana sumaryczna generacja źródeł fotowoltaicznych",
+    ),
+    "cap_market_obligation_of_all_cap_market_units": (
+        "capacity",
+        "Obowiazki mocowe wszystkich jednostek rynku mocy",
+        "Obowiązki mocowe wszystkich jednostek rynku mocy",
+    ),
+    "unavailability_forecast": (
+        "outages",
+        "Prognozowana wielkosc niedyspozycyjnosci wynikajaca z ograniczen"
+        " sieciowych wystepujacych w sieci przesylowej oraz sieci dystrybucyjnej"
+        " w zakresie dostarczania energii elektrycznej",
+        "Prognozowana wielkość niedyspozycyjności wynikająca z ograniczeń"
+        " sieciowych występujących w sieci przesyłowej oraz sieci dystrybucyjnej"
+        " w zakresie dostarczania energii elektrycznej",
+    ),
+}
+
+# Peak hours regimes as published by PSE (MC) and JWM, by regime code
+USAGE_PL = [
+    "ZALECANE_UZYTKOWANIE",
+    "NORMALNE_UZYTKOWANIE",
+    "ZALECANE_OSZCZEDZANIE",
+    "WYMAGANE_OGRANICZANIE",
+]
+USAGE_EN = [
+    "RECOMMENDED_USAGE",
+    "NORMAL_USAGE",
+    "RECOMMENDED_SAVING",
+    "USAGE_LIMIT_REQUIRED",
+]
+
+# Relative error of a forecast made the day before delivery, shrinking for
+# later vintages
+FORECAST_ERROR = 0.06
+
+
+def _ar1(rng, n, phi, scale):
+    """Stationary AR(1) noise of standard deviation `scale`, vectorized in blocks."""
+    shocks = rng.normal(0.0, scale * np.sqrt(1 - phi**2), n)
+    shocks[0] = rng.normal(0.0, scale)
+    # x[t] = phi * x[t-1] + e[t] as a scaled cumulative sum, in blocks short
+    # enough that phi ** block stays above 1e-3 and the sum keeps its precision
+    out = np.empty(n)
+    block = max(int(np.log(1e-3) / np.log(phi)), 1)
+    carry = 0.0
+    for start in range(0, n, block):
+        e = shocks[start : start + block]
+        powers = phi ** np.arange(len(e))
+        part = np.cumsum(e / powers) * powers + carry * phi * powers
+        out[start : start + len(e)] = part
+        carry = part[-1]
+    return out
+
+
+def simulate(start, end, seed=0):
+    """
+    Quarter-hourly ground truth of the Polish system between the local
+    dates [start, end), indexed by UTC: demand, PV, wind and thermal
+    generation, cross-border flows, reserves, the balancing (bilans) price,
+    hourly fixing prices and the peak hours regime. Prices follow the
+    residual demand, so models trained on the synthetic features have
+    something to find.
+    """
+    rng = np.random.default_rng(seed)
+    first = pd.Timestamp(start).tz_localize(TZ).tz_convert("UTC")
+    last = pd.Timestamp(end).tz_localize(TZ).tz_convert("UTC")
+    index = pd.date_range(first, last, freq="15min", inclusive="left", name="Date_utc")
+    n = len(index)
+    local = index.tz_convert(TZ)
+    hour = local.hour + local.minute / 60
+    season = np.cos(2 * np.pi * (local.dayofyear - 15) / 365.25)
+    daylight = np.clip(np.sin(np.pi * (hour - 6 + season) / (13 - 3 * season)), 0, None)
+    days = (index.asi8 - index.asi8[0]) // (24 * 3600 * 10**9)
+    clouds = rng.uniform(0.3, 1.0, days[-1] + 1)[days]
+
+    truth = pd.DataFrame(index=index)
+    truth["demand"] = (
+        17000
+        + 2500 * np.cos(2 * np.pi * (hour - 13) / 24)
+        + 1500 * season
+        - 1200 * (local.dayofweek >= 5)
+        + _ar1(rng, n, 0.99, 400)
+    )
+    truth["pv"] = daylight * clouds * (6000 + 4000 * (1 - season) / 2)
+    truth["wind"] = np.clip(3500 + 2500 * season + _ar1(rng, n, 0.998, 2500), 50, 9500)
+    truth["non_active"] = 1800 + _ar1(rng, n, 0.99, 150)
+    truth["flow_parallel"] = _ar1(rng, n, 0.995, 600)
+    truth["flow_non_parallel"] = _ar1(rng, n, 0.995, 200)
+    truth["flow"] = truth["flow_parallel"] + truth["flow_non_parallel"]
+    truth["storage"] = np.clip(_ar1(rng, n, 0.9, 150), 0, None)
+    truth["aggregates"] = np.abs(_ar1(rng, n, 0.95, 30))
+    residual = truth["demand"] - truth["pv"] - truth["wind"]
+    truth["thermal"] = np.clip(
+        residual - truth["non_active"] - truth["flow"], 500, None
+    )
+    truth["renewables"] = truth["pv"] + truth["wind"]
+    truth["kse"] = truth["thermal"] + truth["renewables"] + truth["storage"]
+    truth["capacity"] = 27000 + 2000 * season + _ar1(rng, n, 0.999, 500)
+    truth["outages"] = np.clip(4000 + _ar1(rng, n, 0.999, 800), 0, None)
+    truth["reserve"] = 1700 + 300 * season
+    truth["surplus"] = truth["capacity"] - truth["thermal"] - truth["outages"]
+    truth["surplus_over_reserve"] = truth["surplus"] - truth["reserve"]
+
+    # prices: the day-ahead fixings see the expected residual demand, the
+    # balancing price the realised one
+    pressure = (residual - 11000) / 1000
+    hours = index.floor("h")
+
+    def hourly(values, how):
+        return pd.Series(np.asarray(values), index=index).groupby(hours).transform(how)
+
+    expected = hourly(pressure, "mean").to_numpy()
+    # fixings are hourly: the first quarter-hour sets the price of the hour
+    truth["fixing1_price"] = hourly(
+        420 + 45 * expected + _ar1(rng, n, 0.9, 25), "first"
+    ).to_numpy()
+    truth["fixing2_price"] = (
+        truth["fixing1_price"] + hourly(rng.normal(0, 15, n), "first").to_numpy()
+    )
+    truth["fixing1_volume"] = 2500 + 400 * np.cos(2 * np.pi * (hour - 13) / 24)
+    truth["fixing2_volume"] = 250 + rng.gamma(4, 25, n)
+    truth["bilans_price"] = (
+        truth["fixing1_price"]
+        + 60 * (pressure - expected)
+        + _ar1(rng, n, 0.8, 90)
+        + np.where(rng.random(n) < 0.005, rng.normal(0, 800, n), 0)
+    )
+
+    # peak hours regime from the residual demand within the local day
+    rank = residual.groupby(local.date).rank(pct=True).to_numpy()
+    regime = np.where(rank > 0.85, 2, np.where(rank < 0.15, 0, 1))
+    regime[(rank > 0.97) & (season > 0.5)] = 3
+    truth["peak_hours"] = regime
+    truth["load_forecast"] = truth["demand"]
+    return truth
+
+
+def forecast(truth, columns, rng, error=FORECAST_ERROR):
+    """Forecasts of truth `columns`: the truth with relative noise `error`."""
+    values = truth[columns].to_numpy()
+    noise = rng.normal(0, error, values.shape) * (np.abs(values).mean(axis=0) + 1)
+    return pd.DataFrame(values + noise, index=truth.index, columns=columns)
+
+
+def local_rows(truth, first, last, freq="15min"):
+    """
+    Rows of truth for the local dates [first, last) at `freq` ("15min" or
+    "h", hourly means), with their local date ("date"), local wall time
+    ("local") and position within the local day ("slot"): 92/96/100
+    quarter-hours or 23/24/25 hours per day.
+    """
+    lo = pd.Timestamp(first).tz_localize(TZ)
+    hi = pd.Timestamp(last).tz_localize(TZ)
+    rows = truth[(truth.index >= lo) & (truth.index < hi)]
+    if freq == "h":
+        rows = rows.groupby(rows.index.floor("h")).mean()
+        rows.index.name = "Date_utc"
+    local = rows.index.tz_convert(TZ)
+    rows = rows.assign(
+        date=local.tz_localize(None).normalize(), local=local.tz_localize(None)
+    )
+    rows["slot"] = rows.groupby("date").cumcount()
+    return rows
+
+
+def day_before(dates, time):
+    """Local wall time `time` (HH:MM) on the day before every date."""
+    return pd.DatetimeIndex(dates) - pd.Timedelta(days=1) + pd.Timedelta(f"{time}:00")
+
+
+def as_utc_text(local):
+    """Local wall times as the UTC ISO strings of the JWM exports."""
+    utc = pd.DatetimeIndex(local).tz_localize(TZ, nonexistent="shift_forward")
+    return utc.tz_convert("UTC").strftime("%Y-%m-%d %H:%M:%S+00:00")
+
+
+def utc_text(index):
+    return pd.DatetimeIndex(index).strftime("%Y-%m-%d %H:%M:%S+00:00")
+
+
+def decimal_comma(values, digits=3):
+    """Numbers as text with a decimal comma, like the PSE CSV reports."""
+    text = pd.Series(np.round(values, digits), dtype="float64").map(str).astype(str)
+    return text.str.replace(".", ",").to_numpy()
+
+
+def interval_text(local, minutes):
+    """'HH:MM - HH:MM' wall time interval of every row."""
+    start = pd.DatetimeIndex(local)
+    return (
+        start.strftime("%H:%M")
+        + " - "
+        + (start + pd.Timedelta(minutes=minutes)).strftime("%H:%M")
+    )
+
+
+# Builders of every raw source: (truth, first, last, rng, vintages) -> frame
+
+
+def kse_load_mc(truth, first, last, rng, vintages):
+    rows = local_rows(truth, first, last)
+    return pd.DataFrame(
+        {
+            "date": rows["date"].dt.strftime("%Y-%m-%d"),
+            "time": interval_text(rows["local"], 15),
+            "data_publikacji": day_before(rows["date"], "09:00").strftime(
+                "%Y-%m-%d %H:%M:%S"
+            ),
+            "demand_forcast": forecast(rows, ["load_forecast"], rng)["load_forecast"],
+        }
+    )
+
+
+def kse_load_jwm(truth, first, last, rng, vintages):
+    rows = local_rows(truth, first, last)
+    published = as_utc_text(day_before(rows["date"], "09:00"))
+    return pd.DataFrame(
+        {
+            "delivery_start": utc_text(rows.index),
+            "delivery_end": utc_text(rows.index + pd.Timedelta(minutes=15)),
+            "timeseries_plan_indicator": "PLAN",
+            "publication_timestamp": published,
+            "timeseries_plan_created_date": published,
+            "load_forecast": forecast(rows, ["load_forecast"], rng)["load_forecast"],
+        }
+    )
+
+
+def peak_hours_mc(truth, first, last, rng, vintages):
+    rows = local_rows(truth, first, last, "h")
+    regime = np.rint(rows["peak_hours"]).astype(int)
+    return pd.DataFrame(
+        {
+            "date_time": rows["local"].dt.strftime("%Y-%m-%d %H:%M:%S"),
+            "data_publikacji": day_before(rows["date"], "19:00").strftime(
+                "%Y-%m-%d %H:%M:%S"
+            ),
+            "bussiness_date": rows["date"].dt.strftime("%Y-%m-%d"),
+            "zapotrzebowanie": rows["demand"].round(1),
+            "godzina_szczytu": np.array(USAGE_PL)[regime],
+        }
+    )
+
+
+def peak_hours_jwm(truth, first, last, rng, vintages):
+    rows = local_rows(truth, first, last, "h")
+    regime = np.rint(rows["peak_hours"]).astype(int)
+    published = as_utc_text(day_before(rows["date"], "19:00"))
+    return pd.DataFrame(
+        {
+            "delivery_start": utc_text(rows.index),
+            "delivery_end": utc_text(rows.index + pd.Timedelta(hours=1)),
+            "timeseries_plan_indicator": "PLAN",
+            "publication_timestamp": published,
+            "timeseries_plan_created_date": published,
+            "usage_forecast": np.array(USAGE_EN)[regime],
+        }
+    )
+
+
+def pk5y_actual_mc_hourly(truth, first, last, rng, vintages):
+    rows = local_rows(truth, first, last, "h")
+    raw = {
+        "Data": rows["date"].dt.strftime("%Y-%m-%d"),
+        "Godzina": rows["slot"] + 1,
+        "Suma_zdolnosci_wytworczych_jednostek_wytworczych_w_KSE": decimal_comma(
+            rows["capacity"]
+        ),
+    }
+    for source, _, old in PK5Y_ACTUAL.values():
+        if old is not None:
+            raw[old] = decimal_comma(rows[source])
+    return pd.DataFrame(raw)
+
+
+def pk5y_actual_mc(truth, first, last, rng, vintages):
+    rows = local_rows(truth, first, last)
+    raw = {
+        "Doba_handlowa": rows["date"].dt.strftime("%Y-%m-%d"),
+        "ORED_Jednostka_czasu_od-do": interval_text(rows["local"], 15),
+        "Doba_(udtczas)": rows["date"].dt.strftime("%Y-%m-%d"),
+        "Data_publikacji": (rows["date"] + pd.Timedelta(days=1, hours=8)).dt.strftime(
+            "%Y-%m-%d %H:%M:%S"
+        ),
+    }
+    for source, new, _ in PK5Y_ACTUAL.values():
+        raw[new] = rows[source].round(3).to_numpy()
+    return pd.DataFrame(raw)
+
+
+def pk5y_actual_jwm(truth, first, last, rng, vintages):
+    rows = local_rows(truth, first, last)
+    published = as_utc_text(rows["date"] + pd.Timedelta(days=1, hours=8))
+    raw = {
+        "delivery_start": utc_text(rows.index),
+        "delivery_end": utc_text(rows.index + pd.Timedelta(minutes=15)),
+        "plan_day": rows["date"].dt.strftime("%Y-%m-%d"),
+        "plan_indicator": "ACTUAL",
+        "publication_timestamp": published,
+        "timeseries_plan_created_date": published,
+    }
+    for column, (source, _, _) in PK5Y_ACTUAL.items():
+        raw[column] = rows[source].round(3).to_numpy()
+    return pd.DataFrame(raw)
+
+
+def _pk5y_values(rows, rng, error, names):
+    """pk5y forecast columns of rows, named by `names` (English -> name)."""
+    sources = [source for source, _, _ in PK5Y_FORECAST.values()]
+    values = forecast(rows, list(dict.fromkeys(sources)), rng, error)
+    return {
+        names[column]: values[source].round(3).to_numpy()
+        for column, (source, _, _) in PK5Y_FORECAST.items()
+    }
+
+
+def pk5y_plan_history(truth, first, last, rng, vintages):
+    rows = local_rows(truth, first, last, "h")
+    raw = {
+        "Doba": rows["date"].dt.strftime("%Y-%m-%d"),
+        "Godzina": rows["slot"] + 1,
+    }
+    names = {column: old for column, (_, _, old) in PK5Y_FORECAST.items()}
+    raw.update(_pk5y_values(rows, rng, FORECAST_ERROR, names))
+    return pd.DataFrame(raw)
+
+
+def pk5y_plan(truth, first, last, rng, vintages, updates=("10:00",)):
+    """MC coordination plan: one hourly block per delivery day and update time."""
+    rows = local_rows(truth, first, last, "h")
+    names = {column: mc for column, (_, mc, _) in PK5Y_FORECAST.items()}
+    frames = []
+    for i, update in enumerate(updates):
+        published = day_before(rows["date"], update).strftime("%Y-%m-%d %H:%M:%S")
+        raw = {
+            "Doba": rows["date"].dt.strftime("%Y-%m-%d")
+            + " "
+            + (rows["slot"] + 1).astype(str),
+            "Doba handlowa": rows["date"].dt.strftime("%Y-%m-%d"),
+            "Data utworzenia": published,
+            "Data publikacji": published,
+            "Data aktualizacji": published,
+        }
+        error = FORECAST_ERROR * (1 - 0.5 * i / max(len(updates), 1))
+        raw.update(_pk5y_values(rows, rng, error, names))
+        frames.append(
+            pd.DataFrame(raw).assign(_day=rows["date"].to_numpy(), _vintage=i)
+        )
+    plan = pd.concat(frames, ignore_index=True)
+    # one block of hours per (day, update), days in order
+    plan = plan.sort_values(["_day", "_vintage"], kind="stable")
+    return plan.drop(columns=["_day", "_vintage"])
+
+
+def pk5y_plan_new(truth, first, last, rng, vintages):
+    plan = pk5y_plan(truth, first, last, rng, vintages)
+    return plan.drop(columns=["Data aktualizacji"])
+
+
+def pk5y_plan_live(truth, first, last, rng, vintages):
+    return pk5y_plan(truth, first, last, rng, vintages, LIVE_UPDATES[:vintages])
+
+
+def pk5y_saved(truth, first, last, rng, vintages, time="10:00"):
+    """JWM pk5y plan saved once a day at local `time` (hourly)."""
+    rows = local_rows(truth, first, last, "h")
+    raw = {
+        "delivery_start": utc_text(rows.index),
+        "delivery_end": utc_text(rows.index + pd.Timedelta(hours=1)),
+        "plan_day": rows["date"].dt.strftime("%Y-%m-%d"),
+        "plan_indicator": "PK5Y",
+        "publication_timestamp": as_utc_text(day_before(rows["date"], time)),
+    }
+    raw.update(_pk5y_values(rows, rng, FORECAST_ERROR, {c: c for c in PK5Y_FORECAST}))
+    return pd.DataFrame(raw)
+
+
+def pk5y_saved_eod(truth, first, last, rng, vintages):
+    return pk5y_saved(truth, first, last, rng, vintages, "23:59")
+
+
+def pk5y_snapshot(time):
+    """Builder of the JWM pk5y snapshot taken at local `time` (quarter-hourly)."""
+    position = SNAPSHOTS.index(time)
+
+    def build(truth, first, last, rng, vintages):
+        rows = local_rows(truth, first, last)
+        created = as_utc_text(day_before(rows["date"], time))
+        published = pd.Series(created)
+        # some snapshots carry no publication time and fall back to created
+        published[rng.random(len(published)) < 0.02] = None
+        raw = {
+            "delivery_start": utc_text(rows.index),
+            "delivery_end": utc_text(rows.index + pd.Timedelta(minutes=15)),
+            "timeseries_plan_indicator": "PK5Y",
+            "publication_timestamp": published.to_numpy(),
+            "timeseries_plan_created_date": created,
+        }
+        error = FORECAST_ERROR * (1 - 0.5 * position / len(SNAPSHOTS))
+        raw.update(_pk5y_values(rows, rng, error, {c: c for c in PK5Y_FORECAST}))
+        return pd.DataFrame(raw)
+
+    return build
+
+
+def rb_mc_hourly(truth, first, last, rng, vintages):
+    rows = local_rows(truth, first, last, "h")
+    return pd.DataFrame(
+        {
+            "Data": rows["date"].dt.strftime("%Y%m%d").astype(int),
+            "Godzina": rows["slot"] + 1,
+            "CRO": decimal_comma(rows["bilans_price"], 2),
+            "CRZ": decimal_comma(rows["bilans_price"] * 0.98, 2),
+        }
+    )
+
+
+def rb_mc(truth, first, last, rng, vintages):
+    rows = local_rows(truth, first, last)
+    return pd.DataFrame(
+        {
+            "doba": rows["date"].dt.strftime("%Y-%m-%d"),
+            "udtczas_oreb": interval_text(rows["local"], 15),
+            "cen_rozl": rows["bilans_price"].round(2).to_numpy(),
+            "source_datetime": (
+                rows["date"] + pd.Timedelta(days=1, hours=14)
+            ).dt.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+    )
+
+
+def rb_jwm(truth, first, last, rng, vintages):
+    rows = local_rows(truth, first, last)
+    return pd.DataFrame(
+        {
+            "Delivery start": utc_text(rows.index),
+            "Delivery end": utc_text(rows.index + pd.Timedelta(minutes=15)),
+            "Type": "CEN_ROZL",
+            "Date": rows["date"].dt.strftime("%Y-%m-%d"),
+            "Publication timestamp": as_utc_text(
+                rows["date"] + pd.Timedelta(days=1, hours=14)
+            ),
+            "Price": rows["bilans_price"].round(2).to_numpy(),
+        }
+    )
+
+
+def fix_mc_history(truth, first, last, rng, vintages):
+    rows = local_rows(truth, first, last, "h")
+    return pd.DataFrame(
+        {
+            "date": rows["date"].dt.strftime("%d-%m-%Y"),
+            "fixing_i_price": rows["fixing1_price"].round(2).to_numpy(),
+            "fixing_ii_price": rows["fixing2_price"].round(2).to_numpy(),
+            "fixing_i_volume": rows["fixing1_volume"].round(1).to_numpy(),
+            "fixing_ii_volume": rows["fixing2_volume"].round(1).to_numpy(),
+        }
+    )
+
+
+def _spaced(values, digits=2):
+    """Numbers as text with a space thousands separator, like the TGE export."""
+    text = pd.Series(values, dtype="float64").map(f"{{:,.{digits}f}}".format)
+    return text.astype(str).str.replace(",", " ").to_numpy()
+
+
+def fix_mc(truth, first, last, rng, vintages):
+    rows = local_rows(truth, first, last, "h")
+    return pd.DataFrame(
+        {
+            "date": rows["date"].dt.strftime("%d-%m-%Y"),
+            "time": interval_text(rows["local"], 60),
+            "fixing1_price": _spaced(rows["fixing1_price"]),
+            "fixing1_volume": _spaced(rows["fixing1_volume"], 1),
+            "fixing2_price": _spaced(rows["fixing2_price"]),
+            "fixing2_volume": _spaced(rows["fixing2_volume"], 1),
+            "continuous_price": _spaced(rows["bilans_price"]),
+            "continuous_volume": _spaced(rows["fixing2_volume"] / 2, 1),
+        }
+    )
+
+
+def fix_jwm(fixing, volume=True):
+    """Builder of a JWM TGE fixing export (fixing 1 or 2, hourly)."""
+
+    def build(truth, first, last, rng, vintages):
+        rows = local_rows(truth, first, last, "h")
+        raw = {
+            "Delivery start": utc_text(rows.index),
+            "Delivery end": utc_text(rows.index + pd.Timedelta(hours=1)),
+            "Type": f"FIX_{fixing}",
+            "Date": rows["date"].dt.strftime("%Y-%m-%d"),
+            "Price": rows[f"fixing{fixing}_price"].round(2).to_numpy(),
+        }
+        if volume:
+            raw["Volume"] = rows[f"fixing{fixing}_volume"].round(1).to_numpy()
+        return pd.DataFrame(raw)
+
+    return build
+
+
+# Every file the ingestion notebooks download: path under SOURCES_DIR ->
+# (first local date or None for the start of the history, last local date
+# (exclusive) or None for its end, builder)
+SOURCES = {
+    "power_live/pse_prognozowane_zapotrzebowanie.csv": (None, MC_LIVE_END, kse_load_mc),
+    "jwm/utc/kse_load_forecast.csv": (MC_LIVE_END, None, kse_load_jwm),
+    "power/godziny_szczytu.csv": (None, MC_LIVE_END, peak_hours_mc),
+    "jwm/utc/peak_hours.csv": (MC_LIVE_END, None, peak_hours_jwm),
+    "power/raport_dobowy_old.csv": (None, MC_HOURLY_END, pk5y_actual_mc_hourly),
+    "power/raport_dobowy_kse.csv": (MC_HOURLY_END, JWM_ACTUALS, pk5y_actual_mc),
+    "jwm/utc/kse.csv": (JWM_ACTUALS, None, pk5y_actual_jwm),
+    "power/pse_plan_koordynacyjny_2021-2024.csv": (
+        None,
+        PK5Y_HISTORY_END,
+        pk5y_plan_history,
+    ),
+    "power/pse_plan_koordynacyjny.csv": (JWM_ACTUALS, PK5Y_LIVE, pk5y_plan_new),
+    "power_live/pse_plan_koordynacyjny.csv": (PK5Y_LIVE, None, pk5y_plan_live),
+    "jwm/utc/pk5y_actual_at_10-00.csv": (JWM_ACTUALS, PK5Y_AT_10_END, pk5y_saved),
+    "jwm/utc/pk5y_actual_eod.csv": (JWM_ACTUALS, PK5Y_EOD_END, pk5y_saved_eod),
+    **{
+        f"jwm/utc/pk5y_forecast_{time.replace(':', '-')}.csv": (
+            PK5Y_AT_10_END,
+            None,
+            pk5y_snapshot(time),
+        )
+        for time in SNAPSHOTS
+    },
+    "power/pse_ceny_rozliczeniowe_2013-2024.csv": (None, MC_HOURLY_END, rb_mc_hourly),
+    "power/pse_ceny_rozliczeniowe.csv": (MC_HOURLY_END, JWM_ACTUALS, rb_mc),
+    "jwm/utc/regulation_prices.csv": (JWM_ACTUALS, None, rb_jwm),
+    "power/electricity_prices_day_ahead_hourly_all.csv": (
+        None,
+        FIX_MC_NEW,
+        fix_mc_history,
+    ),
+    "power/tge_energy.csv": (FIX_MC_NEW, FIX_MC_END, fix_mc),
+    "jwm/utc/tge_fix_1_before_2025.csv": (FIX_MC_END, FIX_JWM_NEW, fix_jwm(1)),
+    "jwm/utc/tge_fix_2_before_2025.csv": (FIX_MC_END, FIX_JWM_NEW, fix_jwm(2)),
+    "jwm/utc/tge_fix_1.csv": (FIX_JWM_NEW, None, fix_jwm(1, volume=False)),
+    "jwm/utc/tge_fix_2.csv": (FIX_JWM_NEW, None, fix_jwm(2, volume=False)),
+}
+
+
+def history_start(years, end=END):
+    """
+    First local date of `years` years of history ending at `end`, at the
+    latest LATEST_START.
+    """
+    start = pd.Timestamp(end) - pd.DateOffset(days=round(365.25 * years))
+    return min(start, pd.Timestamp(LATEST_START)).strftime("%Y-%m-%d")
+
+
+def generate(years=2, vintages=3, end=END, seed=0):
+    """
+    Write every raw source of SOURCES for `years` years of history before
+    `end`, with `vintages` updates per day of the live pk5y plan, under
+    out/SOURCES_DIR. Each file covers its part of the history, clipped to
+    the generated span; files outside of it are written empty (header
+    only), like a feed that has no rows for the period. Returns the number
+    of rows written per file.
+    """
+    start = history_start(years, end)
+    truth = simulate(start, end, seed)
+    rng = np.random.default_rng(seed + 1)
+    root = out_path / SOURCES_DIR
+    rows = {}
+    for path, (first, last, build) in SOURCES.items():
+        first = max(first or start, start)
+        last = min(last or end, end)
+        frame = build(truth, first, max(first, last), rng, vintages)
+        file = root / path
+        file.parent.mkdir(parents=True, exist_ok=True)
+        frame.to_csv(file, index=False)
+        rows[path] = len(frame)
+    return pd.Series(rows, name="rows")
+
+
+class SourceDownloader:
+    """DataDownloader serving the raw sources written by generate."""
+
+    def __init__(self, *args, **kwargs):
+        self.root = out_path / SOURCES_DIR
+
+    def get_csv_as_dataframe(self, container, name):
+        return pd.read_csv(self.root / container / name)
+
+
+class JwmSourceDownloader:
+    """JwmDataDownloader serving the raw sources written by generate."""
+
+    def __init__(self, *args, **kwargs):
+        self.root = out_path / SOURCES_DIR / "jwm"
+
+    def download_as_dataframe(self, path):
+        return pd.read_csv(self.root / path)
+
+
+def replay(script):
+    """
+    Run an ingestion notebook (scripts/<script>.py) in this process with
+    the downloaders replaced by SourceDownloader and JwmSourceDownloader.
+    """
+    sys.modules["data_downloader"] = types.SimpleNamespace(
+        DataDownloader=SourceDownloader
+    )
+    sys.modules["jwm_data_downloader"] = types.SimpleNamespace(
+        JwmDataDownloader=JwmSourceDownloader
+    )
+    runpy.run_path(str(Path(__file__).parent / f"{script}.py"), run_name="__main__")
+
+
+def ingest(scripts=INGESTION):
+    """Replay every ingestion notebook on the generated sources, each in its own process."""
+    for script in scripts:
+        subprocess.run([sys.executable, __file__, "--replay", script], check=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Generate synthetic raw sources and ingest them into out/."
+    )
+    parser.add_argument(
+        "--years",
+        type=float,
+        default=2,
+        help=f"Years of history to generate (back to {LATEST_START} at least).",
+    )
+    parser.add_argument(
+        "--vintages",
+        type=int,
+        default=3,
+        help=f"Updates per day of the live pk5y plan (at most {len(LIVE_UPDATES)}).",
+    )
+    parser.add_argument("--end", default=END, help="Last local day (exclusive).")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed.")
+    parser.add_argument(
+        "--ingest",
+        action="store_true",
+        help="Also run the ingestion notebooks on the generated sources.",
+    )
+    parser.add_argument("--replay", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.replay:
+        replay(args.replay)
+        sys.exit(0)
+    rows = generate(args.years, args.vintages, args.end, args.seed)
+    print(rows.to_string())
+    print(f"Sources saved to {out_path / SOURCES_DIR}")
+    if args.ingest:
+        ingest()
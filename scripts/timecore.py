@@ -0,0 +1,214 @@
+from functools import cached_property
+import numpy as np
+import pandas as pd
+
+TZ = "Europe/Warsaw"
+
+NS_PER_MINUTE = 60 * 10**9
+NS_PER_HOUR = 60 * NS_PER_MINUTE
+NS_PER_DAY = 24 * NS_PER_HOUR
+# int64 value numpy and pandas use for NaT
+NAT = np.iinfo(np.int64).min
+
+# Series are stored at their native resolution (minutes per row) and only
+# expanded to the 15-minute base grid when they are aligned in merge
+RESOLUTION_COLUMN = "resolution_min"
+BASE_RESOLUTION = 15
+
+
+def to_epoch(values) -> np.ndarray:
+    """UTC epoch nanoseconds (int64) of tz-aware timestamps; NaT becomes NAT."""
+    index = pd.DatetimeIndex(values)
+    if index.tz is None:
+        raise ValueError("to_epoch expects tz-aware timestamps")
+    return index.tz_convert("UTC").astype("datetime64[ns, UTC]").asi8
+
+
+def from_epoch(epoch) -> pd.DatetimeIndex:
+    """UTC DatetimeIndex from epoch nanoseconds (NAT becomes NaT)."""
+    values = np.asarray(epoch, dtype="int64").view("datetime64[ns]")
+    return pd.DatetimeIndex(values).tz_localize("UTC")
+
+
+def to_utc(values, tz=TZ, **localize_kwargs) -> pd.Series:
+    """
+    Parse timestamps to UTC. Tz-naive values are wall times in `tz` and are
+    localized with `localize_kwargs` (ambiguous=, nonexistent=) first.
+    """
+    parsed = pd.to_datetime(values)
+    if isinstance(parsed.dtype, pd.DatetimeTZDtype):
+        return parsed.dt.tz_convert("UTC")
+    if pd.api.types.is_datetime64_dtype(parsed.dtype):
+        return parsed.dt.tz_localize(tz, **localize_kwargs).dt.tz_convert("UTC")
+    # Mixed UTC offsets (e.g. +01:00 and +02:00 in one column)
+    return pd.to_datetime(values, utc=True)
+
+
+def local_day_start(dates, tz=TZ) -> pd.DatetimeIndex:
+    """
+    UTC instant of local midnight for every date. Each distinct date is
+    localized once and broadcast back, so long columns cost one small pass.
+    """
+    days = pd.DatetimeIndex(pd.to_datetime(dates)).normalize()
+    if days.tz is not None:
+        days = days.tz_localize(None)
+    days = days.astype("datetime64[ns]")
+    unique, inverse = np.unique(days.asi8, return_inverse=True)
+    valid = unique != NAT
+    starts = np.full(len(unique), NAT, dtype="int64")
+    starts[valid] = to_epoch(
+        pd.DatetimeIndex(unique[valid].view("datetime64[ns]")).tz_localize(tz)
+    )
+    return from_epoch(starts[inverse.ravel()])
+
+
+def local_slots_to_utc(dates, slots, freq="h", tz=TZ) -> pd.DatetimeIndex:
+    """
+    Map (local date, slot number within that day) to the UTC start of the slot.
+    A day has 23/24/25 hourly (92/96/100 quarter-hour) slots; slots past the
+    end of a short day map to NaT, and the doubled October 02:00 hour gets
+    two distinct UTC instants.
+    """
+    step = pd.tseries.frequencies.to_offset(freq).nanos
+    start = to_epoch(local_day_start(dates, tz))
+    next_day = pd.DatetimeIndex(pd.to_datetime(dates)) + pd.Timedelta(days=1)
+    end = to_epoch(local_day_start(next_day, tz))
+    slots = np.asarray(slots, dtype="int64")
+    utc = start + slots * step
+    valid = (start != NAT) & (slots >= 0) & (utc < end)
+    return from_epoch(np.where(valid, utc, NAT))
+
+
+def _add_utc(df, date_col, slot_col, freq, tz, out_col, local_col):
+    out = df.copy()
+    out[slot_col] = out[slot_col].astype(int)
+    day = pd.to_datetime(out[date_col]).dt.normalize()
+    utc = local_slots_to_utc(day, out[slot_col], freq=freq, tz=tz)
+    if local_col is not None:
+        out[local_col] = utc.tz_convert(tz)
+    out[out_col] = utc
+    return out.reset_index(drop=True)
+
+
+def add_utc_25(
+    df: pd.DataFrame,
+    date_col: str = "date",
+    hour_col: str = "hour",
+    tz: str = TZ,
+    out_col: str = "Date_utc",
+    local_col: str = None,
+) -> pd.DataFrame:
+    """
+    Add the UTC start of every (date, hour 0..22/23/24) row as `out_col`.
+    Local wall time is only materialized when `local_col` is given.
+    """
+    return _add_utc(df, date_col, hour_col, "h", tz, out_col, local_col)
+
+
+def add_utc_25_15min(
+    df: pd.DataFrame,
+    date_col: str = "date",
+    hour_index_col: str = "hour_index",
+    tz: str = TZ,
+    out_col: str = "Date_utc",
+    local_col: str = None,
+) -> pd.DataFrame:
+    """
+    Add the UTC start of every (date, quarter-hour 0..91/95/99) row as `out_col`.
+    Local wall time is only materialized when `local_col` is given.
+    """
+    return _add_utc(df, date_col, hour_index_col, "15min", tz, out_col, local_col)
+
+
+def tag_resolution(df: pd.DataFrame, minutes: int) -> pd.DataFrame:
+    """Mark every row of df as covering `minutes` minutes from its Date_utc."""
+    return df.assign(**{RESOLUTION_COLUMN: np.int8(minutes)})
+
+
+def expand_resolution(
+    df: pd.DataFrame, time_col: str = "Date_utc", base: int = BASE_RESOLUTION
+) -> pd.DataFrame:
+    """
+    Expand rows tagged with a coarser resolution into `base`-minute rows,
+    repeating their values (an hourly row becomes :00, :15, :30 and :45).
+    Rows without a tag are taken to be at the base resolution already.
+    The resolution column is dropped.
+    """
+    if RESOLUTION_COLUMN not in df.columns:
+        return df
+    resolution = df[RESOLUTION_COLUMN].fillna(base).to_numpy(dtype="int64")
+    df = df.drop(columns=RESOLUTION_COLUMN)
+    repeats = np.maximum(resolution // base, 1)
+    if (repeats == 1).all():
+        return df
+    rows = np.repeat(np.arange(len(df)), repeats)
+    # position of every new row inside the block of its source row
+    step = np.arange(len(rows)) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+    out = df.iloc[rows].reset_index(drop=True)
+    epoch = to_epoch(out[time_col])
+    epoch = np.where(epoch == NAT, NAT, epoch + step * base * NS_PER_MINUTE)
+    out[time_col] = from_epoch(epoch).tz_convert(out[time_col].dt.tz)
+    return out
+
+
+class LocalCalendar:
+    """
+    Local-time views (date, hour, minute, DST flag) of UTC epoch timestamps.
+
+    Only the UTC epoch is stored; each view is derived on first access and
+    cached. UTC offsets are looked up once per distinct UTC hour, since
+    Europe/Warsaw only changes offset on the hour. Like the pandas .dt
+    accessors, hour and minute are float with NaN when the input has NaT.
+    """
+
+    def __init__(self, epoch, tz=TZ):
+        self.epoch = np.asarray(epoch, dtype="int64")
+        self.tz = tz
+
+    @classmethod
+    def of(cls, values, tz=TZ):
+        """Calendar for a tz-aware Series/Index of timestamps."""
+        return cls(to_epoch(values), tz=tz)
+
+    @cached_property
+    def valid(self) -> np.ndarray:
+        return self.epoch != NAT
+
+    @cached_property
+    def offset(self) -> np.ndarray:
+        """UTC offset of every timestamp in nanoseconds (0 for NaT)."""
+        hours, inverse = np.unique(
+            np.where(self.valid, self.epoch, 0) // NS_PER_HOUR, return_inverse=True
+        )
+        utc = from_epoch(hours * NS_PER_HOUR)
+        local = utc.tz_convert(self.tz).tz_localize(None).asi8
+        return (local - utc.asi8)[inverse.ravel()]
+
+    @cached_property
+    def local(self) -> np.ndarray:
+        """Local wall time as naive epoch nanoseconds."""
+        return np.where(self.valid, self.epoch + self.offset, NAT)
+
+    def _masked(self, values):
+        if self.valid.all():
+            return values
+        return np.where(self.valid, values, np.nan)
+
+    @cached_property
+    def date(self) -> np.ndarray:
+        """Local calendar date (datetime64[D], NaT for NaT)."""
+        days = np.where(self.valid, self.local // NS_PER_DAY, NAT)
+        return days.view("datetime64[D]")
+
+    @cached_property
+    def hour(self) -> np.ndarray:
+        return self._masked((self.local % NS_PER_DAY) // NS_PER_HOUR)
+
+    @cached_property
+    def minute(self) -> np.ndarray:
+        return self._masked((self.local % NS_PER_HOUR) // NS_PER_MINUTE)
+
+    @cached_property
+    def is_dst(self) -> np.ndarray:
+        standard = pd.Timedelta(pd.Timestamp("2000-01-01", tz=self.tz).utcoffset())
+        return self.valid & (self.offset != standard.value)
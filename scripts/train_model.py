@@ -1,12 +1,16 @@
 import pandas as pd
 import numpy as np
 import datetime
-import statsmodels.api as sm
 from pathlib import Path
 import argparse
-from tqdm import tqdm
+import time
+from aggregates import update_aggregates
+from instrument import start_stage, step
+from storage import read_frame, write_frame
+from timecore import BASE_RESOLUTION
 
-out_path = Path(__file__).parent / "../out"
+# First day kept by prepare_power_model_dataframe
+MODEL_START = datetime.date(2024, 1, 2)
 
 
 ### Function for creating weighted model
@@ -43,6 +47,9 @@ def create_weighted_model(
 
     df_train["weight"] = weights
 
+    # statsmodels is slow to import, so only the fitting code loads it
+    import statsmodels.api as sm
+
     # Prepare X, y, and weights for the model
     X = sm.add_constant(df_train[col_x], has_constant="add")
     y = df_train[predicted_value]
@@ -72,26 +79,54 @@ def prepare_power_model_dataframe(power_data, predicted_value):
     power_model["date"] = power_model.index.date
     power_model["hour"] = power_model.index.hour
     power_model = power_model.reset_index()
-    power_model = power_model[power_model["date"] > datetime.date(2024, 1, 1)]
+    power_model = power_model[power_model["date"] >= MODEL_START]
     power_model.set_index(["date"], inplace=True)
     return power_model
 
 
+def resample_training_data(df, columns, resolution):
+    """
+    Mean of `columns` per `resolution` minute period of Date_utc, indexed by
+    date like power_model, so the model is fit on one row per period.
+    """
+    period = df["Date_utc"].dt.floor(f"{resolution}min").rename("Date_utc")
+    frame = df[columns].groupby(period.to_numpy()).mean()
+    frame["date"] = frame.index.date
+    return frame.set_index("date")
+
+
 def process_dates(
-    power_model, predicted_value, features_actual_forecast, train_days, weight_type
+    power_model,
+    predicted_value,
+    features_actual_forecast,
+    train_days,
+    weight_type,
+    resolution=BASE_RESOLUTION,
 ):
     """
     Process each date: train model, make predictions, calculate profits.
+    With a `resolution` above 15 minutes the model is fit on features and
+    target averaged per `resolution` minutes, and predictions are still
+    made for every 15 minute row of the test date.
     """
+    import statsmodels.api as sm
+    from tqdm import tqdm
+
     dates = power_model.index.unique()
     col_x = list(features_actual_forecast.keys())
+    # Cleaned training data (drop NaNs in features)
+    train_data = power_model.dropna(subset=col_x)
+    if resolution != BASE_RESOLUTION:
+        train_data = resample_training_data(
+            train_data, [*col_x, predicted_value], resolution
+        )
     for date in tqdm(dates, desc="Processing dates"):
         # Set end of training period: 3 days before the current date
         end_train = date - pd.Timedelta(days=3)
 
-        # Get model results using cleaned data (drop NaNs in features)
+        # Get model results using the training data
         result = create_weighted_model(
-            power_model.dropna(subset=col_x),
+            train_data,
             predicted_value,
             col_x,
             end_train,
@@ -122,37 +157,80 @@ def process_dates(
                     power_model.loc[test_mask, coef_col] = result.params[feature]
                 power_model.loc[test_mask, "coef_const"] = result.params["const"]
 
-                # Aggregate predictions by date and hour (mean)
-                test_df["prediction"] = test_df.groupby(["date", "hour"])[
-                    "prediction"
-                ].transform("mean")
-                test_df["prediction_forecast"] = test_df.groupby(["date", "hour"])[
-                    "prediction_forecast"
-                ].transform("mean")
-
                 # Assign back to power_model
                 power_model.loc[test_mask, "prediction"] = test_df["prediction"]
                 power_model.loc[test_mask, "prediction_forecast"] = test_df[
                     "prediction_forecast"
                 ]
 
+    # Aggregate predictions by date and hour (mean), in one pass over all dates
+    if "prediction" in power_model:
+        predictions = ["prediction", "prediction_forecast"]
+        power_model[predictions] = power_model.groupby(["date", "hour"])[
+            predictions
+        ].transform("mean")
+
     return power_model
 
 
-def train(predicted_value, features_actual_forecast, train_days=90, weight_type="exp"):
+def train(
+    predicted_value,
+    features_actual_forecast,
+    train_days=90,
+    weight_type="exp",
+    resolution=BASE_RESOLUTION,
+):
     """
     Main function to run the entire process.
     """
-    power_data = pd.read_parquet(out_path / "final.parquet")
+    columns = [
+        "bilans_price",
+        "fixing1_price",
+        *features_actual_forecast.keys(),
+        *features_actual_forecast.values(),
+    ]
+    # Regression runs in float64 regardless of the compact storage dtypes
+    power_data = read_frame(
+        "final.parquet", columns=list(dict.fromkeys(columns)), start=MODEL_START
+    ).astype("float64")
     power_model = prepare_power_model_dataframe(power_data, predicted_value)
     power_model = process_dates(
-        power_model, predicted_value, features_actual_forecast, train_days, weight_type
+        power_model,
+        predicted_value,
+        features_actual_forecast,
+        train_days,
+        weight_type,
+        resolution,
     )
     power_model = power_model.reset_index()
     power_model.set_index(["Date_utc"], inplace=True)
     return power_model
 
 
+# Columns of result.parquet kept in its hourly aggregate table, the errors
+# evaluate_model.py reports on (the daily table keeps all result_columns)
+HOURLY_COLUMNS = ["error_actual", "error_forecast"]
+
+
+def result_columns(predicted_value):
+    """Columns of result.parquet kept in its daily and hourly aggregate tables."""
+    return list(
+        dict.fromkeys(
+            [
+                predicted_value,
+                "bilans_price",
+                "fixing1_price",
+                "model_prediction",
+                "model_prediction_forecast",
+                "model_profit",
+                "model_profit_forecast",
+                "error_actual",
+                "error_forecast",
+            ]
+        )
+    )
+
+
 def calculate_stats(power_model, predicted_value):
     if predicted_value == "bilans_price":
         long_cond = power_model["prediction"] > power_model["fixing1_price"]
@@ -193,6 +271,19 @@ def calculate_stats(power_model, predicted_value):
     )
 
 
+def summarize(power_model, seconds):
+    """Accuracy and PnL of a finished run, for comparing training resolutions."""
+    summary = {"train + predict [s]": seconds}
+    for name in ["actual", "forecast"]:
+        suffix = "" if name == "actual" else "_forecast"
+        error = power_model[f"error_{name}"]
+        profit = power_model[f"model_profit{suffix}"]
+        summary[f"RMSE {name}"] = np.sqrt((error**2).mean())
+        summary[f"MAE {name}"] = error.abs().mean()
+        summary[f"Total PnL {name}"] = profit.sum()
+    return pd.Series(summary)
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         description="Run power model training and analysis."
@@ -212,7 +303,28 @@ if __name__ == "__main__":
         default="bilans_price",
         help="Target to predict: spread or bilans_price.",
     )
+    parser.add_argument(
+        "--resolution",
+        type=int,
+        default=BASE_RESOLUTION,
+        help="Minutes the training data is averaged to before fitting (multiple of 15).",
+    )
+    parser.add_argument(
+        "--compare",
+        action="store_true",
+        help="Also run the 15 minute fit and print both side by side.",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Sample the stage with the profiler into out/profile.",
+    )
     args = parser.parse_args()
+    if args.resolution < BASE_RESOLUTION or args.resolution % BASE_RESOLUTION:
+        parser.error(f"--resolution must be a multiple of {BASE_RESOLUTION} minutes")
+    if args.compare and args.resolution == BASE_RESOLUTION:
+        parser.error(f"--compare needs --resolution > {BASE_RESOLUTION}")
+    start_stage("train_model", profile=args.profile)
 
     # Read features map from CSV in parent directory
     script_dir = Path(__file__).parent
@@ -221,15 +333,36 @@ if __name__ == "__main__":
     features_actual_forecast = dict(zip(features_df["actual"], features_df["forecast"]))
 
     predicted_value = args.target
-    result = train(
-        predicted_value,
-        features_actual_forecast,
-        train_days=args.train_days,
-        weight_type=args.weight_type,
-    )
-    calculate_stats(result, predicted_value)
-    result = result[result["date"] > datetime.date(2024, 10, 10)]
-    result.to_parquet(
-        out_path / "result.parquet",
-        index=True,  # Preserve index assuming it's meaningful (e.g., datetime)
-    )
+    resolutions = [args.resolution]
+    if args.compare:
+        resolutions.append(BASE_RESOLUTION)
+    summaries = {}
+    for resolution in resolutions:
+        started = time.perf_counter()
+        with step(f"train {resolution} min"):
+            run = train(
+                predicted_value,
+                features_actual_forecast,
+                train_days=args.train_days,
+                weight_type=args.weight_type,
+                resolution=resolution,
+            )
+        seconds = time.perf_counter() - started
+        calculate_stats(run, predicted_value)
+        run = run[run["date"] > datetime.date(2024, 10, 10)]
+        summaries[f"{resolution} min"] = summarize(run, seconds)
+        if resolution == args.resolution:
+            result = run
+    if len(summaries) > 1:
+        print(pd.DataFrame(summaries).to_string(float_format="{:.2f}".format))
+    with step("write"):
+        write_frame(
+            result,
+            "result.parquet",
+            index=True,  # Preserve index assuming it's meaningful (e.g., datetime)
+        )
+        update_aggregates(
+            result[result_columns(predicted_value)],
+            "result.parquet",
+            hourly=HOURLY_COLUMNS,
+        )
@@ -1,11 +1,65 @@
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
 import numpy as np
 import pandas as pd
 from datetime import date
-import sys
-import webbrowser
-from pathlib import Path
+from aggregates import PERIODS, aggregate, error_column, read_aggregates
+from downsample import LINE_POINTS, SCATTER_POINTS, density, downsample
+from storage import out_path, read_frame
+
+features_map_path = Path(__file__).parent.parent / "features_map.csv"
+
+# HTML reports, and the summary table of a --batch run
+REPORTS_PATH = out_path / "html"
+SUMMARY_FILE = REPORTS_PATH / "validation_summary.csv"
+
+# Smoothing windows at least this long roll over the daily error aggregates,
+# shorter ones over the hourly aggregates
+SMOOTHING_DAILY = pd.Timedelta(days=7)
+
+
+def pair_metrics(df: pd.DataFrame, pairs) -> pd.DataFrame:
+    """
+    Forecast metrics of every (actual, forecast) pair at once, from one
+    (n, len(pairs)) block per side; every pair only uses the rows where
+    both of its columns are known. One row per pair.
+    """
+    actual_cols = [actual for actual, _ in pairs]
+    forecast_cols = [forecast for _, forecast in pairs]
+    actuals = df[actual_cols].to_numpy(dtype="float64", na_value=np.nan)
+    forecasts = df[forecast_cols].to_numpy(dtype="float64", na_value=np.nan)
+    known = ~(np.isnan(actuals) | np.isnan(forecasts))
+    count = known.sum(axis=0)
+    actuals = np.where(known, actuals, 0.0)
+    forecasts = np.where(known, forecasts, 0.0)
+    error = forecasts - actuals
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mae = np.abs(error).sum(axis=0) / count
+        rmse = np.sqrt((error**2).sum(axis=0) / count)
+        mean_abs_actual = np.abs(actuals).sum(axis=0) / count
+        bias = error.sum(axis=0) / count
+        scale = np.where(mean_abs_actual != 0, mean_abs_actual, np.nan)
+        centered_a = np.where(known, actuals - actuals.sum(axis=0) / count, 0.0)
+        centered_f = np.where(known, forecasts - forecasts.sum(axis=0) / count, 0.0)
+        correlation = (centered_a * centered_f).sum(axis=0) / np.sqrt(
+            (centered_a**2).sum(axis=0) * (centered_f**2).sum(axis=0)
+        )
+    return pd.DataFrame(
+        {
+            "actual": actual_cols,
+            "forecast": forecast_cols,
+            "rows": count,
+            "MAE": mae,
+            "RMSE": rmse,
+            "Relative MAE %": mae / scale * 100,
+            "Bias": bias,
+            "Bias %": np.abs(bias) / scale * 100,
+            "Correlation": correlation,
+        }
+    )
 
 
 def validate_forecasts(df: pd.DataFrame, forecast_col: str, actual_col: str) -> None:
@@ -15,34 +69,46 @@ def validate_forecasts(df: pd.DataFrame, forecast_col: str, actual_col: str) ->
         print(f"Error: Columns '{forecast_col}' or '{actual_col}' missing.")
         return
 
-    # Drop rows with missing values for the two columns
-    analysis = df.dropna(subset=[forecast_col, actual_col])
-    if analysis.empty:
+    metrics = pair_metrics(df, [(actual_col, forecast_col)]).iloc[0]
+    if metrics["rows"] == 0:
         print("No data to analyze after dropping missing values.")
         return
 
-    forecasts = analysis[forecast_col]
-    actuals = analysis[actual_col]
-
-    mae = np.mean(np.abs(actuals - forecasts))
-    rmse = np.sqrt(np.mean((actuals - forecasts) ** 2))
-    mean_abs_actual = np.mean(np.abs(actuals))
-    relative_mae = mae / mean_abs_actual * 100 if mean_abs_actual != 0 else np.nan
-    bias = np.mean(forecasts - actuals)
-    bias_percent = (
-        np.abs(bias) / mean_abs_actual * 100 if mean_abs_actual != 0 else np.nan
-    )
-    correlation = np.corrcoef(actuals, forecasts)[0, 1]
-
-    print(f"Mean Absolute Error (MAE): {mae:.2f} MW")
-    print(f"Root Mean Squared Error (RMSE): {rmse:.2f} MW")
-    print(f"Relative MAE (% of mean |actual|): {relative_mae:.2f}%")
-    print(f"Bias (mean forecast-actual): {bias:.2f} MW")
-    print(f"Bias percentage: {bias_percent:.2f}%")
-    print(f"Pearson correlation: {correlation:.4f}")
+    print(f"Mean Absolute Error (MAE): {metrics['MAE']:.2f} MW")
+    print(f"Root Mean Squared Error (RMSE): {metrics['RMSE']:.2f} MW")
+    print(f"Relative MAE (% of mean |actual|): {metrics['Relative MAE %']:.2f}%")
+    print(f"Bias (mean forecast-actual): {metrics['Bias']:.2f} MW")
+    print(f"Bias percentage: {metrics['Bias %']:.2f}%")
+    print(f"Pearson correlation: {metrics['Correlation']:.4f}")
     print("-----------------------------------------")
 
 
+def period_error(
+    df: pd.DataFrame, forecast_col: str, actual_col: str, period: str = "daily"
+) -> pd.DataFrame:
+    """
+    Count and sum of actual - forecast per `period` (daily or hourly) over
+    the days of df. Taken from the final.parquet aggregates when the pair is
+    in features_map.csv, otherwise aggregated from df.
+    """
+    start = df.index[0].floor("D")
+    end = df.index[-1].floor("D") + pd.Timedelta(days=1)
+    error = error_column(actual_col, forecast_col)
+    try:
+        table = read_aggregates("final.parquet", period, [error], start, end)
+    except (FileNotFoundError, ValueError):
+        table = aggregate(
+            df[[actual_col, forecast_col]],
+            PERIODS[period],
+            [(actual_col, forecast_col)],
+            columns=[],
+        )
+    # the stored error is forecast - actual, the chart shows actual - forecast
+    return pd.DataFrame(
+        {"count": table[f"count_{error}"], "sum": -table[f"sum_{error}"]}
+    ).asfreq(PERIODS[period])
+
+
 def visualize_data(
     df: pd.DataFrame,
     forecast_col: str,
@@ -50,11 +116,15 @@ def visualize_data(
     date_range: tuple,
     output_html_file: str = "walidacja_wizualna.html",
     smoothing_window: str = "7D",  # Nowy parametr: domyślnie 1 tydzień (7 dni)
+    points: int = LINE_POINTS,
+    open_browser: bool = True,
 ):
     """
     Tworzy interaktywne wykresy i zapisuje je do pliku HTML.
     `date_range` powinien być krotką (data_poczatkowa, data_koncna).
     `smoothing_window` określa okno wygładzania dla średniego błędu (np. '7D' dla 7 dni).
+    `points` to maksymalna liczba punktów linii (redukcja LTTB).
+    `open_browser=False` tylko zapisuje plik (tryb wsadowy).
     """
     print(
         f"\n--- Generowanie wykresów wizualnych dla zakresu: {date_range[0]} - {date_range[1]} ---"
@@ -82,6 +152,11 @@ def visualize_data(
     # Obliczenie błędu do wykresu
     df_viz["blad"] = df_viz[actual_col] - df_viz[forecast_col]
 
+    # plotly only loads when a report is drawn (batch mode may skip reports)
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+    import webbrowser
+
     # Tworzenie pod-wykresów (4 zamiast 3)
     fig = make_subplots(
         rows=4,
@@ -95,11 +170,13 @@ def visualize_data(
         vertical_spacing=0.06,
     )
 
-    # Wykres 1: Nakładanie się liniowe
+    # Wykres 1: Nakładanie się liniowe (zredukowane do `points` punktów)
+    actual_line = downsample(df_viz[actual_col], points)
+    forecast_line = downsample(df_viz[forecast_col], points)
     fig.add_trace(
         go.Scatter(
-            x=df_viz.index,
-            y=df_viz[actual_col],
+            x=actual_line.index,
+            y=actual_line,
             name=actual_col,
             line=dict(color="blue"),
         ),
@@ -108,8 +185,8 @@ def visualize_data(
     )
     fig.add_trace(
         go.Scatter(
-            x=df_viz.index,
-            y=df_viz[forecast_col],
+            x=forecast_line.index,
+            y=forecast_line,
             name=forecast_col,
             line=dict(color="red", dash="dash"),
         ),
@@ -118,18 +195,33 @@ def visualize_data(
     )
     fig.update_yaxes(title_text="Zapotrzebowanie [MW]", row=1, col=1)
 
-    # Wykres 2: Wykres rozrzutu
-    fig.add_trace(
-        go.Scatter(
-            x=df_viz[actual_col],
-            y=df_viz[forecast_col],
-            mode="markers",
-            name="Punkty danych",
-            opacity=0.6,
-        ),
-        row=2,
-        col=1,
-    )
+    # Wykres 2: Wykres rozrzutu, powyżej SCATTER_POINTS punktów jako gęstość
+    if len(df_viz) > SCATTER_POINTS:
+        counts, x_centers, y_centers = density(df_viz[actual_col], df_viz[forecast_col])
+        fig.add_trace(
+            go.Heatmap(
+                z=counts,
+                x=x_centers,
+                y=y_centers,
+                name="Gęstość punktów",
+                colorscale="Viridis",
+                showscale=False,
+            ),
+            row=2,
+            col=1,
+        )
+    else:
+        fig.add_trace(
+            go.Scatter(
+                x=df_viz[actual_col],
+                y=df_viz[forecast_col],
+                mode="markers",
+                name="Punkty danych",
+                opacity=0.6,
+            ),
+            row=2,
+            col=1,
+        )
     # Dodanie linii idealnej (y=x)
     min_val = min(df_viz[actual_col].min(), df_viz[forecast_col].min())
     max_val = max(df_viz[actual_col].max(), df_viz[forecast_col].max())
@@ -165,14 +257,19 @@ def visualize_data(
     fig.update_xaxes(title_text="Błąd (Faktyczne - Prognoza) [MW]", row=3, col=1)
     fig.update_yaxes(title_text="Liczba wystąpień", row=3, col=1)
 
-    # Wykres 4: Wygładzony błąd w czasie
-    df_viz["blad_sredni"] = (
-        df_viz["blad"].rolling(window=smoothing_window, min_periods=1).mean()
+    # Wykres 4: Wygładzony błąd w czasie, z godzinowych agregatów dla okien
+    # krótszych niż SMOOTHING_DAILY (krzywa w ciągu doby), dla dłuższych z dziennych
+    period = "hourly" if pd.Timedelta(smoothing_window) < SMOOTHING_DAILY else "daily"
+    errors = period_error(df_viz, forecast_col, actual_col, period)
+    blad_sredni = (
+        errors["sum"].rolling(window=smoothing_window, min_periods=1).sum()
+        / errors["count"].rolling(window=smoothing_window, min_periods=1).sum()
     )
+    blad_sredni = downsample(blad_sredni, points)
     fig.add_trace(
         go.Scatter(
-            x=df_viz.index,
-            y=df_viz["blad_sredni"],
+            x=blad_sredni.index,
+            y=blad_sredni,
             name="Wygładzony błąd",
             line=dict(color="orange"),
         ),
@@ -190,17 +287,32 @@ def visualize_data(
     )
 
     # Zapis do pliku HTML
-    fig.write_html(output_html_file)
+    fig.write_html(output_html_file, include_plotlyjs="cdn")
     print(f"Pomyślnie zapisano wykres w pliku: {output_html_file}")
 
-    webbrowser.open(output_html_file)
+    if open_browser:
+        webbrowser.open(output_html_file)
+
+
+def load_pairs(pairs, columns=()):
+    """Columns of the pairs (and `columns`) from final.parquet, in float64."""
+    names = [name for pair in pairs for name in pair]
+    return read_frame(
+        "final.parquet", columns=list(dict.fromkeys([*names, *columns]))
+    ).astype("float64")
 
 
 def main(forecast_col: str, actual_col: str) -> None:
-    out_path = Path(__file__).parent / "../out"
-    pk = pd.read_parquet(out_path / "final.parquet")
+    pk = load_pairs([(actual_col, forecast_col)])
     validate_forecasts(pk, forecast_col=forecast_col, actual_col=actual_col)
+    render_reports(pk, forecast_col, actual_col)
+
 
+def render_reports(
+    pk: pd.DataFrame, forecast_col: str, actual_col: str, open_browser: bool = True
+) -> None:
+    """The OLD, NEW and ALL HTML reports of one pair."""
+    REPORTS_PATH.mkdir(parents=True, exist_ok=True)
     # Visualization examples
     date_range = ("2024-10-01", "2024-11-01")
     visualize_data(
@@ -208,8 +320,9 @@ def main(forecast_col: str, actual_col: str) -> None:
         forecast_col=forecast_col,
         actual_col=actual_col,
         date_range=date_range,
-        output_html_file=f"out/html/{actual_col}-OLD.html",
+        output_html_file=str(REPORTS_PATH / f"{actual_col}-OLD.html"),
         smoothing_window="1D",
+        open_browser=open_browser,
     )
 
     date_range = ("2025-09-01", "2025-10-01")
@@ -218,8 +331,9 @@ def main(forecast_col: str, actual_col: str) -> None:
         forecast_col=forecast_col,
         actual_col=actual_col,
         date_range=date_range,
-        output_html_file=f"out/html/{actual_col}-NEW.html",
+        output_html_file=str(REPORTS_PATH / f"{actual_col}-NEW.html"),
         smoothing_window="1D",
+        open_browser=open_browser,
     )
 
     date_range = ("2024-01-01", date.today().strftime("%Y-%m-%d"))
@@ -228,16 +342,94 @@ def main(forecast_col: str, actual_col: str) -> None:
         forecast_col=forecast_col,
         actual_col=actual_col,
         date_range=date_range,
-        output_html_file=f"out/html/{actual_col}-ALL.html",
+        output_html_file=str(REPORTS_PATH / f"{actual_col}-ALL.html"),
+        open_browser=open_browser,
     )
 
 
+def _render_pair(args):
+    pk, forecast_col, actual_col = args
+    render_reports(pk, forecast_col, actual_col, open_browser=False)
+    return actual_col
+
+
+def validate_batch(pairs, workers=1, reports=True):
+    """
+    Metrics of every (actual, forecast) pair from one read of final.parquet,
+    and their reports rendered headless on `workers` processes. The summary
+    table (one row per pair) is printed and saved to SUMMARY_FILE.
+    """
+    pk = load_pairs(pairs)
+    summary = pair_metrics(pk, pairs)
+    if reports:
+        jobs = [
+            (pk[[actual, forecast]], forecast, actual) for actual, forecast in pairs
+        ]
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(_render_pair, jobs))
+        else:
+            for job in jobs:
+                _render_pair(job)
+    print(
+        summary.to_string(
+            index=False,
+            float_format="{:.2f}".format,
+            formatters={"Correlation": "{:.4f}".format},
+        )
+    )
+    SUMMARY_FILE.parent.mkdir(parents=True, exist_ok=True)
+    summary.to_csv(SUMMARY_FILE, index=False)
+    print(f"Summary saved to {SUMMARY_FILE}")
+    return summary
+
+
+def parse_pair(text):
+    actual, sep, forecast = text.partition(":")
+    if not sep:
+        raise argparse.ArgumentTypeError(f"expected actual:forecast, got {text}")
+    return actual, forecast
+
+
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: python pk5y_test.py <actual_column> <forecast_column>")
-        print("Example: python pk5y_test.py pv_actual pv_forecast")
-        sys.exit(1)
-
-    actual_col = sys.argv[1]
-    forecast_col = sys.argv[2]
-    main(forecast_col, actual_col)
+    parser = argparse.ArgumentParser(
+        description="Validate forecasts against actuals in final.parquet.",
+        epilog="Example: python validate_forecast.py pv_actual pv_forecast",
+    )
+    parser.add_argument("actual_column", nargs="?")
+    parser.add_argument("forecast_column", nargs="?")
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Validate every pair of features_map.csv (or --pairs) headless.",
+    )
+    parser.add_argument(
+        "--pairs",
+        nargs="+",
+        type=parse_pair,
+        metavar="ACTUAL:FORECAST",
+        help="Pairs for --batch instead of features_map.csv.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="Processes the --batch reports are rendered on.",
+    )
+    parser.add_argument(
+        "--no_reports",
+        action="store_true",
+        help="Only print the --batch summary table, without HTML reports.",
+    )
+    args = parser.parse_args()
+
+    if args.batch:
+        pairs = args.pairs
+        if pairs is None:
+            features = pd.read_csv(features_map_path)
+            pairs = list(zip(features["actual"], features["forecast"]))
+        validate_batch(pairs, args.workers, reports=not args.no_reports)
+    elif args.actual_column and args.forecast_column:
+        main(args.forecast_column, args.actual_column)
+    else:
+        parser.error("give <actual_column> <forecast_column>, or --batch")
@@ -0,0 +1,169 @@
+import argparse
+import numpy as np
+import pandas as pd
+from storage import out_path, read_frame
+from timecore import (
+    NS_PER_HOUR,
+    RESOLUTION_COLUMN,
+    TZ,
+    LocalCalendar,
+    expand_resolution,
+)
+
+# pk5y forecast column -> the pk5y actual column it forecasts
+PAIRS = {
+    "pv_total_generation_forecast": "generation_photovoltaic",
+    "wind_total_generation_forecast": "generation_wind",
+    "grid_demand_forecast": "domestic_power_demand",
+    "avail_gen_of_gen_unit_and_energy_storage_rb": "generation_kse",
+    "avail_gen_of_gen_unit_and_energy_storage_non_rb": "generation_jgna",
+}
+
+# Local times on the day before delivery the forecasts are taken as of:
+# the pk5y snapshot times
+CUTOFFS = ["07:30", "10:05", "10:10", "10:15", "10:20", "23:59"]
+
+OUTPUT_FILE = "vintage_accuracy.csv"
+
+
+def cutoff_times(delivery, cutoffs):
+    """
+    UTC instant of every local `cutoffs` time (HH:MM) on the local day
+    before each delivery timestamp, as an (len(delivery), len(cutoffs))
+    int64 epoch array. Every distinct day is localized once.
+    """
+    days, inverse = np.unique(
+        LocalCalendar.of(delivery).date - np.timedelta64(1, "D"), return_inverse=True
+    )
+    days = pd.DatetimeIndex(days.astype("datetime64[ns]"))
+    times = np.column_stack(
+        [
+            (days + pd.Timedelta(f"{cutoff}:00")).tz_localize(TZ).asi8
+            for cutoff in cutoffs
+        ]
+    )
+    return times[inverse.ravel()]
+
+
+def as_of_forecasts(forecast, cutoffs):
+    """
+    The latest forecast of every delivery Date_utc published by every
+    cutoff, from one grouped as-of join: all (delivery, cutoff) queries
+    sorted by their cutoff time, matched by Date_utc to the last earlier
+    Date_of_publication_utc. One row per query; forecasts are NaN where
+    nothing was published by the cutoff.
+    """
+    forecast = forecast.dropna(subset=["Date_of_publication_utc"])
+    delivery = pd.DatetimeIndex(forecast["Date_utc"].unique()).sort_values()
+    as_of = cutoff_times(delivery, cutoffs)
+    queries = pd.DataFrame(
+        {
+            "Date_utc": np.repeat(delivery, len(cutoffs)),
+            "cutoff": np.tile(cutoffs, len(delivery)),
+            "as_of": pd.DatetimeIndex(as_of.ravel()).tz_localize("UTC"),
+        }
+    ).sort_values("as_of", kind="stable")
+    return pd.merge_asof(
+        queries,
+        forecast.sort_values("Date_of_publication_utc", kind="stable"),
+        left_on="as_of",
+        right_on="Date_of_publication_utc",
+        by="Date_utc",
+        direction="backward",
+    )
+
+
+def vintage_accuracy(cutoffs=CUTOFFS, pairs=PAIRS, start=None, end=None):
+    """
+    Forecast error of every pk5y forecast column at every cutoff, against
+    pk5y actuals. Errors are compared on the deliveries that have a
+    forecast at every cutoff and an actual, so the cutoffs differ only in
+    how late the forecast was taken (cutoffs before any publication only
+    count towards coverage). One row per (forecast, cutoff) with
+    coverage, mean lead time (delivery - publication), MAE, RMSE, bias and
+    the MAE gain over the first cutoff.
+    """
+    forecast = read_frame(
+        "pk5y_forecast.parquet",
+        columns=["Date_utc", "Date_of_publication_utc", *pairs],
+        start=start,
+        end=end,
+    )
+    actual = expand_resolution(
+        read_frame(
+            "pk5y_actual.parquet",
+            columns=["Date_utc", RESOLUTION_COLUMN, *pairs.values()],
+            start=start,
+            end=end,
+        )
+    ).drop_duplicates("Date_utc", keep="last")
+    joined = as_of_forecasts(forecast, cutoffs).merge(
+        actual, on="Date_utc", how="left", suffixes=("", "_actual")
+    )
+
+    lead = (
+        joined["Date_utc"].to_numpy("int64")
+        - joined["Date_of_publication_utc"].to_numpy("int64", na_value=0)
+    ) / NS_PER_HOUR
+    tables = []
+    for forecast_col, actual_col in pairs.items():
+        error = (
+            joined[forecast_col].astype("float64")
+            - joined[actual_col].astype("float64")
+        ).to_numpy()
+        known = ~np.isnan(error)
+        frame = pd.DataFrame(
+            {
+                "Date_utc": joined["Date_utc"],
+                "cutoff": joined["cutoff"],
+                "known": known,
+                "lead": np.where(known, lead, np.nan),
+                "error": error,
+            }
+        )
+        # deliveries with an actual and a forecast at every cutoff (of those
+        # any forecast was published by)
+        covered = frame.groupby("cutoff", sort=False)["known"].mean()
+        needed = frame["cutoff"].map(covered > 0).to_numpy()
+        complete = (
+            (frame["known"] | ~needed).groupby(frame["Date_utc"]).transform("all")
+        )
+        frame = frame[complete.to_numpy()]
+        frame["abs"] = frame["error"].abs()
+        frame["squared"] = frame["error"] ** 2
+        grouped = frame.groupby("cutoff", sort=False)
+        table = pd.DataFrame(
+            {
+                "coverage %": covered * 100,
+                "rows": grouped["known"].sum(),
+                "lead h": grouped["lead"].mean(),
+                "MAE": grouped["abs"].mean(),
+                "RMSE": np.sqrt(grouped["squared"].mean()),
+                "Bias": grouped["error"].mean(),
+            }
+        ).reindex(cutoffs)
+        first = table["MAE"].dropna()
+        if len(first):
+            table["MAE gain %"] = (1 - table["MAE"] / first.iloc[0]) * 100
+        tables.append(table.rename_axis("cutoff").assign(forecast=forecast_col))
+    return pd.concat(tables).reset_index().set_index(["forecast", "cutoff"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Forecast error of every pk5y vintage by publication cutoff."
+    )
+    parser.add_argument(
+        "--cutoffs",
+        nargs="+",
+        default=CUTOFFS,
+        help="Local HH:MM times on the day before delivery.",
+    )
+    parser.add_argument("--start", help="First delivery date (UTC).")
+    parser.add_argument("--end", help="End of the delivery dates (UTC, exclusive).")
+    args = parser.parse_args()
+
+    table = vintage_accuracy(sorted(args.cutoffs), PAIRS, args.start, args.end)
+    print(table.to_string(float_format="{:.2f}".format))
+    table.to_csv(out_path / OUTPUT_FILE)
+    print(f"Saved to {out_path / OUTPUT_FILE}")
@@ -9,6 +9,8 @@ ENV_NAME="power"
 
 source $(conda info --base)/etc/profile.d/conda.sh
 conda activate ${ENV_NAME}
+# Stages of this run share one id in out/run_metrics.jsonl
+export POWER_RUN_ID=${POWER_RUN_ID:-$(date +%Y%m%dT%H%M%S)}
 
 # Interactive prompts for parameters with validation
 